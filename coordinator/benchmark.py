@@ -0,0 +1,309 @@
+import os
+import sys
+import tempfile
+import time
+
+import numpy as np
+
+from mamca import *
+from mamca.momenta import split_momenta
+from mamca.dipolar import DipolarKernel
+from mamca.neighbors import neighbor_list
+from mamca.quartic import METHODS, mathematica_roots, real_roots
+from mamca.archive import read_vectors
+
+"""
+    Замеры производительности координатора
+    запуск: python benchmark.py <имя замера>
+"""
+
+
+def _legacy_read_vectors(filename):
+    """
+    Построчный разбор файла состояния (в том виде, в котором он был в plots до появления mamca.momenta)
+    """
+    with open(filename, mode='r') as f:
+        lines = [s.replace(',', '.') for s in f]
+    temp = np.array(
+        [tuple(map(lambda s: float(s), line)) for line in
+         list(map(lambda s: s.split(), lines))])
+    return temp[:, :6], temp[:, 6:9], temp[:, 9:]
+
+
+def _write_momenta_file(filename, x=70, y=70, n=1):
+    """
+    Создает файл состояния в формате Sample.saveState со случайными моментами
+    """
+    number = x * y * n
+    cells = np.stack(np.unravel_index(np.arange(number) // n, (x, y)) + (np.zeros(number, dtype=int),), axis=1)
+    points = cells * 3.0
+    m = np.random.normal(size=(number, 3))
+    m /= np.linalg.norm(m, axis=1)[:, np.newaxis] * 2
+    with open(filename, mode='w') as f:
+        for p, v, c in zip(points, m, cells):
+            f.write('{} {} {} {} {} {} {} {} {} {} {} {}\n'.format(
+                *(p - v), *(p + v), *p, *c))
+
+
+def _measure(function, filename, repeat):
+    start = time.perf_counter()
+    for _ in range(repeat):
+        function(filename)
+    return (time.perf_counter() - start) / repeat
+
+
+def benchmark_momenta_parsing(repeat=20):
+    """
+    Сравнивает скорость разбора файла состояния образца 70x70
+    старым построчным способом и mamca.read_momenta
+    """
+    with tempfile.TemporaryDirectory() as folder:
+        filename = '{}/momenta_bench.txt'.format(folder)
+        _write_momenta_file(filename)
+        size = os.path.getsize(filename) / 2 ** 20
+        lines = read_momenta(filename).shape[0]
+
+        assert all(np.array_equal(a, b) for a, b in
+                   zip(_legacy_read_vectors(filename), split_momenta(read_momenta(filename))))
+
+        legacy = _measure(_legacy_read_vectors, filename, repeat)
+        bulk = _measure(read_momenta, filename, repeat)
+    print('file: {} lines, {:.2f} MB'.format(lines, size))
+    for title, t in (('legacy', legacy), ('read_momenta', bulk)):
+        print('{:>14}: {:8.2f} ms, {:8.2f} MB/s, {:10.0f} lines/s'.format(
+            title, t * 1e3, size / t, lines / t))
+    print('speedup: {:.1f}x'.format(legacy / bulk))
+
+
+def _quartic_coefficients(number, seed=0):
+    """
+    Коэффициенты уравнения минимумов для частиц с параметрами по умолчанию (m = 456, kan = 13000, r = 1.25)
+    в поле до 2000 Гс под случайным углом к оси анизотропии
+    """
+    random = np.random.RandomState(seed)
+    v_kan = 13000 * 4 * np.pi * 1.25e-9 ** 3 / 3
+    t = random.uniform(0, 0.2, number) * 456 * 927.40096820e-26
+    theta = random.uniform(-np.pi, np.pi, number)
+    # поле вдоль оси анизотропии (как для частиц в коллинеарном случае)
+    theta[:number // 100] = np.pi
+    return np.full(number, 4 * v_kan), t * np.sin(theta), 2 * t * np.cos(theta)
+
+
+def _roots_one_by_one(a, b, c):
+    """
+    Решение уравнений по одному (как один вызов NSolve на частицу)
+    """
+    roots = np.full((len(b), 4), np.nan)
+    for i in range(len(b)):
+        values = np.roots([b[i], c[i] - a[i], 0, c[i] + a[i], -b[i]])
+        values = np.sort(values[np.abs(values.imag) <= 1e-7 * np.maximum(1, np.abs(values.real))].real)
+        roots[i, :len(values)] = values
+    return roots
+
+
+def _max_angle_error(roots, reference):
+    """
+    :return: число уравнений с разным числом корней и максимальная разница углов phi = 2 * atan(x)
+    """
+    def angles(x):
+        # phi = pi и phi = -pi -- один и тот же угол (корень на бесконечности любого знака)
+        return np.sort((2 * np.arctan(x) + np.pi) % (2 * np.pi) - np.pi, axis=1)
+
+    same = (np.isnan(roots) == np.isnan(reference)).all(axis=1)
+    delta = np.abs(angles(roots[same]) - angles(reference[same]))
+    delta = np.minimum(delta, 2 * np.pi - delta)
+    return int((~same).sum()), float(np.nanmax(delta)) if delta.size else 0.0
+
+
+def benchmark_quartic(number=10 ** 6, check=2000):
+    """
+    Скорость решения уравнения минимумов энергии для number частиц сразу (mamca.quartic)
+    и сравнение с решением по одному уравнению (np.roots) и с NSolve, если найдено ядро Mathematica
+    """
+    a, b, c = _quartic_coefficients(number)
+    start = time.perf_counter()
+    reference = _roots_one_by_one(a[:check], b[:check], c[:check])
+    one_by_one = (time.perf_counter() - start) / check
+    print('{:>12}: {:10.0f} equations/s'.format('np.roots', 1 / one_by_one))
+    for method in METHODS:
+        start = time.perf_counter()
+        roots = real_roots(a, b, c, method)
+        t = time.perf_counter() - start
+        found = np.count_nonzero(~np.isnan(roots))
+        mismatches, error = _max_angle_error(roots[:check], reference)
+        print('{:>12}: {:10.0f} equations/s, {:10.0f} roots/s, speedup {:6.1f}x, '
+              'differs from np.roots: {} equations, max |d phi| = {:.1e}'.format(
+                method, number / t, found / t, one_by_one * number / t, mismatches, error))
+
+    kernel = get_toolchain().mathematica
+    if kernel is None:
+        print('Mathematica Kernel is not found, comparison with NSolve is skipped')
+        return
+    count = min(check, 200)
+    expected = mathematica_roots(a[:count], b[:count], c[:count], kernel)
+    mismatches, error = _max_angle_error(real_roots(a[:count], b[:count], c[:count]), expected)
+    print('differs from NSolve: {} of {} equations, max |d phi| = {:.1e}'.format(mismatches, count, error))
+
+
+def _lattice(x, y, spacing=3.0):
+    """
+    Координаты частиц решетки x * y (n = 1, d = 0, как в настройках по умолчанию)
+    """
+    cells = np.stack(np.meshgrid(np.arange(x), np.arange(y), indexing='ij'), axis=-1).reshape(-1, 2)
+    return np.column_stack((cells * spacing, np.zeros(len(cells))))
+
+
+def _neighbors_all_pairs(loc, distance):
+    """
+    Перебор всех пар частиц (как в конструкторе Sample), строками по частице
+    """
+    rows = []
+    for i in range(len(loc)):
+        dist = np.sqrt(((loc - loc[i]) ** 2).sum(axis=1))
+        dist[i] = distance
+        rows.append(np.nonzero(dist < distance)[0])
+    return rows
+
+
+def benchmark_neighbors(size=1000):
+    """
+    Поиск соседей по сетке ячеек (mamca.neighbors) в сравнении с перебором всех пар на образце 70x70
+    и для образца size * size частиц
+    """
+    loc = _lattice(70, 70)
+    for distance in (3.1, 30.0):
+        start = time.perf_counter()
+        expected = _neighbors_all_pairs(loc, distance)
+        all_pairs = time.perf_counter() - start
+        start = time.perf_counter()
+        neighbors = neighbor_list(loc, distance)
+        cells = time.perf_counter() - start
+        assert all(np.array_equal(neighbors.indices[neighbors.indptr[i]:neighbors.indptr[i + 1]], row)
+                   for i, row in enumerate(expected))
+        print('70x70, distance {:5.1f}: all pairs {:8.3f} s, cells {:8.3f} s, speedup {:6.1f}x'.format(
+            distance, all_pairs, cells, all_pairs / cells))
+
+    loc = _lattice(size, size)
+    for distance, box in ((3.1, None), (3.1, (size * 3.0, size * 3.0, 0)), (6.1, None)):
+        start = time.perf_counter()
+        neighbors = neighbor_list(loc, distance, box, vectors=False)
+        t = time.perf_counter() - start
+        print('{} particles, distance {:5.1f}, {:>8}: {:8.3f} s, {:.1f} neighbors per particle'.format(
+            len(loc), distance, 'cyclic' if box else 'open', t, neighbors.counts().mean()))
+
+
+def benchmark_dipolar(sizes=(70, 300, 1000)):
+    """
+    Расчет диполь-дипольного поля через FFT (mamca.dipolar) в сравнении с суммированием по соседям
+    ближе dipolDistance для образцов size * size с настройками по умолчанию
+    """
+    settings = Settings()
+    for size in sizes:
+        settings.x = settings.y = size
+        m = np.random.normal(size=(size * size, 3))
+        start = time.perf_counter()
+        kernel = DipolarKernel(settings, settings.dipolDistance)
+        prepare = time.perf_counter() - start
+        start = time.perf_counter()
+        fft = kernel.field(m)
+        t = time.perf_counter() - start
+        print('{}x{}: FFT tensors {:7.3f} s, field {:7.3f} s'.format(size, size, prepare, t))
+        if size * size > 10 ** 5:
+            continue
+        start = time.perf_counter()
+        neighbors = neighbor_list(_lattice(size, size), settings.dipolDistance)
+        prepare = time.perf_counter() - start
+        start = time.perf_counter()
+        rows = neighbors.rows()
+        r = neighbors.vectors
+        dist = np.sqrt((r * r).sum(axis=1))
+        n = r / dist[:, np.newaxis]
+        mj = m[neighbors.indices]
+        pairs = (3 * (n * mj).sum(axis=1)[:, np.newaxis] * n - mj) / dist[:, np.newaxis] ** 3
+        pairs = np.column_stack([np.bincount(rows, weights=pairs[:, k], minlength=len(m)) for k in range(3)])
+        t = time.perf_counter() - start
+        print('{}x{}: neighbors {:7.3f} s, field {:7.3f} s, max relative difference {:.1e}'.format(
+            size, size, prepare, t, np.abs(pairs - fft).max() / np.abs(pairs).max()))
+
+
+def _legacy_borders(settings, filename):
+    """
+    Построчная фильтрация по окну borders (в том виде, в котором она была в plots._read_data)
+    """
+    raw_vectors, raw_points, cells = read_vectors(filename)
+    vectors, points = [], []
+    for (vector, point, cell) in zip(raw_vectors, raw_points, cells):
+        (xCell, yCell, zCell) = map(lambda x: int(x), cell)
+        if settings.leftX <= xCell < settings.rightX and (settings.leftY <= yCell < settings.rightY):
+            vectors.append(np.asarray(vector))
+            points.append(np.asarray(point))
+    return np.array(vectors), np.array(points)
+
+
+def _selection_borders(settings, filename):
+    raw_vectors, raw_points, cells = read_vectors(filename)
+    mask = CellSelection.from_settings(settings).mask(cells)
+    return raw_vectors[mask], raw_points[mask]
+
+
+def benchmark_borders(repeat=20):
+    """
+    Фильтрация состояния образца 70x70 по окну borders: построчно и маской selection.CellSelection
+    """
+    settings = Settings()
+    with tempfile.TemporaryDirectory() as folder:
+        filename = '{}/momenta_bench.txt'.format(folder)
+        _write_momenta_file(filename)
+        assert all(np.array_equal(a, b) for a, b in
+                   zip(_legacy_borders(settings, filename), _selection_borders(settings, filename)))
+        read = _measure(read_vectors, filename, repeat)
+        legacy = _measure(lambda f: _legacy_borders(settings, f), filename, repeat) - read
+        mask = _measure(lambda f: _selection_borders(settings, f), filename, repeat) - read
+    for title, t in (('legacy', legacy), ('mask', mask)):
+        print('{:>8}: {:8.3f} ms (without reading the file)'.format(title, t * 1e3))
+    print('speedup: {:.1f}x'.format(legacy / mask))
+
+
+def benchmark_archive(steps=50, repeat=20):
+    """
+    Размер архива запуска (archive.archive_run) из steps состояний образца 70x70
+    в сравнении с текстовыми файлами и время чтения одного состояния из архива и из текста
+    """
+    with tempfile.TemporaryDirectory() as folder:
+        settings = Settings()
+        settings.dataFolder = folder
+        out_folder = '{}/{}/out'.format(folder, settings.name)
+        os.makedirs(out_folder)
+        for step in range(1, steps + 1):
+            _write_momenta_file('{}/momenta_{:02d}_neg_{:.3f}_0.000_0.000.txt'.format(out_folder, step, 500.0 - step))
+        names = sorted(os.listdir(out_folder))
+        text = sum(os.path.getsize('{}/{}'.format(out_folder, name)) for name in names)
+        filename = '{}/{}'.format(out_folder, names[steps // 2])
+        text_read = _measure(read_vectors, filename, repeat)
+        expected = read_vectors(filename)
+
+        start = time.perf_counter()
+        archive_run(settings, remove=True)
+        packing = time.perf_counter() - start
+        size = os.path.getsize('{}/{}/archive.zip'.format(folder, settings.name))
+        assert all(np.array_equal(a, b) for a, b in zip(expected, read_vectors(filename)))
+        archive_read = _measure(read_vectors, filename, repeat)
+    print('{} snapshots: text {:.1f} MB, archive {:.1f} MB ({:.1f}x smaller), packed in {:.2f} s'.format(
+        steps, text / 2 ** 20, size / 2 ** 20, text / size, packing))
+    print('one snapshot: text {:.2f} ms, archive {:.2f} ms'.format(text_read * 1e3, archive_read * 1e3))
+
+
+BENCHMARKS = {
+    'parsing': benchmark_momenta_parsing,
+    'quartic': benchmark_quartic,
+    'neighbors': benchmark_neighbors,
+    'dipolar': benchmark_dipolar,
+    'borders': benchmark_borders,
+    'archive': benchmark_archive,
+}
+
+if __name__ == '__main__':
+    names = sys.argv[1:] or list(BENCHMARKS)
+    for name in names:
+        print('__________{}__________'.format(name))
+        BENCHMARKS[name]()
@@ -1,19 +1,159 @@
 import os
 import shutil
 import sys
+from functools import partial
 
-from json.decoder import JSONDecodeError
 from mamca import *
+from mamca.adaptive import adaptive_hysteresis
+from mamca.engine import engine_run
+from mamca.ensemble import ensemble_run
+from mamca.journal import Journal, FAILED
+from mamca.pipeline import streaming_run
+from mamca.scheduler import SweepScheduler
+from mamca.workers import WorkerPool
 
 
 def single_simulation(settings_fname: str = None):
     if settings_fname is None:
         settings_fname = sys.argv[2]
-    if not check_settings(settings_fname):
+    settings = check_settings(settings_fname)
+    if settings is None:
         exit_on_fail('settings file is incorrect')
     single_run(settings_fname=settings_fname)
-    settings = Settings(settings_fname)
+    draw_results(settings)
+    play_success_notification()
+
+
+def engine_simulation(settings_fname: str = None):
+    """
+    Единичная симуляция на numpy (mamca.engine), без java и Mathematica
+    argv[3] -- способ расчета диполь-дипольного поля: pairs (по умолчанию), fft или full
+    """
+    if settings_fname is None:
+        settings_fname = sys.argv[2]
+    dipole = sys.argv[3] if len(sys.argv) > 3 else 'pairs'
+    settings = check_settings(settings_fname)
+    if settings is None:
+        exit_on_fail('settings file is incorrect')
+    engine_run(settings_fname, dipole=dipole)
+    draw_results(settings)
+    play_success_notification()
+
+
+def ensemble_simulation(settings_fname: str = None):
+    """
+    Ансамбль копий образца с разными случайными начальными состояниями на numpy (mamca.ensemble)
+    argv[3] -- число копий, argv[4] (необязательный) -- способ расчета диполь-дипольного поля
+    """
+    if settings_fname is None:
+        settings_fname = sys.argv[2]
+    if len(sys.argv) < 4:
+        exit_on_fail('number of replicas is not specified')
+    replicas = int(sys.argv[3])
+    dipole = sys.argv[4] if len(sys.argv) > 4 else 'pairs'
+    settings = check_settings(settings_fname)
+    if settings is None:
+        exit_on_fail('settings file is incorrect')
+    table = ensemble_run(settings_fname, replicas, dipole=dipole)
+    if table is None:
+        exit_on_fail('simulation failed')
+    if settings.hysteresis:
+        # петля по средним моментам копий
+        draw_hyst_plot(
+            settings=settings,
+            b_axis='x',
+            m_axis='x',
+            table=table,
+            name=HYST_PLOT_TEMPLATE.format(settings.name) + '_ensemble'
+        )
+    play_success_notification()
+
+
+def archive_simulation(settings_fname: str = None):
+    """
+    Упаковывает завершенный запуск в <dataFolder>/<name>/archive.zip (mamca.archive.archive_run)
+    argv[3] (необязательный) -- remove: удалить файлы состояний после упаковки
+    """
+    if settings_fname is None:
+        settings_fname = sys.argv[2]
+    remove = len(sys.argv) > 3 and sys.argv[3] == 'remove'
+    settings = check_settings(settings_fname)
+    if settings is None:
+        exit_on_fail('settings file is incorrect')
+    try:
+        count = archive_run(settings, remove=remove)
+    except (ValueError, IOError) as e:
+        exit_on_fail('{}: {}'.format(settings.name, e))
+        return
+    print('{}: {} snapshots archived'.format(settings.name, count))
+
+
+def streaming_simulation(settings_fname: str = None):
+    """
+    Моделирование, при котором графики состояний рисуются по мере их появления
+    """
+    if settings_fname is None:
+        settings_fname = sys.argv[2]
+    settings = check_settings(settings_fname)
+    if settings is None:
+        exit_on_fail('settings file is incorrect')
+    check_borders(settings)
+    if streaming_run(settings_fname, draw_snapshot) != 0:
+        exit_on_fail('simulation failed')
+    convert_run(settings)
+    if settings.hysteresis:
+        draw_hyst_plot(
+            settings=settings,
+            b_axis='x',
+            m_axis='x'
+        )
+    play_success_notification()
+
+
+def adaptive_simulation(settings_fname: str = None):
+    """
+    Гистерезис с адаптивным уточнением: грубая петля, затем дополнительные моделирования
+    на интервалах поля с наибольшими скачками момента
+    третий и четвертый аргументы (необязательные) -- порог скачка (доля от максимального) и
+    на сколько частей делить уточняемые интервалы
+    """
+    if settings_fname is None:
+        settings_fname = sys.argv[2]
+    threshold = float(sys.argv[3]) if len(sys.argv) > 3 else 0.2
+    refine = int(sys.argv[4]) if len(sys.argv) > 4 else 4
+    settings = check_settings(settings_fname)
+    if settings is None:
+        exit_on_fail('settings file is incorrect')
+    if not settings.hysteresis:
+        exit_on_fail('adaptive mode works only for hysteresis runs')
+    single_run(settings_fname=settings_fname)
     check_borders(settings)
+    table = adaptive_hysteresis(settings, threshold=threshold, refine=refine)
+    draw_hyst_plot(
+        settings=settings,
+        b_axis='x',
+        m_axis='x',
+        table=table,
+        name=HYST_PLOT_TEMPLATE.format(settings.name) + '_adaptive'
+    )
+    play_success_notification()
+
+
+def draw_snapshot(settings: Settings, momenta_filename: str):
+    draw_vectors_plot(
+        settings=settings,
+        momenta_filename=momenta_filename,
+        draw_points=False
+    )
+
+
+def draw_results(settings: Settings, workers: int = None):
+    """
+    :param workers: число процессов для рисования состояний (см. draw_all_vectors_plots)
+    """
+    check_borders(settings)
+    # бинарные копии состояний, чтобы графики (и повторные перерисовки) не разбирали текст
+    convert_run(settings)
     if settings.hysteresis:
         draw_hyst_plot(
             settings=settings,
@@ -26,32 +166,145 @@ def single_simulation(settings_fname: str = None):
         # scale=0.5,
         draw_points=False,
         # borders=[-3, 15, -3, 15, -9, 9]
+        workers=workers
     )
     # create_momenta_gif(settings=settings)
-    play_success_notification()
 
 
 def multiple_simulations():
     resource_folder = sys.argv[2]
+    settings_fnames = list_settings_files(resource_folder)
+    if not settings_fnames:
+        exit_on_fail('"{}" does not contain valid settings files'.format(resource_folder))
+    settings = Settings(settings_fnames[0])
+    create_out_folders(settings)
+    run_sequentially(settings_fnames, Journal(settings.dataFolder))
+    play_success_notification()
+
+
+def resume_simulations():
+    """
+    Перезапускает задачи серии из папки, которые по журналу не запускались, были прерваны или завершились с ошибкой
+    третий аргумент (необязательный) -- во сколько раз увеличить память (поле memory) для задач, завершившихся с ошибкой
+    """
+    resource_folder = sys.argv[2]
+    memory_factor = float(sys.argv[3]) if len(sys.argv) > 3 else 1
+    settings_fnames = list_settings_files(resource_folder)
+    if not settings_fnames:
+        exit_on_fail('"{}" does not contain valid settings files'.format(resource_folder))
+    settings = Settings(settings_fnames[0])
+    create_out_folders(settings)
+    journal = Journal(settings.dataFolder)
+    pending = journal.pending(settings_fnames)
+    print('{} of {} jobs to run'.format(len(pending), len(settings_fnames)))
+    fnames = []
+    for settings_fname, record in pending:
+        if record is not None and record['state'] == FAILED and memory_factor != 1:
+            settings_fname = increase_memory(settings_fname, int(record['memory'] * memory_factor))
+        fnames.append(settings_fname)
+    run_sequentially(fnames, journal)
+    play_success_notification()
+
+
+def increase_memory(settings_fname: str, memory: int):
+    """
+    Сохраняет копию настроек с увеличенной памятью в папку <dataFolder>/retry, исходный файл не меняется
+    :return: путь к копии
+    """
+    settings = Settings(settings_fname)
+    settings.memory = memory
+    folder = '{}/retry'.format(settings.dataFolder)
+    if not os.path.exists(folder):
+        os.mkdir(folder)
+    retry_fname = '{}/{}'.format(folder, os.path.basename(settings_fname))
+    settings.save_settings(retry_fname)
+    print('{}: retrying with {} Mb'.format(settings.name, memory))
+    return retry_fname
+
+
+def run_sequentially(settings_fnames, journal: Journal):
+    """
+    Запускает моделирования по очереди, записывая их в журнал, и рисует результаты удачных
+    """
+    for settings_fname in settings_fnames:
+        try:
+            record = journal.start(settings_fname)
+            code = -1
+            try:
+                code = single_run(settings_fname=settings_fname, exit_on_fail=False)
+            finally:
+                journal.finish(record, code)
+            if code != 0:
+                print('{} failed with code {}'.format(settings_fname, code))
+                continue
+            draw_and_copy_results(settings_fname)
+        except Exception as e:
+            print(e)
+
+
+def parallel_simulations(warm: bool = False):
+    """
+    Запускает все настройки из папки параллельно
+    третий аргумент (необязательный) -- максимальное число одновременных моделирований
+    :param warm: запускать моделирования в пуле долгоживущих рабочих процессов (JVM и ядро Mathematica
+        стартуют один раз на процесс, а не на каждое моделирование)
+    """
+    resource_folder = sys.argv[2]
+    workers = int(sys.argv[3]) if len(sys.argv) > 3 else None
+    settings_fnames = list_settings_files(resource_folder)
+    if not settings_fnames:
+        exit_on_fail('"{}" does not contain valid settings files'.format(resource_folder))
+    settings = Settings(settings_fnames[0])
+    create_out_folders(settings)
+    pool = None
+    if warm:
+        pool = WorkerPool(size=workers, memory=max(Settings(fname).memory for fname in settings_fnames))
+    scheduler = SweepScheduler(
+        workers=pool.size if warm else workers,
+        # число одновременных моделирований ограничено размером пула, память рабочих процессов занята все время
+        memory=sys.maxsize if warm else None,
+        run=pool.run if warm else single_run,
+        # процессов рисования уже столько, сколько ядер, каждый рисует свои состояния сам,
+        # иначе одновременно работало бы около cpu_count ** 2 процессов
+        plot=partial(draw_and_copy_results, workers=1),
+        log_folder='{}/logs'.format(settings.dataFolder),
+        journal=Journal(settings.dataFolder)
+    )
+    try:
+        results = scheduler.run(settings_fnames)
+    finally:
+        if pool is not None:
+            pool.close()
+    failed = [fname for fname, code in results.items() if code != 0]
+    for fname in failed:
+        print('{} failed: {}'.format(fname, results[fname]))
+    if failed:
+        play_failure_notification()
+    else:
+        play_success_notification()
+
+
+def draw_and_copy_results(settings_fname: str, workers: int = None):
+    settings = Settings(settings_fname)
+    draw_results(settings, workers)
+    copy_settings_and_hyst_plot(settings)
+
+
+def list_settings_files(resource_folder: str):
     if not os.path.exists(resource_folder):
         exit_on_fail('"{}" directory does not exist'.format(resource_folder))
     if not os.path.isdir(resource_folder):
         exit_on_fail('"{}" is not directory'.format(resource_folder))
-    settings_files = list(sorted(os.listdir(resource_folder)))
-    settings_path_template = resource_folder + '/{}'
-    create_out_folders(Settings(settings_path_template.format(settings_files[0])))
-    for file in settings_files:
-        settings_fname = settings_path_template.format(file)
+    settings_fnames = []
+    for file in sorted(os.listdir(resource_folder)):
+        settings_fname = '{}/{}'.format(resource_folder, file)
         if not settings_fname.endswith('.json'):
             continue
-        if not check_settings(settings_fname):
+        if check_settings(settings_fname) is None:
             print('{} is not valid settings file'.format(settings_fname))
             continue
-        try:
-            single_simulation(settings_fname)
-            copy_settings_and_hyst_plot(Settings(settings_fname))
-        except Exception as e:
-            print(e)
+        settings_fnames.append(settings_fname)
+    return settings_fnames
 
 
 def copy_settings_and_hyst_plot(settings: Settings):
@@ -78,13 +331,17 @@ def create_out_folders(settings: Settings):
 
 
 def check_settings(settings_fname: str):
+    """
+    :return: настройки из файла или None, если файл не читается или настройки неверны
+        (файл разбирается один раз, повторные Settings(settings_fname) берут результат из кэша)
+    """
     try:
-        Settings(settings_fname)
-    except JSONDecodeError:
-        return False
+        return Settings(settings_fname)
+    except ValueError:
+        # в том числе JSONDecodeError и поля неверного типа
+        return None
     except IOError:
-        return False
-    return True
+        return None
 
 
 def exit_on_fail(message: str = None):
@@ -101,6 +358,22 @@ def main():
         single_simulation()
     elif sys.argv[1] == 'multiple':
         multiple_simulations()
+    elif sys.argv[1] == 'resume':
+        resume_simulations()
+    elif sys.argv[1] == 'parallel':
+        parallel_simulations()
+    elif sys.argv[1] == 'pool':
+        parallel_simulations(warm=True)
+    elif sys.argv[1] == 'adaptive':
+        adaptive_simulation()
+    elif sys.argv[1] == 'stream':
+        streaming_simulation()
+    elif sys.argv[1] == 'engine':
+        engine_simulation()
+    elif sys.argv[1] == 'ensemble':
+        ensemble_simulation()
+    elif sys.argv[1] == 'archive':
+        archive_simulation()
     else:
         exit_on_fail('wrong arguments')
 
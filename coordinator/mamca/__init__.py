@@ -1,23 +1,60 @@
 MAMCA_PATH = './build/libs/MaMCa.jar'
 
-from .executors import single_run
-from .plots import create_momenta_gif, draw_hyst_plot, draw_all_hyst_plots, draw_all_vectors_plots, draw_3d_vectors_plot, check_borders, end_of_drawing, draw_plot_from_hyst_series, HYST_PLOT_TEMPLATE
+from .archive import archive_run
+from .cache import SnapshotCache, get_cache
+from .executors import single_run, start_run
+from .hysteresis import hysteresis_table
+from .momenta import read_momenta, parse_momenta
+from .run import Run
+from .selection import CellSelection
+from .plots import create_momenta_gif, draw_hyst_plot, draw_all_hyst_plots, draw_all_vectors_plots, draw_vectors_plot, draw_3d_vectors_plot, check_borders, end_of_drawing, draw_plot_from_hyst_series, HYST_PLOT_TEMPLATE
+from .snapshot_index import RunIndex, run_index
 from .settings import Settings
+from .snapshots import convert_run, read_snapshot, read_sample
+from .store import find_run, register_run, reuse_run, settings_hash
+from .sweep import Sweep, grid, latin_hypercube, read_manifest, zipped
+from .toolchain import Toolchain, get_toolchain
 from .util import play_failure_notification, play_success_notification, which
 
 
 __all__ = [
     'single_run',
+    'start_run',
+    'SnapshotCache',
+    'get_cache',
+    'hysteresis_table',
+    'read_momenta',
+    'parse_momenta',
     'check_borders',
     'create_momenta_gif',
     'draw_hyst_plot',
     'draw_all_hyst_plots',
     'draw_all_vectors_plots',
+    'draw_vectors_plot',
     'draw_3d_vectors_plot',
     'end_of_drawing',
     'draw_plot_from_hyst_series',
     'HYST_PLOT_TEMPLATE',
+    'Run',
+    'CellSelection',
+    'RunIndex',
+    'run_index',
     'Settings',
+    'archive_run',
+    'convert_run',
+    'read_snapshot',
+    'read_sample',
+    'settings_hash',
+    'find_run',
+    'register_run',
+    'reuse_run',
+    'Sweep',
+    'grid',
+    'zipped',
+    'latin_hypercube',
+    'read_manifest',
+    'Toolchain',
+    'get_toolchain',
     'play_success_notification',
     'play_failure_notification',
     'which'
@@ -0,0 +1,157 @@
+"""
+Адаптивное уточнение петли гистерезиса
+
+Сначала считается обычная (грубая) петля. Затем по таблице гистерезиса находятся интервалы поля,
+на которых суммарный момент меняется сильнее всего (переключения), и только на них запускаются
+дополнительные моделирования с промежуточными значениями поля. Каждое уточняющее моделирование --
+обычный (не гистерезисный) запуск, который загружает (load, jsonPath) состояние
+при предыдущем значении поля на той же ветви, так что история намагничивания сохраняется
+"""
+
+import os
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+
+from .archive import read_vectors, snapshot_names
+from .executors import single_run
+from .hysteresis import BRANCHES, HYSTERESIS_DTYPE, REGIONS, hysteresis_table, snapshot_totals
+from .snapshot_index import run_index
+from .snapshots import SAMPLE_FILE, read_sample, write_sample
+
+# папка запуска, в которую пишутся настройки и состояния уточняющих моделирований
+ADAPTIVE_FOLDER = 'adaptive'
+
+# таблица уточненной петли
+ADAPTIVE_TABLE = 'hysteresis.npy'
+
+
+def jump_intervals(table, threshold=0.2, max_intervals=None, region='borders'):
+    """
+    Находит интервалы поля с наибольшим изменением момента
+    :param table: таблица гистерезиса (hysteresis.hysteresis_table)
+    :param threshold: доля от максимального скачка момента, начиная с которой интервал уточняется
+    :param max_intervals: максимальное число интервалов (берутся с наибольшими скачками)
+    :param region: область, по которой считается момент (как в draw_hyst_plot)
+    :return: список (branch, step_from, step_to, b_from, b_to, скачок |dM|), по убыванию скачка
+    """
+    rows = table[table.region == region]
+    intervals = []
+    for branch in BRANCHES:
+        r = np.sort(rows[rows.branch == branch], order='step')
+        if r.size < 2:
+            continue
+        m = np.column_stack((r.mx, r.my, r.mz))
+        b = np.column_stack((r.bx, r.by, r.bz))
+        jumps = np.linalg.norm(np.diff(m, axis=0), axis=1)
+        for i, jump in enumerate(jumps):
+            intervals.append((branch, int(r.step[i]), int(r.step[i + 1]),
+                              tuple(b[i].tolist()), tuple(b[i + 1].tolist()), float(jump)))
+    if not intervals:
+        return []
+    max_jump = max(interval[-1] for interval in intervals)
+    if max_jump == 0:
+        return []
+    intervals = [interval for interval in intervals if interval[-1] >= threshold * max_jump]
+    intervals.sort(key=lambda interval: -interval[-1])
+    return intervals[:max_intervals]
+
+
+def write_checkpoint(snapshot_filename, sample_filename, checkpoint_filename):
+    """
+    Собирает из файла состояния и sample.json того же запуска образец, который можно загрузить (load, jsonPath)
+    """
+    vectors, points, cells = read_vectors(snapshot_filename)
+    m = vectors[:, 3:] - vectors[:, :3]
+    # бинарные копии могут храниться во float32, момент частицы -- единичный вектор
+    m /= np.linalg.norm(m, axis=1)[:, np.newaxis]
+    lma = read_sample(sample_filename)['lma']
+    write_sample(checkpoint_filename, points, m, lma, cells)
+
+
+def _last_snapshot(out_folder):
+    """
+    :return: путь к последнему записанному файлу состояния (состояние после релаксации)
+    """
+    files = ['{}/{}'.format(out_folder, f) for f in snapshot_names(out_folder)]
+    return max(files, key=lambda f: (os.path.getmtime(f), f))
+
+
+def _refine_interval(settings, interval, refine, run):
+    """
+    Последовательно считает промежуточные значения поля интервала, каждое -- со состояния при предыдущем
+    :return: список строк таблицы (ключ сортировки, branch, region, b, момент)
+    """
+    branch, step_from, _, b_from, b_to, _ = interval
+    run_folder = '{}/{}'.format(settings.dataFolder, settings.name)
+    folder = '{}/{}'.format(run_folder, ADAPTIVE_FOLDER)
+    out_folder = '{}/out'.format(run_folder)
+    sample_filename = '{}/{}'.format(out_folder, SAMPLE_FILE)
+
+    snapshot = run_index(settings).step(step_from)
+    if snapshot is None or settings.roi:
+        raise ValueError('{}: full state of step {} is not saved (see snapshotStride, reductionsOnly, roi)'.format(
+            settings.name, step_from))
+    checkpoint = os.path.abspath('{}/checkpoint_{}_0.json'.format(folder, step_from))
+    write_checkpoint('{}/{}'.format(out_folder, snapshot), sample_filename, checkpoint)
+    rows = []
+    b_from, b_to = np.array(b_from), np.array(b_to)
+    for k in range(1, refine):
+        b = b_from + (b_to - b_from) * k / refine
+        s = settings.copy()
+        s.name = '{}_{}_{}_{}'.format(settings.name, ADAPTIVE_FOLDER, step_from, k)
+        s.hysteresis = False
+        s.load = True
+        s.jsonPath = checkpoint
+        s.b_x, s.b_y, s.b_z = (float(c) for c in b)
+        # как в частой области гистерезиса (hysteresisRun в Main.kt)
+        s.time = settings.time / settings.hysteresisDenseMultiplier
+        settings_fname = '{}/settings_{}.json'.format(folder, s.name)
+        s.save_settings(settings_fname)
+        code = run(settings_fname, exit_on_fail=False)
+        if code != 0:
+            raise RuntimeError('{}: refining simulation failed with code {}'.format(s.name, code))
+
+        refined_out = '{}/{}/out'.format(s.dataFolder, s.name)
+        relaxed = _last_snapshot(refined_out)
+        totals = snapshot_totals(settings, relaxed)
+        for region, total in zip(REGIONS, totals):
+            rows.append((step_from + k / refine, branch, region, tuple(b), tuple(total)))
+        checkpoint = os.path.abspath('{}/checkpoint_{}_{}.json'.format(folder, step_from, k))
+        write_checkpoint(relaxed, '{}/{}'.format(refined_out, SAMPLE_FILE), checkpoint)
+    return rows
+
+
+def adaptive_hysteresis(settings, threshold=0.2, refine=4, max_intervals=None, workers=1, run=single_run):
+    """
+    Уточняет петлю уже посчитанного гистерезисного запуска на интервалах с наибольшими скачками момента
+    :param settings: настройки грубого гистерезисного запуска
+    :param threshold: см. jump_intervals
+    :param refine: на сколько частей делится каждый уточняемый интервал
+    :param max_intervals: максимальное число уточняемых интервалов
+    :param workers: число интервалов, уточняемых одновременно
+    :param run: функция запуска моделирования (как executors.single_run)
+    :return: таблица гистерезиса (HYSTERESIS_DTYPE), в которой грубые и уточняющие шаги пронумерованы
+        по порядку прохождения петли; сохраняется в <run>/adaptive/hysteresis.npy
+    """
+    coarse = hysteresis_table(settings)
+    intervals = jump_intervals(coarse, threshold, max_intervals)
+    folder = '{}/{}/{}'.format(settings.dataFolder, settings.name, ADAPTIVE_FOLDER)
+    if not os.path.exists(folder):
+        os.makedirs(folder)
+
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        refined = list(pool.map(lambda interval: _refine_interval(settings, interval, refine, run), intervals))
+
+    rows = [(float(r.step), r.branch, r.region, (r.bx, r.by, r.bz), (r.mx, r.my, r.mz))
+            for r in coarse if r.region in REGIONS[:2]]
+    rows += [row for interval_rows in refined for row in interval_rows if row[2] in REGIONS[:2]]
+    rows.sort(key=lambda row: (row[0], row[2]))
+    keys = sorted({row[0] for row in rows})
+    steps = {key: i + 1 for i, key in enumerate(keys)}
+    table = np.array([(steps[key], branch, region) + b + m for key, branch, region, b, m in rows],
+                     dtype=HYSTERESIS_DTYPE).view(np.recarray)
+    np.save('{}/{}'.format(folder, ADAPTIVE_TABLE), table)
+    print('{}: {} intervals refined, {} extra simulations'.format(
+        settings.name, len(intervals), len(intervals) * (refine - 1)))
+    return table
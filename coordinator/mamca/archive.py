@@ -0,0 +1,317 @@
+"""
+Архив завершенного запуска: один zip файл <dataFolder>/<name>/archive.zip
+
+Внутри архива:
+    index.json -- список состояний (имена файлов out/momenta_*.txt по порядку), размер и тип массива моментов,
+        число шагов в блоке, имена остальных файлов
+    points.npy, cells.npy -- геометрия запуска (одна на все состояния)
+    momenta/<номер блока>.bin -- моменты блока из chunk соседних состояний (шаги блока, N, 3)
+    settings_<name>.json, log.log, sample.json, reductions.txt -- копии файлов запуска (если они есть)
+Каждый блок сжат отдельно (deflate), поэтому одно состояние читается распаковкой одного блока.
+Перед сжатием байты чисел блока переставляются по номеру байта (как фильтр shuffle в blosc):
+старшие байты соседних моментов почти совпадают и сжимаются намного лучше, чем вперемешку с младшими
+
+snapshots читает и пишет текстовые и бинарные состояния, этот модуль -- архив поверх них: snapshot_names,
+snapshot_source и read_vectors отсюда находят и состояния, которые есть только в архиве запуска
+"""
+
+import io
+import json
+import os
+import threading
+import zipfile
+from collections import OrderedDict
+
+import numpy as np
+
+from . import snapshots
+
+ARCHIVE_FILE = 'archive.zip'
+INDEX_MEMBER = 'index.json'
+POINTS_MEMBER = 'points.npy'
+CELLS_MEMBER = 'cells.npy'
+CHUNK_MEMBER = 'momenta/{:06d}.bin'
+
+ARCHIVE_VERSION = 1
+
+# примерный размер блока моментов до сжатия [байт]
+CHUNK_BYTES = 2 ** 22
+
+# число распакованных блоков, которые архив держит в памяти
+MAX_CHUNKS = 4
+
+# открытые архивы по пути: (время изменения, размер, номер процесса, RunArchive); дочерний процесс
+# открывает архив заново, чтобы не делить с родителем позицию в файле
+_archives = {}
+_lock = threading.Lock()
+
+
+def archive_path(run_folder):
+    return os.path.join(run_folder, ARCHIVE_FILE)
+
+
+def _shuffle(block):
+    itemsize = block.dtype.itemsize
+    return block.view(np.uint8).reshape(-1, itemsize).T.tobytes()
+
+
+def _unshuffle(data, dtype, shape):
+    itemsize = dtype.itemsize
+    return np.frombuffer(data, dtype=np.uint8).reshape(itemsize, -1).T.copy().view(dtype).reshape(shape)
+
+
+def _npy_bytes(array):
+    f = io.BytesIO()
+    np.save(f, array)
+    return f.getvalue()
+
+
+def write_archive(filename, names, moments, points, cells, files=(), dtype=np.float64, chunk=None):
+    """
+    Записывает архив запуска; в памяти держится один блок моментов
+    :param names: имена состояний (out/momenta_*.txt) по порядку
+    :param moments: итератор моментов (N, 3) состояний names в том же порядке
+    :param points: координаты частиц (N, 3)
+    :param cells: номера ячеек (N, 3)
+    :param files: пути к файлам, которые копируются в архив под своими именами
+    :param dtype: тип, в котором хранятся моменты (np.float64 -- без потерь)
+    :param chunk: число состояний в блоке (по умолчанию -- около CHUNK_BYTES на блок)
+    """
+    dtype = np.dtype(dtype)
+    shape = (len(names), len(points), 3)
+    if chunk is None:
+        chunk = max(1, CHUNK_BYTES // max(shape[1] * 3 * dtype.itemsize, 1))
+    temp = '{}.{}.tmp'.format(filename, os.getpid())
+    with zipfile.ZipFile(temp, mode='w', compression=zipfile.ZIP_DEFLATED, allowZip64=True) as archive:
+        archive.writestr(POINTS_MEMBER, _npy_bytes(np.asarray(points, dtype=np.float64)))
+        archive.writestr(CELLS_MEMBER, _npy_bytes(np.asarray(cells, dtype=np.int32)))
+        block = np.empty((chunk, shape[1], 3), dtype=dtype)
+        count = 0
+        for i, (name, m) in enumerate(zip(names, moments)):
+            if len(m) != shape[1]:
+                raise ValueError('{}: {} particles instead of {}'.format(name, len(m), shape[1]))
+            block[i % chunk] = m
+            count += 1
+            if count % chunk == 0 or count == shape[0]:
+                archive.writestr(CHUNK_MEMBER.format(i // chunk), _shuffle(block[:i % chunk + 1]))
+        if count != shape[0]:
+            raise ValueError('{} snapshots expected, got {}'.format(shape[0], count))
+        for path in files:
+            archive.write(path, os.path.basename(path))
+        index = {
+            'version': ARCHIVE_VERSION,
+            'names': [str(name) for name in names],
+            'shape': list(shape),
+            'dtype': dtype.str,
+            'chunk': chunk,
+            'files': [os.path.basename(path) for path in files],
+        }
+        archive.writestr(INDEX_MEMBER, json.dumps(index))
+    os.replace(temp, filename)
+
+
+class RunArchive:
+    def __init__(self, filename):
+        self.filename = filename
+        self._zip = zipfile.ZipFile(filename, mode='r')
+        index = json.loads(self._zip.read(INDEX_MEMBER).decode('utf-8'))
+        if index['version'] != ARCHIVE_VERSION:
+            raise ValueError('{}: unknown archive version {}'.format(filename, index['version']))
+        self.names = index['names']
+        self.shape = tuple(index['shape'])
+        self.dtype = np.dtype(index['dtype'])
+        self.chunk = index['chunk']
+        self.files = index['files']
+        self._positions = {name: i for i, name in enumerate(self.names)}
+        self._points = None
+        self._cells = None
+        self._chunks = OrderedDict()
+        self._lock = threading.Lock()
+
+    def __contains__(self, name):
+        return name in self._positions
+
+    def __len__(self):
+        return len(self.names)
+
+    def geometry(self):
+        """
+        :return: координаты частиц (N, 3) и номера ячеек (N, 3)
+        """
+        with self._lock:
+            if self._points is None:
+                self._points = np.load(io.BytesIO(self._zip.read(POINTS_MEMBER)))
+                self._cells = np.load(io.BytesIO(self._zip.read(CELLS_MEMBER)))
+            return self._points, self._cells
+
+    def _block(self, number):
+        with self._lock:
+            block = self._chunks.get(number)
+            if block is not None:
+                self._chunks.move_to_end(number)
+                return block
+            data = self._zip.read(CHUNK_MEMBER.format(number))
+            steps = min(self.chunk, self.shape[0] - number * self.chunk)
+            block = _unshuffle(data, self.dtype, (steps,) + self.shape[1:])
+            block.setflags(write=False)
+            self._chunks[number] = block
+            while len(self._chunks) > MAX_CHUNKS:
+                self._chunks.popitem(last=False)
+            return block
+
+    def moments(self, name):
+        """
+        :param name: имя файла состояния (momenta_*.txt)
+        :return: моменты частиц (N, 3), float64; распаковывается только блок с этим состоянием
+        """
+        position = self._positions[name]
+        return self._block(position // self.chunk)[position % self.chunk].astype(np.float64)
+
+    def read_vectors(self, name):
+        """
+        :return: то же, что и read_vectors для состояния name
+        """
+        points, cells = self.geometry()
+        half = self.moments(name) / 2
+        return np.hstack((points - half, points + half)), points.copy(), cells.astype(np.float64)
+
+    def read_file(self, name):
+        """
+        :return: содержимое скопированного в архив файла запуска (bytes)
+        """
+        return self._zip.read(name)
+
+    def extract(self, out_folder):
+        """
+        Восстанавливает текстовые файлы состояний (в формате Sample.saveState) в папке out_folder
+        """
+        for name in self.names:
+            vectors, points, cells = self.read_vectors(name)
+            data = np.hstack((vectors, points, cells))
+            np.savetxt(os.path.join(out_folder, name), data, fmt=' '.join(['%.17g'] * 9 + ['%d'] * 3))
+
+    def close(self):
+        self._zip.close()
+
+
+def open_archive(run_folder):
+    """
+    :param run_folder: папка запуска <dataFolder>/<name>
+    :return: RunArchive (один на процесс, пока файл не изменился) или None, если запуск не заархивирован
+    """
+    filename = os.path.abspath(archive_path(run_folder))
+    try:
+        stat = os.stat(filename)
+    except OSError:
+        return None
+    stamp = (stat.st_mtime_ns, stat.st_size, os.getpid())
+    with _lock:
+        known = _archives.get(filename)
+        if known is not None and known[:3] == stamp:
+            return known[3]
+        if known is not None and known[2] == stamp[2]:
+            known[3].close()
+        archive = RunArchive(filename)
+        _archives[filename] = stamp + (archive,)
+    return archive
+
+
+def snapshot_names(out_folder):
+    """
+    :return: отсортированный список имен файлов состояний (momenta_*.txt),
+        которые есть в текстовом или в бинарном виде или в архиве запуска
+    """
+    names = set(snapshots.snapshot_names(out_folder))
+    archive = open_archive(os.path.dirname(os.path.abspath(out_folder)))
+    if archive is not None:
+        names.update(archive.names)
+    return sorted(names)
+
+
+def _archive_of(filename):
+    """
+    :return: архив запуска, из которого read_vectors прочитает состояние filename, или None
+    """
+    if snapshots.has_binary_snapshot(filename) or os.path.exists(filename):
+        return None
+    archive = open_archive(os.path.dirname(os.path.dirname(os.path.abspath(filename))))
+    if archive is None or os.path.basename(filename) not in archive:
+        return None
+    return archive
+
+
+def snapshot_source(filename):
+    """
+    :return: путь к файлу, из которого read_vectors читает состояние: бинарная копия, текстовый файл
+        или архив запуска
+    """
+    if snapshots.has_binary_snapshot(filename):
+        return snapshots.binary_path(filename)
+    archive = _archive_of(filename)
+    return filename if archive is None else archive.filename
+
+
+def read_vectors(filename):
+    """
+    Читает состояние так же, как snapshots.read_vectors, а состояние, которого нет ни в текстовом,
+    ни в бинарном виде, -- из архива запуска
+    :param filename: путь к текстовому файлу состояния
+    :return: массив векторов в формате (x1, y1, z1, x2, y2, z2),
+        массив координат (x, y, z) и массив с номером ячейки (x, y, z)
+    """
+    archive = _archive_of(filename)
+    if archive is not None:
+        return archive.read_vectors(os.path.basename(filename))
+    return snapshots.read_vectors(filename)
+
+
+def archive_run(settings, dtype=np.float64, remove=False, chunk=None):
+    """
+    Упаковывает состояния запуска и его файлы (settings_<name>.json, log.log, out/sample.json,
+    out/reductions.txt) в <dataFolder>/<name>/archive.zip
+    :param settings: настройки запуска
+    :param dtype: тип, в котором хранятся моменты (np.float64 -- без потерь)
+    :param remove: удалять ли текстовые и бинарные файлы состояний после упаковки
+        (остальные файлы запуска остаются на месте); файлы удаляются только после проверки записанного архива
+        и только внутри папки запуска (см. snapshots.check_own_folder)
+    :param chunk: число состояний в сжимаемом блоке (см. write_archive)
+    :return: количество упакованных состояний
+    """
+    run_folder = '{}/{}'.format(settings.dataFolder, settings.name)
+    out_folder = '{}/out'.format(run_folder)
+    if remove:
+        snapshots.check_own_folder(out_folder)
+    names = snapshot_names(out_folder)
+    if not names:
+        raise ValueError('run {} has no snapshots'.format(settings.name))
+    paths = ['{}/{}'.format(out_folder, name) for name in names]
+    _, points, cells = read_vectors(paths[0])
+    files = [path for path in ('{}/settings_{}.json'.format(run_folder, settings.name),
+                               '{}/log.log'.format(run_folder),
+                               '{}/{}'.format(out_folder, snapshots.SAMPLE_FILE),
+                               '{}/{}'.format(out_folder, snapshots.REDUCTIONS_FILE)) if os.path.exists(path)]
+
+    def moments():
+        for path in paths:
+            vectors = read_vectors(path)[0]
+            yield vectors[:, 3:] - vectors[:, :3]
+
+    filename = '{}/{}'.format(run_folder, ARCHIVE_FILE)
+    write_archive(filename, names, moments(), points, cells, files, dtype, chunk)
+    if remove:
+        # файлы удаляются, только если записанный архив читается и содержит все состояния
+        archive = RunArchive(filename)
+        try:
+            missing = [name for name in names if name not in archive]
+        finally:
+            archive.close()
+        if missing:
+            raise ValueError('{}: {} snapshots are missing, nothing removed'.format(filename, len(missing)))
+        real_out = os.path.realpath(out_folder)
+        for path in paths:
+            binary = snapshots.binary_path(path), snapshots.binary_folder(real_out)
+            for snapshot, folder in ((path, real_out), binary):
+                # символические ссылки, ведущие за пределы папки запуска, не удаляются
+                if os.path.exists(snapshot) and os.path.dirname(os.path.realpath(snapshot)) == folder:
+                    os.remove(snapshot)
+    return len(names)
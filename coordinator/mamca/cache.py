@@ -0,0 +1,168 @@
+"""
+Дисковый кэш результатов обработки состояний образца
+
+Результаты (разобранные массивы, суммарные моменты) хранятся в папке <dataFolder>/.cache
+в виде .npz файлов. Ключ -- путь к файлу состояния, время его изменения, размер
+и поля настроек, от которых зависит результат. Размер кэша ограничен,
+при превышении удаляются давно не использованные записи (LRU по времени изменения записи)
+"""
+
+import hashlib
+import json
+import os
+
+import numpy as np
+
+from .archive import ARCHIVE_FILE, snapshot_source
+
+CACHE_FOLDER = '.cache'
+
+# максимальный размер кэша по умолчанию [байт]
+CACHE_MAX_SIZE = 2 ** 30
+
+# поля настроек, от которых зависит фильтрация частиц
+BORDERS_FIELDS = ('borders', 'leftX', 'rightX', 'leftY', 'rightY')
+
+# включен ли кэш
+enabled = True
+
+# кэши по папкам с данными
+_caches = {}
+
+
+class SnapshotCache:
+    def __init__(self, folder, max_size=CACHE_MAX_SIZE):
+        """
+        :param folder: папка, в которой хранятся записи кэша
+        :param max_size: максимальный суммарный размер записей [байт]
+        """
+        self.folder = folder
+        self.max_size = max_size
+        self._size = None
+
+    def key(self, filename, kind, **params):
+        """
+        :param filename: путь к файлу состояния
+        :param kind: вид результата (например 'data' или 'totals')
+        :param params: параметры, от которых зависит результат
+        :return: ключ записи или None, если файла нет
+        """
+        source = snapshot_source(filename)
+        try:
+            stat = os.stat(source)
+        except OSError:
+            return None
+        if os.path.basename(source) == ARCHIVE_FILE:
+            # в архиве запуска лежат все состояния
+            params = dict(params, snapshot=os.path.basename(filename))
+        description = json.dumps([os.path.abspath(source), stat.st_mtime_ns, stat.st_size, kind, params],
+                                 sort_keys=True)
+        return hashlib.sha1(description.encode('utf-8')).hexdigest()
+
+    def _path(self, key):
+        return os.path.join(self.folder, key + '.npz')
+
+    def get(self, key):
+        """
+        :return: словарь массивов или None, если записи нет
+        """
+        if key is None:
+            return None
+        path = self._path(key)
+        try:
+            with np.load(path) as data:
+                result = {name: data[name] for name in data.files}
+        except (OSError, ValueError):
+            return None
+        # отметка об использовании записи; запись могла быть только что удалена другим процессом
+        try:
+            os.utime(path, None)
+        except OSError:
+            pass
+        return result
+
+    def put(self, key, **arrays):
+        if key is None:
+            return
+        if not os.path.exists(self.folder):
+            os.makedirs(self.folder, exist_ok=True)
+        path = self._path(key)
+        temp_path = '{}.{}.tmp'.format(path, os.getpid())
+        with open(temp_path, mode='wb') as f:
+            np.savez(f, **arrays)
+        # размер перезаписываемой записи вычитается, чтобы не считать ее дважды
+        try:
+            old_size = os.path.getsize(path)
+        except OSError:
+            old_size = 0
+        os.replace(temp_path, path)
+        if self._size is None:
+            self._size = self.size()
+        else:
+            self._size += os.path.getsize(path) - old_size
+        if self._size > self.max_size:
+            self.evict()
+
+    def _entries(self):
+        entries = []
+        for entry in os.scandir(self.folder):
+            if entry.name.endswith('.npz'):
+                try:
+                    stat = entry.stat()
+                except OSError:
+                    # запись удалена другим процессом
+                    continue
+                entries.append((stat.st_mtime, stat.st_size, entry.path))
+        return entries
+
+    def size(self):
+        """
+        :return: суммарный размер записей кэша [байт]
+        """
+        if not os.path.exists(self.folder):
+            return 0
+        return sum(size for _, size, _ in self._entries())
+
+    def evict(self):
+        """
+        Удаляет давно не использованные записи, пока размер кэша больше max_size
+        """
+        entries = sorted(self._entries())
+        size = sum(size for _, size, _ in entries)
+        for _, entry_size, path in entries:
+            if size <= self.max_size:
+                break
+            try:
+                os.remove(path)
+            except OSError:
+                continue
+            size -= entry_size
+        self._size = size
+
+    def clear(self):
+        if os.path.exists(self.folder):
+            for _, _, path in self._entries():
+                try:
+                    os.remove(path)
+                except OSError:
+                    pass
+        self._size = 0
+
+
+def get_cache(settings):
+    """
+    :return: кэш для папки с данными из настроек или None, если кэш выключен
+    """
+    if not enabled:
+        return None
+    folder = os.path.abspath(os.path.join(settings.dataFolder, CACHE_FOLDER))
+    if folder not in _caches:
+        _caches[folder] = SnapshotCache(folder)
+    return _caches[folder]
+
+
+def borders_params(settings):
+    """
+    :return: значения полей настроек, от которых зависит фильтрация частиц
+    """
+    return {field: settings[field] for field in BORDERS_FIELDS}
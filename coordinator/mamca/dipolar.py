@@ -0,0 +1,175 @@
+"""
+Диполь-дипольное поле на решетке колец через быстрое преобразование Фурье
+
+Частицы образца стоят в узлах решетки ячеек (x, y, z) с шагами (d + offset_x, d + offset_y, 1 + offset_z),
+в каждой ячейке -- кольцо из n частиц. Частицы с одинаковым номером в кольце образуют подрешетку, и поле,
+создаваемое подрешеткой k' на подрешетке k, -- свертка моментов с тензором (3 n n^T - I) / r^3.
+Свертка считается через FFT за O(N log N) для любого радиуса взаимодействия, в том числе без обрезания
+на dipolDistance. Фурье-образы тензоров зависят только от геометрии и считаются один раз на процесс.
+
+Вдоль непериодических осей решетка дополняется нулями (свертка без заворачивания), вдоль периодических
+(cyclicBoundaries, см. neighbors.lattice_box) взаимодействие берется с ближайшим образом частицы.
+Если два образа на одном расстоянии (смещение ровно в половину периода), берутся оба с весом 1/2:
+поле не зависит от того, в какую сторону округлено смещение, и взаимодействие пары симметрично.
+Память под тензоры -- 9 * n^2 комплексных чисел на ячейку дополненной решетки
+"""
+
+import threading
+
+import numpy as np
+
+from .neighbors import lattice_box
+
+# тензоры по геометриям
+_kernels = {}
+_lock = threading.Lock()
+
+
+def _fft_size(size, periodic):
+    # без заворачивания нужны разности номеров ячеек от -(size - 1) до size - 1
+    if periodic or size == 1:
+        return size
+    return 2 * size
+
+
+def ring_offsets(settings):
+    """
+    :return: смещения частиц кольца от узла решетки (n, 3)
+    """
+    beta = np.arange(settings.n) * (2 * np.pi / settings.n)
+    r = settings.d / 2
+    return np.column_stack((r * np.cos(beta), r * np.sin(beta), np.zeros(settings.n)))
+
+
+def lattice_loc(settings):
+    """
+    :return: координаты частиц образца в порядке конструктора Sample (N, 3)
+    """
+    cells = np.stack(np.meshgrid(np.arange(settings.x), np.arange(settings.y), np.arange(settings.z),
+                                 indexing='ij'), axis=-1).reshape(-1, 1, 3)
+    periods = np.array([settings.d + settings.offset_x, settings.d + settings.offset_y, 1 + settings.offset_z])
+    return (cells * periods + ring_offsets(settings)[np.newaxis]).reshape(-1, 3)
+
+
+# допуск (относительно периода), с которым смещение считается равным половине периода
+TIE_TOLERANCE = 1e-9
+
+
+def _images(r, box):
+    """
+    Ближайшие образы векторов r при периодах box (0 -- ось не периодическая)
+    :return: список пар (образы r, веса): при смещении ровно в половину периода -- оба образа с весом 1/2
+    """
+    r = r.copy()
+    periodic = box > 0
+    r[..., periodic] -= box[periodic] * np.round(r[..., periodic] / box[periodic])
+    images = [(r, np.ones(r.shape[:-1]))]
+    for axis in np.nonzero(periodic)[0]:
+        tie = np.abs(np.abs(r[..., axis]) - box[axis] / 2) <= TIE_TOLERANCE * box[axis]
+        if not tie.any():
+            continue
+        split = []
+        for image, weight in images:
+            flipped = image.copy()
+            flipped[..., axis] = np.where(tie, -image[..., axis], image[..., axis])
+            split.append((image, np.where(tie, weight / 2, weight)))
+            split.append((flipped, np.where(tie, weight / 2, 0)))
+        images = split
+    return images
+
+
+class DipolarKernel:
+    def __init__(self, settings, cutoff=None):
+        """
+        Считает Фурье-образы тензоров взаимодействия для геометрии образца
+        :param settings: настройки образца (используются только поля геометрии и cyclicBoundaries)
+        :param cutoff: радиус обрезания взаимодействия (None -- без обрезания)
+        """
+        self.shape = (settings.x, settings.y, settings.z)
+        self.n = settings.n
+        box = lattice_box(settings)
+        self.box = np.zeros(3) if box is None else box
+        periodic = self.box > 0
+        if cutoff is not None and (cutoff > self.box[periodic] / 2).any():
+            raise ValueError('dipole cutoff {} must not exceed half of the period {}'.format(cutoff, self.box))
+        self.fft_shape = tuple(_fft_size(size, p) for size, p in zip(self.shape, periodic))
+
+        # разность номеров ячеек (c_i - c_j) для каждого элемента дополненной решетки
+        deltas = []
+        for size, fft_size in zip(self.shape, self.fft_shape):
+            delta = np.arange(fft_size)
+            if fft_size != size:
+                delta = np.where(delta < size, delta, delta - fft_size)
+            deltas.append(delta)
+        delta = np.stack(np.meshgrid(*deltas, indexing='ij'), axis=-1)
+        periods = np.array([settings.d + settings.offset_x, settings.d + settings.offset_y, 1 + settings.offset_z])
+        offsets = ring_offsets(settings)
+
+        kernel = np.zeros((self.n, self.n, 3, 3) + self.fft_shape)
+        identity = np.eye(3)
+        for k in range(self.n):
+            for k2 in range(self.n):
+                # вектор от частицы i (подрешетка k) до частицы j (подрешетка k2)
+                r = -delta * periods + (offsets[k2] - offsets[k])
+                tensor = 0
+                for image, weight in _images(r, self.box):
+                    dist = np.sqrt((image * image).sum(axis=-1))
+                    valid = (dist > 0) & (weight > 0)
+                    # разность -size вдоль непериодической оси не встречается
+                    for axis, (size, fft_size) in enumerate(zip(self.shape, self.fft_shape)):
+                        if fft_size != size:
+                            valid &= delta[..., axis] != -size
+                    if cutoff is not None:
+                        valid &= dist < cutoff
+                    safe = np.where(valid, dist, 1)
+                    n = image / safe[..., np.newaxis]
+                    part = (3 * n[..., :, np.newaxis] * n[..., np.newaxis, :] - identity) / safe[..., np.newaxis, np.newaxis] ** 3
+                    part[~valid] = 0
+                    tensor = tensor + weight[..., np.newaxis, np.newaxis] * part
+                kernel[k, k2] = np.moveaxis(tensor, (-2, -1), (0, 1))
+        self.kernel = np.fft.rfftn(kernel, axes=(4, 5, 6))
+
+    def field(self, m):
+        """
+        :param m: моменты частиц (..., N, 3) в порядке конструктора Sample (по первым осям -- копии образца)
+        :return: сумма (3 (n * m_j) n - m_j) / r^3 по всем частицам j для каждой частицы (..., N, 3)
+        """
+        m = np.asarray(m)
+        lead = m.shape[:-2]
+        x, y, z = self.shape
+        moments = np.moveaxis(m.reshape(lead + (x, y, z, self.n, 3)), (-2, -1), (-5, -4))
+        moments = np.fft.rfftn(moments, s=self.fft_shape, axes=(-3, -2, -1))
+        fields = np.einsum('kKabxyz,...Kbxyz->...kaxyz', self.kernel, moments)
+        fields = np.fft.irfftn(fields, s=self.fft_shape, axes=(-3, -2, -1))[..., :x, :y, :z]
+        return np.moveaxis(fields, (-5, -4), (-2, -1)).reshape(m.shape)
+
+
+def geometry_key(settings, cutoff=None):
+    """
+    :return: ключ, по которому тензоры разных образцов совпадают
+    """
+    box = lattice_box(settings)
+    return (settings.x, settings.y, settings.z, settings.n, settings.d,
+            settings.offset_x, settings.offset_y, settings.offset_z,
+            None if box is None else tuple(box.tolist()), cutoff)
+
+
+def dipolar_kernel(settings, cutoff=None):
+    """
+    :return: DipolarKernel для геометрии образца, посчитанный один раз на процесс
+    """
+    key = geometry_key(settings, cutoff)
+    with _lock:
+        kernel = _kernels.get(key)
+        if kernel is None:
+            kernel = DipolarKernel(settings, cutoff)
+            _kernels[key] = kernel
+        return kernel
+
+
+def clear_kernels():
+    """
+    Освобождает память, занятую тензорами
+    """
+    with _lock:
+        _kernels.clear()
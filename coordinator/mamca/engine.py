@@ -0,0 +1,606 @@
+"""
+Эталонная реализация модели на numpy (без JVM и Mathematica)
+
+Повторяет релаксацию Sample/Particle из моделирующей программы: эффективное поле (диполь-дипольное,
+обменное и внешнее), поворот момента к минимуму энергии с учетом вязкости и остановку по relative_precision.
+Состояние образца хранится массивами (N, 3), и каждый шаг релаксации выполняется сразу для всех частиц.
+Результаты записываются в том же виде, что и у моделирующей программы (out/sample.json, out/momenta_*.txt,
+log.log), поэтому графики, таблицы гистерезиса и store работают с ними без изменений.
+
+Отличия от моделирующей программы:
+    - случайные начальные состояния берутся из numpy, а не из java.util.Random;
+    - корни уравнения минимумов ищутся численно (quartic.real_roots),
+      а не через NSolve с округлением коэффициентов до MATH_DIGITS знаков;
+    - тепловые прыжки (t > 0) не реализованы;
+    - при cyclicBoundaries соседи ищутся с учетом периодических образов по x и y (neighbors.lattice_box)
+"""
+
+import os
+import shutil
+import sys
+import time
+
+import numpy as np
+
+from .executors import exit_program
+from .hysteresis import REDUCTIONS_FILE, reduction_masks, roi_selection, write_reductions, write_reductions_header
+from .dipolar import dipolar_kernel, lattice_loc
+from .neighbors import lattice_box, neighbor_list
+from .quartic import real_roots
+from .settings import Settings
+from .snapshots import SAMPLE_FILE, read_sample, write_sample
+from .store import register_run, reuse_run
+
+# константы (Constants.kt)
+PI2 = 2 * np.pi
+MU_0 = 4 * np.pi * 1.0e-7
+DIPOL_CONST = MU_0 / (4 * np.pi) * 1e27
+MU_B = 927.40096820e-26
+K = 1.3806485279e-23
+EV_TO_DJ = 1.602176620898e-19
+DJ_TO_EV = 1 / EV_TO_DJ
+S_TO_NS = 1e9
+NS_TO_S = 1 / S_TO_NS
+NM_TO_M = 1e-9
+OE_TO_TESLA = 1e-4
+TESLA_TO_OE = 1 / OE_TO_TESLA
+PERCENT_COEFFICIENT = 0.01
+DELTA = 1e-20
+
+# ветви гистерезиса (Settings.kt)
+ALL, TWO, FST, NEG, POS = 'all', 'two', 'fst', 'neg', 'pos'
+BRANCHES = (ALL, TWO, FST, NEG, POS)
+
+# способы расчета диполь-дипольного поля: суммирование по соседям ближе dipolDistance (как в моделирующей
+# программе), свертка через FFT с тем же обрезанием и свертка через FFT без обрезания (dipolar.py)
+DIPOLE_METHODS = ('pairs', 'fft', 'full')
+
+# максимальное число пар (с учетом копий образца), для которых поле считается за один раз:
+# при большем числе промежуточные массивы не помещаются в кэш процессора
+PAIRS_CHUNK = 1 << 18
+
+# формат строки файла состояния: концы момента, координаты частицы (с точностью double) и номер ячейки
+MOMENTA_FORMAT = ' '.join(['%.17g'] * 9 + ['%d'] * 3)
+
+
+def rescale_settings(settings):
+    """
+    Переводит поля настроек в единицы измерения модели (rescaleSettingsFields в Main.kt)
+    :return: копия настроек
+    """
+    s = settings.copy()
+    s.relative_precision *= PERCENT_COEFFICIENT
+    s.jex /= EV_TO_DJ
+    s.time *= S_TO_NS
+    s.b_x *= OE_TO_TESLA
+    s.b_y *= OE_TO_TESLA
+    s.b_z *= OE_TO_TESLA
+    return s
+
+
+def _dot(u, v):
+    return np.einsum('...j,...j->...', u, v)
+
+
+def _abs(v):
+    return np.sqrt(_dot(v, v))
+
+
+def _direction(v):
+    return v / _abs(v)[..., np.newaxis]
+
+
+def _polar(theta, phi):
+    # единичные векторы по полярным углам (Vector(1.0, theta, phi, polar = true))
+    sin_theta = np.sin(theta)
+    return np.column_stack((sin_theta * np.cos(phi), sin_theta * np.sin(phi), np.cos(theta)))
+
+
+def angle_to(v, other, e_z):
+    """
+    Направленный угол вектора v относительно other в плоскости с нормалью e_z (Vector.angleTo)
+    """
+    e_x = _direction(other)
+    e_y = _direction(np.cross(e_z, e_x))
+    return np.arctan2(_dot(v, e_y), _dot(v, e_x))
+
+
+def rotate(axis, angle, v):
+    """
+    Поворачивает векторы v вокруг осей axis на углы angle (Matrix(axis, theta) * v)
+    """
+    x, y, z = _direction(axis).T
+    cos = np.cos(angle)
+    minus_cos = 1 - cos
+    sin = np.sin(angle)
+    vx, vy, vz = v.T
+    return np.column_stack((
+        (cos + minus_cos * x * x) * vx + (minus_cos * x * y - sin * z) * vy + (minus_cos * x * z + sin * y) * vz,
+        # первый элемент второй строки -- в точности как в Matrix.kt, чтобы результаты совпадали
+        (minus_cos * y * z + sin * z) * vx + (cos + minus_cos * y * y) * vy + (minus_cos * y * z - sin * x) * vz,
+        (minus_cos * z * x - sin * y) * vx + (minus_cos * z * y + sin * x) * vy + (cos + minus_cos * z * z) * vz
+    ))
+
+
+def _sum_by_row(indptr, values):
+    """
+    Суммы по строкам списка соседей в формате CSR
+    :param values: значения для каждой пары (число пар, ...)
+    :return: массив (число частиц, ...)
+    """
+    sums = np.zeros((len(indptr) - 1,) + values.shape[1:])
+    nonempty = indptr[:-1] < indptr[1:]
+    if nonempty.any():
+        sums[nonempty] = np.add.reduceat(values, indptr[:-1][nonempty], axis=0)
+    return sums
+
+
+class Sample:
+    def __init__(self, settings, random=None, dipole='pairs'):
+        """
+        Создает образец (конструктор Sample(settings) в Sample.kt)
+        :param settings: настройки в единицах файла настроек (переводятся rescale_settings)
+        :param random: np.random.RandomState для случайных начальных состояний
+        :param dipole: способ расчета диполь-дипольного поля (DIPOLE_METHODS)
+        """
+        if dipole not in DIPOLE_METHODS:
+            raise ValueError('dipole must be one of {}, got {!r}'.format(DIPOLE_METHODS, dipole))
+        s = rescale_settings(settings)
+        self.settings = s
+        self.momenta_value = s.m * MU_B
+        self.kt = s.t * K
+        self.v_kan = s.kan * 4 * np.pi * (s.r * NM_TO_M) ** 3 / 3
+        self.delta_digits = int(-np.log10(s.relative_precision)) - 1
+        self.b = np.array([s.b_x, s.b_y, s.b_z])
+        self.log = []
+
+        if s.load:
+            sample = read_sample(s.jsonPath)
+            self.loc, self.m, self.lma, self.cells = sample['loc'], sample['m'], sample['lma'], sample['cells']
+        else:
+            self.loc, self.m, self.lma, self.cells = self._create_particles(s, random or np.random.RandomState())
+        n = len(self.loc)
+
+        box = lattice_box(s)
+        self.dipol_kernel = None
+        if dipole == 'pairs':
+            # соседи и не меняющиеся при релаксации множители диполь-дипольного взаимодействия
+            dipols = neighbor_list(self.loc, s.dipolDistance, box)
+            self.dipol_indices, self.dipol_indptr = dipols.indices, dipols.indptr
+            dist = _abs(dipols.vectors)
+            self.dipol_n = dipols.vectors / dist[:, np.newaxis]
+            self.dipol_inv_r3 = 1 / dist ** 3
+        else:
+            if self.loc.shape != (s.x * s.y * s.z * s.n, 3) or not np.allclose(self.loc, lattice_loc(s)):
+                raise ValueError('FFT dipole field needs particles in the lattice of settings')
+            self.dipol_kernel = dipolar_kernel(s, s.dipolDistance if dipole == 'fft' else None)
+        exchange = neighbor_list(self.loc, s.exchangeDistance, box, vectors=False)
+        self.exchange_indices, self.exchange_indptr = exchange.indices, exchange.indptr
+
+        self.b_eff_external = np.zeros((n, 3))
+        self.b_eff_dipol = np.zeros((n, 3))
+        self.b_eff_exchange = np.zeros((n, 3))
+        self.b_eff = np.zeros((n, 3))
+        # частицы, у которых обнаружилось два минимума
+        self.two_minimums = np.zeros(n, dtype=bool)
+
+    @staticmethod
+    def _create_particles(s, random):
+        number_of_particles = s.x * s.y * s.z * s.n
+        i = np.arange(number_of_particles)
+        cell = i // s.n
+        beta = (i % s.n) * (PI2 / s.n)
+        z = cell % s.z
+        lvl = cell // s.z
+        x = lvl // s.y
+        y = lvl % s.y
+        r = s.d / 2
+        loc = np.column_stack((
+            x * (s.d + s.offset_x) + r * np.cos(beta),
+            y * (s.d + s.offset_y) + r * np.sin(beta),
+            z * (1 + s.offset_z)
+        ))
+
+        def directions(mode, theta, phi, field):
+            if mode == 0:
+                return _polar(np.arccos(2 * random.random_sample(number_of_particles) - 1),
+                              PI2 * random.random_sample(number_of_particles))
+            if mode == 1:
+                return _polar(np.full(number_of_particles, np.pi / 2), PI2 * random.random_sample(number_of_particles))
+            if mode == 2:
+                return _polar(np.full(number_of_particles, np.radians(theta)), np.full(number_of_particles, np.radians(phi)))
+            raise ValueError('{} in settings must be 0..2, but {} given'.format(field, mode))
+
+        m = directions(s.loc, s.loc_theta, s.loc_phi, 'loc')
+        lma = directions(s.ot, s.ot_theta, s.ot_phi, 'ot')
+        return loc, m, lma, np.column_stack((x, y, z))
+
+    def __len__(self):
+        return len(self.loc)
+
+    def _pair_fields(self, m, dipoles=True):
+        """
+        Суммы по спискам соседей: диполь-дипольное поле без множителей (если dipoles) и обменное поле
+        :param m: моменты (K, N, 3); копии образца обрабатываются блоками не больше PAIRS_CHUNK пар
+        :return: массивы (K, N, 3)
+        """
+        block = max(1, PAIRS_CHUNK // max(len(self.dipol_indices) if dipoles else len(self.exchange_indices), 1))
+        if len(m) > block:
+            parts = [self._pair_fields(m[first:first + block], dipoles) for first in range(0, len(m), block)]
+            return tuple(np.concatenate(values) for values in zip(*parts))
+        # копии образца -- по последней оси, чтобы значения каждой пары лежали в памяти подряд
+        m = np.ascontiguousarray(np.moveaxis(m, 0, -1))
+        fields = [_sum_by_row(self.exchange_indptr, m[self.exchange_indices])]
+        if dipoles:
+            m_j = m[self.dipol_indices]
+            dipols = 3 * np.einsum('pa,pak->pk', self.dipol_n, m_j)[:, np.newaxis, :] * self.dipol_n[:, :, np.newaxis]
+            dipols -= m_j
+            dipols *= self.dipol_inv_r3[:, np.newaxis, np.newaxis]
+            fields.insert(0, _sum_by_row(self.dipol_indptr, dipols))
+        return tuple(np.moveaxis(v, -1, 0) for v in fields)
+
+    def _fields(self, m):
+        """
+        :param m: моменты (N, 3) или (K, N, 3) для K копий образца
+        :return: диполь-дипольное и обменное поле того же размера
+        """
+        replicas = m.reshape((-1,) + m.shape[-2:])
+        if self.dipol_kernel is not None:
+            dipols = self.dipol_kernel.field(replicas)
+            exchange, = self._pair_fields(replicas, dipoles=False)
+        else:
+            dipols, exchange = self._pair_fields(replicas)
+        return (dipols.reshape(m.shape) * self.momenta_value * DIPOL_CONST,
+                exchange.reshape(m.shape) * self.settings.jex * self.momenta_value)
+
+    def compute_effective_field(self):
+        """
+        Расчет эффективного магнитного поля всех частиц
+        """
+        self.b_eff_external = np.broadcast_to(self.b, self.m.shape)
+        self.b_eff_dipol, self.b_eff_exchange = self._fields(self.m)
+        self.b_eff = self.b_eff_dipol + self.b_eff_exchange + self.b_eff_external
+
+    def compute_energy(self):
+        """
+        :return: суммарная энергия образца
+        """
+        return self._energy(self.m, self.lma, self.b_eff)
+
+    def _energy(self, m, lma, b_eff):
+        c = np.cross(m, lma)
+        e = self.v_kan * _dot(c, c) + self.momenta_value * (_dot(m, b_eff) - _abs(m) * _abs(b_eff))
+        return e.sum(axis=-1)
+
+    def compute_energies(self):
+        """
+        :return: суммарная энергия образца и список энергий (E_field, E_dipol, E_exchange, E_anisotropy)
+        """
+        m_abs = _abs(self.m)
+
+        def energy(b):
+            return ((-_dot(self.m, b) + m_abs * _abs(b)) * self.momenta_value).sum(axis=-1)
+
+        c = np.cross(self.m, self.lma)
+        e_an = (self.v_kan * _dot(c, c)).sum(axis=-1)
+        energies = [energy(np.asarray(self.b_eff_external)), energy(self.b_eff_dipol), energy(self.b_eff_exchange), e_an]
+        return sum(energies), energies
+
+    def _minimum_angles(self, m, lma, b_abs, theta, e_z):
+        """
+        Выбирает минимум энергии, в который скатывается момент (Particle.optimizeEnergy)
+        :return: углы минимумов и маска частиц, у которых два минимума
+        """
+        t = b_abs * self.momenta_value
+        a = np.full(len(t), 4 * self.v_kan)
+        b = t * np.sin(theta)
+        c = 2 * t * np.cos(theta)
+        roots = 2 * np.arctan(real_roots(a, b, c))
+
+        # энергия в экстремумах; отсутствующие корни после сортировки оказываются в конце
+        energies = self.v_kan * np.sin(roots) ** 2 - \
+            b_abs[:, np.newaxis] * (np.cos(roots - theta[:, np.newaxis]) - 1) * self.momenta_value
+        order = np.argsort(energies, axis=1)
+        roots = roots[np.arange(len(roots))[:, np.newaxis], order]
+        count = (~np.isnan(roots)).sum(axis=1)
+        # первая половина экстремумов по энергии -- минимумы, вторая -- максимумы
+        n_mins = count - count // 2
+        if (n_mins == 0).any():
+            raise NotImplementedError('no minimums of energy found')
+
+        phi = roots[:, 0].copy()
+        two = n_mins == 2
+        if two.any():
+            current = angle_to(lma[two], m[two], e_z[two])
+            mins = roots[two]
+            delta = mins[:, 0] - current
+            delta[delta < 0] += PI2
+            # максимумы лежат после двух минимумов
+            maxs = np.where(np.arange(4) >= 2, mins, np.nan) - current[:, np.newaxis]
+            maxs[maxs < 0] += PI2
+            # если между текущим углом и минимумом нечетное число максимумов, момент падает во второй минимум
+            crossed = (delta[:, np.newaxis] - maxs > 0).sum(axis=1)
+            phi[two] = np.where(crossed % 2 == 0, mins[:, 0], mins[:, 1])
+        return phi, two
+
+    def optimize_particles(self):
+        """
+        Поворачивает моменты всех частиц к минимумам энергии при текущем эффективном поле
+        """
+        shape = self.m.shape
+        m, two = self._optimized(self.m.reshape(-1, 3), self.lma.reshape(-1, 3), self.b_eff.reshape(-1, 3))
+        self.m = m.reshape(shape)
+        self.two_minimums = two.reshape(shape[:-1])
+
+    def _optimized(self, m, lma, b_eff):
+        """
+        :param m, lma, b_eff: моменты, оси анизотропии и эффективное поле частиц (число частиц, 3)
+        :return: моменты после поворота и маска частиц, у которых два минимума
+        """
+        b_abs = _abs(b_eff)
+        zero = b_abs < DELTA
+        b_cross = np.cross(b_eff, lma)
+        kollinear = ~zero & (_abs(b_cross) < DELTA)
+        general = ~zero & ~kollinear
+
+        with np.errstate(divide='ignore', invalid='ignore'):
+            m_cross = np.cross(m, lma)
+            if (kollinear & (_abs(m_cross) < DELTA)).any():
+                # в моделирующей программе этот случай тоже не реализован
+                raise NotImplementedError('momenta, field and anisotropy axis are kollinear')
+            e_z = np.where(general[:, np.newaxis], _direction(b_cross), _direction(m_cross))
+
+            theta = np.where(_dot(lma, b_eff) < 0, np.pi, 0.0)
+            theta[general] = angle_to(lma[general], b_eff[general], e_z[general])
+
+            # поворот момента в плоскость поля и анизотропии
+            m = m.copy()
+            m[general] -= e_z[general] * _dot(m[general], e_z[general])[:, np.newaxis]
+            m[general] = _direction(m[general])
+
+            phi = np.empty(len(m))
+            # если поля нет (частица одна)
+            phi[zero] = angle_to(m[zero], lma[zero], e_z[zero])
+            field = ~zero
+            two = np.zeros(len(m), dtype=bool)
+            if field.any():
+                phi[field], two[field] = self._minimum_angles(
+                    m[field], lma[field], b_abs[field], theta[field], e_z[field])
+
+            current = angle_to(lma, m, e_z)
+            return rotate(e_z, (current - phi) * self.settings.viscosity, m), two
+
+    def optimize_energy(self, old_energy=None):
+        """
+        Один шаг релаксации
+        :return: энергии до и после шага
+        """
+        if old_energy is None:
+            old_energy = self.compute_energy()
+        self.optimize_particles()
+        self.compute_effective_field()
+        return old_energy, self.compute_energy()
+
+    def _format_energies(self, energies):
+        e, (field, dipol, exchange, an) = energies
+        return '{:.2e}, (an: {:.2e}, dipol: {:.2e}, exchange: {:.2e}, field: {:.2e})'.format(
+            *(v * DJ_TO_EV for v in (e, an, dipol, exchange, field)))
+
+    def process_relaxation(self):
+        """
+        Релаксация до тех пор, пока относительное изменение энергии не станет меньше relative_precision,
+        но не больше precision шагов (Sample.processRelaxation)
+        :return: (энергии до релаксации, энергии после релаксации, количество шагов)
+        """
+        s = self.settings
+        self.compute_effective_field()
+        start_energies = self.compute_energies()
+        energies = self.optimize_energy()
+
+        def compute_delta():
+            return abs((energies[0] - energies[1]) / energies[0])
+
+        relative_delta = compute_delta()
+        number_of_steps = 1
+        ended_with_precision = True
+        for i in range(1, s.precision):
+            if relative_delta < s.relative_precision:
+                ended_with_precision = False
+                self.log.append('precision = {}, relative delta = {:.{}f}%'.format(
+                    i, relative_delta * 100, max(self.delta_digits, 0)))
+                break
+            energies = self.optimize_energy(energies[1])
+            relative_delta = compute_delta()
+            number_of_steps += 1
+        if ended_with_precision:
+            self.log.append('Processing ended with precision. Relative delta energy is {:.{}f}%'.format(
+                relative_delta * 100, max(self.delta_digits, 0)))
+
+        end_energies = self.compute_energies()
+        self.log.append('start energy: {}'.format(self._format_energies(start_energies)))
+        self.log.append('  end energy: {}'.format(self._format_energies(end_energies)))
+        return start_energies, end_energies, number_of_steps
+
+    def save_state(self, filename, mask=None):
+        """
+        Записывает состояние моментов в формате out/momenta_*.txt
+        :param mask: маска записываемых частиц (None -- все частицы)
+        """
+        half = self.m / 2
+        data = np.hstack((self.loc - half, self.loc + half, self.loc, self.cells))
+        np.savetxt(filename, data if mask is None else data[mask], fmt=MOMENTA_FORMAT)
+
+    def dump(self, filename):
+        """
+        Записывает образец в sample.json (его можно загрузить, load = true)
+        """
+        write_sample(filename, self.loc, self.m, self.lma, self.cells)
+
+
+def _vector_abs(v):
+    x, y, z = v
+    return np.sqrt(x * x + y * y + z * z)
+
+
+def hysteresis_fields(settings):
+    """
+    Значения поля на шагах гистерезиса (hysteresisRun в Main.kt)
+    :param settings: настройки в единицах модели (rescale_settings)
+    :return: список (номер шага, ветвь, поле [Тл], время шага [нс])
+    """
+    branch = settings.hysteresisBranch
+    k = settings.hysteresisSteps
+    dense_steps = settings.hysteresisDenseSteps
+    multiplier = settings.hysteresisDenseMultiplier
+
+    max_b = (settings.b_x, settings.b_y, settings.b_z)
+    border_b = tuple(c * dense_steps / k for c in max_b)
+    lin_step = tuple(c / k for c in max_b)
+    dense_step = tuple(c / multiplier for c in lin_step)
+    default_time = settings.time
+    dense_time = settings.time / multiplier
+
+    fields = []
+    state = {'b': (0.0, 0.0, 0.0), 'index': 1, 'time': default_time}
+
+    def step(inc, direction):
+        fields.append((state['index'], direction, state['b'], state['time']))
+        state['index'] += 1
+        if _vector_abs(state['b']) < _vector_abs(border_b):
+            value = dense_step
+            state['time'] = dense_time
+        else:
+            value = lin_step
+            state['time'] = default_time
+        sign = 1 if inc else -1
+        state['b'] = tuple(b + sign * v for b, v in zip(state['b'], value))
+        return _vector_abs(state['b']) > _vector_abs(max_b)
+
+    def branch_steps(start, inc, last_inc, direction):
+        state['b'] = start
+        while not step(inc, direction):
+            pass
+        step(last_inc, direction)
+
+    if branch in (ALL, FST):
+        branch_steps((0.0, 0.0, 0.0), True, True, FST)
+    if branch in (ALL, TWO, NEG):
+        branch_steps(max_b, False, False, NEG)
+    if branch in (ALL, TWO, POS):
+        branch_steps(tuple(-c for c in max_b), True, False, POS)
+    return fields
+
+
+def hysteresis_digits(settings):
+    """
+    :return: число цифр номера шага в именах файлов гистерезиса
+    """
+    n = settings.hysteresisDenseSteps * settings.hysteresisDenseMultiplier
+    return len(str(2 * (n + settings.hysteresisSteps - settings.hysteresisDenseSteps) + 1))
+
+
+def saves_snapshot(settings, step):
+    """
+    :param step: номер шага гистерезиса (с единицы)
+    :return: записывается ли на этом шаге полное состояние (hysteresisRun в Main.kt)
+    """
+    stride = settings.snapshotStride
+    return not settings.reductionsOnly and stride > 0 and (step - 1) % stride == 0
+
+
+def _field_name(b):
+    return '_'.join('{:.3f}'.format(c * TESLA_TO_OE) for c in b)
+
+
+def _prepare_folders(settings):
+    # очищает папку запуска и создает out и moments (prepareFolders в Main.kt)
+    run_folder = '{}/{}'.format(settings.dataFolder, settings.name)
+    if os.path.isdir(run_folder):
+        for entry in os.listdir(run_folder):
+            path = os.path.join(run_folder, entry)
+            if os.path.isdir(path) and not os.path.islink(path):
+                shutil.rmtree(path)
+            else:
+                os.remove(path)
+    for folder in ('out', 'moments'):
+        os.makedirs('{}/{}'.format(run_folder, folder), exist_ok=True)
+    return run_folder
+
+
+def simulate(settings, random=None, stdout=None, dipole='pairs'):
+    """
+    Моделирование с записью результатов в <dataFolder>/<name> (runSimulation в Main.kt)
+    :param settings: настройки (Settings)
+    :param random: np.random.RandomState для случайных начальных состояний
+    :param stdout: файл для вывода (по умолчанию sys.stdout)
+    :param dipole: способ расчета диполь-дипольного поля (DIPOLE_METHODS)
+    :return: образец после моделирования
+    """
+    stdout = stdout or sys.stdout
+    if settings.hysteresis and settings.hysteresisBranch not in BRANCHES:
+        raise ValueError('`hysteresisBranch` property can only be only `fst`, `neg`, `pos`, `two` or `all`')
+    if settings.t > 0:
+        raise ValueError('`t` property must be 0: thermal jumps are simulated only by the java sample')
+    if settings.snapshotStride < 0:
+        raise ValueError('`snapshotStride` property must be non-negative')
+
+    start_time = time.time()
+    run_folder = _prepare_folders(settings)
+    out_folder = '{}/out'.format(run_folder)
+    settings.save_settings('{}/settings_{}.json'.format(run_folder, settings.name))
+
+    sample = Sample(settings, random, dipole)
+    sample.dump('{}/{}'.format(out_folder, SAMPLE_FILE))
+    roi = roi_selection(settings)
+    roi_mask = None if roi is None else roi.mask(sample.cells)
+    mid_time = time.time()
+    if not settings.hysteresis:
+        sample.save_state('{}/momenta_00_1_{:.9f}.txt'.format(out_folder, 0.0), roi_mask)
+        start, end, steps = sample.process_relaxation()
+        sample.save_state('{}/momenta_00_2_{:.9f}.txt'.format(out_folder, 0.0), roi_mask)
+        sample.log.append('diff between energies is {:.2e}'.format((start[0] - end[0]) * DJ_TO_EV))
+        sample.log.append('number of simulation steps is {}'.format(steps))
+    else:
+        fields = hysteresis_fields(sample.settings)
+        digits = hysteresis_digits(settings)
+        masks = reduction_masks(settings, sample.cells)
+        with open('{}/{}'.format(out_folder, REDUCTIONS_FILE), mode='w') as reductions:
+            write_reductions_header(reductions, settings)
+            for index, direction, b, _ in fields:
+                print('__________{}__________'.format(settings.name), file=stdout)
+                sample.b = np.array(b)
+                sample.log.append('b: ({})'.format(_field_name(b).replace('_', ', ')))
+                sample.log.append('step: {} of {}'.format(index, len(fields)))
+                sample.process_relaxation()
+                write_reductions(reductions, settings, index, direction, _field_name(b).split('_'), sample.m, masks)
+                if saves_snapshot(settings, index):
+                    sample.save_state('{}/momenta_{:0{}d}_{}_{}.txt'.format(
+                        out_folder, index, digits, direction, _field_name(b)), roi_mask)
+    end_time = time.time()
+
+    sample.log.append('time of computation is {:.2f} seconds'.format(end_time - mid_time))
+    sample.log.append('time of working is {:.2f} seconds'.format(end_time - start_time))
+    with open('{}/log.log'.format(run_folder), mode='w') as f:
+        f.write('\n'.join(sample.log) + '\n')
+    return sample
+
+
+def engine_run(settings_fname, stdout=None, exit_on_fail=True, reuse=False, seed=None, dipole='pairs'):
+    """
+    Запускает моделирование на numpy, аргументы и результат -- как у executors.single_run
+    (подходит как run для SweepScheduler и adaptive_hysteresis)
+    :param seed: зерно генератора случайных начальных состояний
+    :param dipole: способ расчета диполь-дипольного поля (DIPOLE_METHODS)
+    """
+    settings = Settings(settings_fname)
+    if reuse and reuse_run(settings):
+        return 0
+    try:
+        simulate(settings, np.random.RandomState(seed), stdout, dipole)
+    except (ValueError, NotImplementedError, IOError) as e:
+        print('{}: {}'.format(settings.name, e), file=stdout or sys.stdout)
+        if exit_on_fail:
+            exit_program()
+        return 1
+    register_run(settings)
+    return 0
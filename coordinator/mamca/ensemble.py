@@ -0,0 +1,258 @@
+"""
+Ансамбль копий образца: одна геометрия, разные случайные начальные состояния
+
+При случайных начальных состояниях (loc = 0, ot = 0) одни и те же настройки моделируются с разными зернами,
+а результат усредняется. Здесь K копий образца хранятся одним массивом (K, N, 3) и релаксируют вместе:
+списки соседей и тензоры FFT (engine.Sample) считаются один раз для всех копий, каждый шаг релаксации
+выполняется сразу для всех еще не сошедшихся копий. Каждая копия останавливается по своему relative_precision,
+как отдельный запуск, поэтому копия с номером 0 совпадает с engine.simulate с тем же зерном.
+
+Результат -- таблица среднего по копиям суммарного момента и его разброса на каждом шаге гистерезиса
+"""
+
+import os
+import sys
+import time
+
+import numpy as np
+
+from .engine import BRANCHES, DJ_TO_EV, MOMENTA_FORMAT, Sample, _field_name, hysteresis_fields
+from .hysteresis import HYSTERESIS_DTYPE, REGIONS, _borders_mask
+from .settings import Settings
+from .snapshots import write_sample
+
+ENSEMBLE_FILE = 'ensemble.txt'
+
+# число частиц (по всем копиям), для которых шаг релаксации выполняется за один раз: при большем числе
+# промежуточные массивы не помещаются в кэш процессора, и шаг для всех копий сразу дольше, чем по отдельности
+PARTICLES_CHUNK = 1 << 14
+
+# ветвь в таблице запуска без гистерезиса
+NO_BRANCH = '-'
+
+# таблица гистерезиса (hysteresis.HYSTERESIS_DTYPE) со средним по копиям моментом (mx, my, mz),
+# стандартным отклонением по копиям (dmx, dmy, dmz) и числом копий
+ENSEMBLE_DTYPE = np.dtype(HYSTERESIS_DTYPE.descr + [
+    ('dmx', np.float64),
+    ('dmy', np.float64),
+    ('dmz', np.float64),
+    ('replicas', np.int64),
+])
+
+
+class Ensemble(Sample):
+    def __init__(self, settings, replicas, random=None, dipole='pairs'):
+        """
+        :param settings: настройки в единицах файла настроек
+        :param replicas: число копий образца
+        :param random: np.random.RandomState; копии создаются из него по очереди, первая -- как Sample(settings, random)
+        :param dipole: способ расчета диполь-дипольного поля (engine.DIPOLE_METHODS)
+        """
+        if replicas < 1:
+            raise ValueError('number of replicas must be positive, got {}'.format(replicas))
+        random = random or np.random.RandomState()
+        Sample.__init__(self, settings, random, dipole)
+        m, lma = [self.m], [self.lma]
+        for _ in range(replicas - 1):
+            if self.settings.load:
+                # загруженный образец одинаков для всех копий
+                m.append(self.m)
+                lma.append(self.lma)
+            else:
+                _, replica_m, replica_lma, _ = self._create_particles(self.settings, random)
+                m.append(replica_m)
+                lma.append(replica_lma)
+        self.m = np.stack(m)
+        self.lma = np.stack(lma)
+
+        shape = self.m.shape
+        self.b_eff_dipol = np.zeros(shape)
+        self.b_eff_exchange = np.zeros(shape)
+        self.b_eff = np.zeros(shape)
+        self.two_minimums = np.zeros(shape[:-1], dtype=bool)
+
+    def __len__(self):
+        return self.loc.shape[0]
+
+    @property
+    def replicas(self):
+        return self.m.shape[0]
+
+    def optimize_replicas(self, active):
+        """
+        Один шаг релаксации копий active: поворот моментов и пересчет эффективного поля
+        :param active: номера копий
+        :return: энергии копий active после шага
+        """
+        block = max(1, PARTICLES_CHUNK // len(self))
+        return np.concatenate([self._optimize_block(active[first:first + block])
+                               for first in range(0, len(active), block)])
+
+    def _optimize_block(self, active):
+        lma = self.lma[active]
+        m, two = self._optimized(self.m[active].reshape(-1, 3), lma.reshape(-1, 3), self.b_eff[active].reshape(-1, 3))
+        m = m.reshape(lma.shape)
+        self.m[active] = m
+        self.two_minimums[active] = two.reshape(m.shape[:-1])
+        dipol, exchange = self._fields(m)
+        b_eff = dipol + exchange + self.b
+        self.b_eff_dipol[active] = dipol
+        self.b_eff_exchange[active] = exchange
+        self.b_eff[active] = b_eff
+        return self._energy(m, lma, b_eff)
+
+    def process_relaxation(self):
+        """
+        Релаксация всех копий; каждая копия делает шаги, пока относительное изменение ее энергии не станет
+        меньше relative_precision, но не больше precision шагов (как Sample.process_relaxation)
+        :return: (энергии до релаксации, энергии после релаксации, количество шагов), по копиям
+        """
+        s = self.settings
+        self.compute_effective_field()
+        start_energies = self.compute_energies()
+        old_energies = self.compute_energy()
+        energies = self.optimize_replicas(np.arange(self.replicas))
+
+        steps = np.ones(self.replicas, dtype=np.int64)
+        with np.errstate(divide='ignore', invalid='ignore'):
+            relative_delta = np.abs((old_energies - energies) / old_energies)
+            active = ~(relative_delta < s.relative_precision) & (steps < s.precision)
+            while active.any():
+                index = np.nonzero(active)[0]
+                old_energies[index] = energies[index]
+                energies[index] = self.optimize_replicas(index)
+                relative_delta[index] = np.abs((old_energies[index] - energies[index]) / old_energies[index])
+                steps[index] += 1
+                active = ~(relative_delta < s.relative_precision) & (steps < s.precision)
+
+        end_energies = self.compute_energies()
+        unconverged = np.count_nonzero(~(relative_delta < s.relative_precision))
+        self.log.append('replicas: {}, steps: min {}, mean {:.1f}, max {}, ended with precision: {}'.format(
+            self.replicas, steps.min(), steps.mean(), steps.max(), unconverged))
+        # первый элемент compute_energies -- полные энергии всех копий (K,), среднее берется по копиям
+        start_total, end_total = start_energies[0], end_energies[0]
+        start_total, end_total = start_total * DJ_TO_EV, end_total * DJ_TO_EV
+        self.log.append('over {} replicas: mean start energy: {:.2e}, end energy: mean {:.2e}, min {:.2e}, '
+                        'max {:.2e}'.format(self.replicas, start_total.mean(), end_total.mean(),
+                                            end_total.min(), end_total.max()))
+        return start_energies, end_energies, steps
+
+    def totals(self, masks):
+        """
+        :param masks: маски частиц (None -- все частицы)
+        :return: суммарный момент каждой копии по каждой маске, массив (K, число масок, 3) в магнетонах бора
+        """
+        totals = [self.m.sum(axis=1) if mask is None else self.m[:, mask].sum(axis=1) for mask in masks]
+        return np.stack(totals, axis=1) * self.settings.m
+
+    def save_state(self, filename, replica=0):
+        """
+        Записывает состояние копии replica в формате out/momenta_*.txt
+        """
+        half = self.m[replica] / 2
+        data = np.hstack((self.loc - half, self.loc + half, self.loc, self.cells))
+        np.savetxt(filename, data, fmt=MOMENTA_FORMAT)
+
+    def dump(self, filename, replica=0):
+        """
+        Записывает копию replica в sample.json
+        """
+        write_sample(filename, self.loc, self.m[replica], self.lma[replica], self.cells)
+
+
+def ensemble_table(rows, totals):
+    """
+    :param rows: (номер шага, ветвь, поле [Гс]) для каждого шага
+    :param totals: суммарные моменты копий, массив (число шагов, K, число областей, 3)
+    :return: numpy record array с полями ENSEMBLE_DTYPE
+    """
+    mean = totals.mean(axis=1)
+    spread = totals.std(axis=1)
+    table = []
+    for (step, branch, b), step_mean, step_spread in zip(rows, mean, spread):
+        for region, m, dm in zip(REGIONS, step_mean, step_spread):
+            table.append((step, branch, region) + tuple(b) + tuple(m) + tuple(dm) + (totals.shape[1],))
+    return np.array(table, dtype=ENSEMBLE_DTYPE).view(np.recarray)
+
+
+def write_ensemble_table(filename, table):
+    """
+    Записывает таблицу ансамбля текстом, по строке на шаг и область
+    """
+    with open(filename, mode='w') as f:
+        f.write(' '.join(table.dtype.names) + '\n')
+        for row in table:
+            f.write(' '.join(str(v) for v in row.tolist()) + '\n')
+
+
+def read_ensemble_table(filename):
+    """
+    :return: таблица, записанная write_ensemble_table
+    """
+    with open(filename, mode='r') as f:
+        f.readline()
+        rows = [line.split() for line in f if line.strip()]
+    types = [ENSEMBLE_DTYPE[name].type for name in ENSEMBLE_DTYPE.names]
+    table = [tuple(t(v) for t, v in zip(types, row)) for row in rows]
+    return np.array(table, dtype=ENSEMBLE_DTYPE).view(np.recarray)
+
+
+def simulate_ensemble(settings, replicas, random=None, stdout=None, dipole='pairs'):
+    """
+    Моделирование ансамбля копий с записью таблицы в <dataFolder>/<name>/ensemble.txt и лога в ensemble.log
+    (результаты обычного запуска в этой папке не трогаются)
+    :param settings: настройки (Settings)
+    :param replicas: число копий образца
+    :param random: np.random.RandomState для случайных начальных состояний
+    :param stdout: файл для вывода (по умолчанию sys.stdout)
+    :param dipole: способ расчета диполь-дипольного поля (engine.DIPOLE_METHODS)
+    :return: таблица (ensemble_table) и суммарные моменты копий (число шагов, K, число областей, 3)
+    """
+    stdout = stdout or sys.stdout
+    if settings.hysteresis and settings.hysteresisBranch not in BRANCHES:
+        raise ValueError('`hysteresisBranch` property can only be only `fst`, `neg`, `pos`, `two` or `all`')
+    if settings.t > 0:
+        raise ValueError('`t` property must be 0: thermal jumps are simulated only by the java sample')
+
+    start_time = time.time()
+    run_folder = '{}/{}'.format(settings.dataFolder, settings.name)
+    os.makedirs(run_folder, exist_ok=True)
+    ensemble = Ensemble(settings, replicas, random, dipole)
+    masks = [None, _borders_mask(settings, ensemble.cells)]
+
+    rows, totals = [], []
+    if not settings.hysteresis:
+        ensemble.process_relaxation()
+        rows.append((0, NO_BRANCH, (settings.b_x, settings.b_y, settings.b_z)))
+        totals.append(ensemble.totals(masks))
+    else:
+        fields = hysteresis_fields(ensemble.settings)
+        for index, direction, b, _ in fields:
+            print('__________{}: {} of {}__________'.format(settings.name, index, len(fields)), file=stdout)
+            ensemble.b = np.array(b)
+            ensemble.log.append('b: ({})'.format(_field_name(b).replace('_', ', ')))
+            ensemble.process_relaxation()
+            rows.append((index, direction, tuple(float(c) for c in _field_name(b).split('_'))))
+            totals.append(ensemble.totals(masks))
+    totals = np.stack(totals)
+    table = ensemble_table(rows, totals)
+
+    write_ensemble_table('{}/{}'.format(run_folder, ENSEMBLE_FILE), table)
+    ensemble.log.append('time of working is {:.2f} seconds'.format(time.time() - start_time))
+    with open('{}/ensemble.log'.format(run_folder), mode='w') as f:
+        f.write('\n'.join(ensemble.log) + '\n')
+    return table, totals
+
+
+def ensemble_run(settings_fname, replicas, stdout=None, seed=None, dipole='pairs'):
+    """
+    Запускает моделирование ансамбля по файлу настроек
+    :return: таблица ансамбля или None, если моделирование не удалось
+    """
+    settings = Settings(settings_fname)
+    try:
+        table, _ = simulate_ensemble(settings, replicas, np.random.RandomState(seed), stdout, dipole)
+    except (ValueError, NotImplementedError, IOError) as e:
+        print('{}: {}'.format(settings.name, e), file=stdout or sys.stdout)
+        return None
+    return table
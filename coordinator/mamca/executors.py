@@ -1,52 +1,99 @@
 import sys
 import subprocess
-from json import JSONDecodeError
 
 from .settings import Settings
-from .util import play_failure_notification, which
+from .store import register_run, reuse_run
+from .toolchain import get_toolchain
+from .util import play_failure_notification
 from . import MAMCA_PATH
 
 
-def single_run(settings_fname, mamca_path=MAMCA_PATH):
+def single_run(settings_fname, mamca_path=MAMCA_PATH, stdout=None, exit_on_fail=True, reuse=False,
+               toolchain=None):
     """
     Запускает однократное моделирование
     :param settings_fname: путь к файлу с настройками
     :param mamca_path: путь к исполняемому файлу моделирующей программы
+    :param stdout: файл для вывода моделирующей программы (по умолчанию sys.stdout)
+    :param exit_on_fail: завершать ли координатор, если моделирование не удалось
+    :param reuse: не запускать моделирование, если уже есть завершенный запуск с такими же настройками
+        (см. store.py). Запуски со случайными начальными состояниями или тепловыми прыжками
+        не переиспользуются (store.is_stochastic)
+    :param toolchain: пути к java и Mathematica (toolchain.Toolchain), по умолчанию ищутся один раз на процесс
+    :return: код возврата моделирующей программы
     """
-    java_path = which('java')
-    if java_path is None:
-        print('Can\'t find java. Check that java is installed and put in PATH')
+    settings = Settings(settings_fname)
+    if reuse and reuse_run(settings):
+        return 0
+    exe = run_command(settings_fname, mamca_path, exit_on_fail, toolchain)
+    stdout, stderr = _output_streams(stdout)
+    completed = subprocess.run(
+        exe,
+        stdout=stdout, stderr=stderr, )
+    if completed.returncode == 0:
+        register_run(settings)
+    elif exit_on_fail:
         exit_program()
+    return completed.returncode
 
-    mathematica_path = which('MathKernel')
-    if mathematica_path is None:
-        print('Can\'t find Mathematica Kernel. Check that Mathematica is installed and put in PATH')
-        exit_program()
 
-    if 'win' in sys.platform:
-        extension = '.dll'
-    else:
-        extension = '.so'
+def start_run(settings_fname, mamca_path=MAMCA_PATH, stdout=None, toolchain=None):
+    """
+    Запускает моделирование, не дожидаясь его окончания
+    :return: subprocess.Popen моделирующей программы
+    """
+    exe = run_command(settings_fname, mamca_path, exit_on_fail=False, toolchain=toolchain)
+    stdout, stderr = _output_streams(stdout)
+    return subprocess.Popen(exe, stdout=stdout, stderr=stderr)
+
+
+def _output_streams(stdout):
+    if stdout is None:
+        return sys.stdout, sys.stderr
+    return stdout, subprocess.STDOUT
 
+
+def run_command(settings_fname, mamca_path=MAMCA_PATH, exit_on_fail=True, toolchain=None):
+    """
+    Собирает команду запуска моделирующей программы
+    :param exit_on_fail: завершать ли координатор, если не найдены java или Mathematica
+        (иначе бросается RuntimeError)
+    :param toolchain: пути к java и Mathematica (toolchain.Toolchain), по умолчанию ищутся один раз на процесс
+    """
     settings = Settings(settings_fname)
-    mathematica_native_library = which('JLinkNativeLibrary', extension)
-    if mathematica_native_library is None:
-        print('Can\'t find JLinkNativeLibrary.{}. Check that Mathematica is installed and put in PATH'.format(
-            extension)
-        )
+    return java_command(settings.memory, mamca_path, ['-s', settings_fname], exit_on_fail, toolchain)
+
+
+def worker_command(memory, mamca_path=MAMCA_PATH, exit_on_fail=False, toolchain=None):
+    """
+    Собирает команду запуска моделирующей программы в режиме рабочего процесса (см. workers.py)
+    :param memory: память JVM [Мбайт]
+    """
+    return java_command(memory, mamca_path, ['-w'], exit_on_fail, toolchain)
+
+
+def java_command(memory, mamca_path, arguments, exit_on_fail=True, toolchain=None):
+    """
+    :param memory: память JVM [Мбайт]
+    :param arguments: аргументы моделирующей программы (кроме пути к Mathematica)
+    :param toolchain: пути к java и Mathematica (toolchain.Toolchain), по умолчанию ищутся один раз на процесс
+    """
+    if toolchain is None:
+        toolchain = get_toolchain()
+    errors = toolchain.errors()
+    if errors:
+        if not exit_on_fail:
+            raise RuntimeError(errors[0])
+        print(errors[0])
         exit_program()
-    
+
+    arguments = [a if a.startswith('-') else '"{}"'.format(a) for a in arguments + ['-m', toolchain.mathematica]]
     if 'win' in sys.platform:
-        exe = '{0} -Xms{1}m -Xmx{1}m -jar "{2}" -s "{3}" -m "{4}"'.format(
-            java_path, settings.memory, mamca_path, settings_fname, mathematica_path)
+        exe = '{0} -Xms{1}m -Xmx{1}m -jar "{2}" {3}'.format(toolchain.java, memory, mamca_path, ' '.join(arguments))
     else:
-        exe = '{0}@-Xms{1}m@-Xmx{1}m@-jar@"{2}"@-s@"{3}"@-m@"{4}"'.format(
-            java_path, settings.memory, mamca_path, settings_fname, mathematica_path).split('@')
-    completed = subprocess.run(
-        exe,
-        stdout=sys.stdout, stderr=sys.stderr, )
-    if completed.returncode != 0:
-        exit_program()
+        exe = [toolchain.java, '-Xms{}m'.format(memory), '-Xmx{}m'.format(memory), '-jar', '"{}"'.format(mamca_path)]
+        exe += arguments
+    return exe
 
 
 def exit_program():
@@ -0,0 +1,206 @@
+"""
+Сбор петли гистерезиса: суммарный момент образца для каждого шага
+
+Петля собирается из файлов состояний или, если она записана во время моделирования, из out/reductions.txt:
+на каждом шаге гистерезиса hysteresisRun (Main.kt) и engine.simulate дописывают в него суммарный момент
+по всему образцу (full), по окну borders и, если включено roi, по окну ячеек roi*. Полные состояния при этом
+записываются только на каждом snapshotStride-м шаге (или не записываются совсем, reductionsOnly).
+Формат файла:
+    # borders <borders> <leftX> <rightX> <leftY> <rightY>
+    step branch region bx by bz mx my mz
+    <строки HYSTERESIS_DTYPE, поле в Гс, моменты в магнетонах бора>
+"""
+
+import os
+
+import numpy as np
+
+from .archive import read_vectors
+from .cache import borders_params, get_cache
+from .selection import CellSelection
+from .snapshot_index import parse_snapshot_name, run_index
+from .snapshots import REDUCTIONS_FILE
+
+# ветви гистерезиса (см. Settings.kt)
+BRANCHES = ('fst', 'neg', 'pos')
+
+# области, по которым суммируются моменты:
+# full -- весь образец, borders -- окно из настроек (leftX, rightX, leftY, rightY),
+# area -- окно borders, дополнительно обрезанное параметром area
+REGIONS = ('full', 'borders', 'area')
+
+# область окна ячеек roi* в out/reductions.txt
+ROI_REGION = 'roi'
+
+HYSTERESIS_DTYPE = np.dtype([
+    ('step', np.int64),
+    ('branch', 'U3'),
+    ('region', 'U7'),
+    ('bx', np.float64),
+    ('by', np.float64),
+    ('bz', np.float64),
+    ('mx', np.float64),
+    ('my', np.float64),
+    ('mz', np.float64),
+])
+
+
+def parse_hysteresis_name(filename):
+    """
+    Разбирает имя файла состояния гистерезисного запуска
+    (momenta_<step>_<branch>_<bx>_<by>_<bz>.txt)
+    :return: (step, branch, (bx, by, bz)) или None, если имя другого формата
+    """
+    parsed = parse_snapshot_name(filename)
+    if parsed is None or not parsed[1]:
+        return None
+    return parsed[:3]
+
+
+def _borders_mask(settings, cells):
+    """
+    :return: булева маска частиц, лежащих внутри окна borders из настроек
+    """
+    return CellSelection.from_settings(settings).mask(cells)
+
+
+def roi_selection(settings):
+    """
+    :return: отбор частиц по окну ячеек roi* из настроек или None, если roi выключено
+    """
+    if not settings.roi:
+        return None
+    return CellSelection((settings.roiLeftX, settings.roiRightX, settings.roiLeftY, settings.roiRightY),
+                         (settings.roiLeftZ, settings.roiRightZ))
+
+
+def _area_mask(area, points):
+    """
+    :param area: [dn_x, dn_y, n_x, n_y] (см. plots.draw_hyst_plot)
+    :return: булева маска частиц, попадающих в area
+    """
+    dx, dy, nx, ny = area[0], area[1], area[2], area[3]
+    return ((dx <= points[:, 0]) & (points[:, 0] < nx - dx) &
+            (dy <= points[:, 1]) & (points[:, 1] < ny - dy))
+
+
+def snapshot_totals(settings, filename, area=None):
+    """
+    Суммарный момент одного состояния по тем же областям, что и в hysteresis_table
+    :return: массив (число областей, 3) в магнетонах бора
+    """
+    vectors, points, cells = read_vectors(filename)
+    masks = [None, _borders_mask(settings, cells)]
+    if area is not None:
+        masks.append(masks[1] & _area_mask(area, points))
+    m = vectors[:, 3:] - vectors[:, :3]
+    return np.array([m.sum(axis=0) if mask is None else m[mask].sum(axis=0) for mask in masks]) * settings.m
+
+
+def hysteresis_table(settings, area=None):
+    """
+    Читает каждое состояние гистерезисного запуска ровно один раз и считает суммарный момент
+    по всему образцу, по окну borders и (если задан area) по области area;
+    без area петля берется из out/reductions.txt, если он записан с тем же окном borders
+    :param settings: настройки запуска
+    :param area: [dn_x, dn_y, n_x, n_y], см. plots.draw_hyst_plot
+    :return: numpy record array с полями HYSTERESIS_DTYPE, отсортированный по шагу;
+        моменты в магнетонах бора
+    """
+    if area is None:
+        table = reductions_table(settings)
+        if table is not None:
+            return table
+    index = run_index(settings)
+    cache = get_cache(settings)
+    params = borders_params(settings)
+    params['area'] = None if area is None else list(area)
+    regions = REGIONS if area is not None else REGIONS[:2]
+    rows = []
+    masks = None
+    records = index.records
+    for i in np.nonzero(records.branch != '')[0]:
+        step, branch, b = int(records.step[i]), str(records.branch[i]), (records.bx[i], records.by[i], records.bz[i])
+        filename = '{}/{}'.format(index.out_folder, index.names[i])
+        key = cache.key(filename, 'totals', **params) if cache is not None else None
+        cached = cache.get(key) if cache is not None else None
+        if cached is not None:
+            totals = cached['totals']
+        else:
+            vectors, points, cells = read_vectors(filename)
+            if masks is None:
+                # геометрия одинакова для всех шагов запуска
+                masks = [None, _borders_mask(settings, cells)]
+                if area is not None:
+                    masks.append(masks[1] & _area_mask(area, points))
+            m = vectors[:, 3:] - vectors[:, :3]
+            totals = np.array([m.sum(axis=0) if mask is None else m[mask].sum(axis=0) for mask in masks])
+            if cache is not None:
+                cache.put(key, totals=totals)
+        for region, total in zip(regions, totals * settings.m):
+            rows.append((step, branch, region) + b + tuple(total))
+    table = np.array(rows, dtype=HYSTERESIS_DTYPE)
+    return np.sort(table, order=('step', 'region')).view(np.recarray)
+
+
+def reduction_masks(settings, cells):
+    """
+    :return: список (область, маска частиц или None -- все частицы) для строк out/reductions.txt
+    """
+    masks = [(REGIONS[0], None), (REGIONS[1], _borders_mask(settings, cells))]
+    roi = roi_selection(settings)
+    if roi is not None:
+        masks.append((ROI_REGION, roi.mask(cells)))
+    return masks
+
+
+def write_reductions_header(f, settings):
+    f.write('# borders {} {} {} {} {}\n'.format(
+        str(settings.borders).lower(), settings.leftX, settings.rightX, settings.leftY, settings.rightY))
+    f.write(' '.join(HYSTERESIS_DTYPE.names) + '\n')
+
+
+def write_reductions(f, settings, step, branch, field, m, masks):
+    """
+    Дописывает в out/reductions.txt строки одного шага
+    :param field: поле в Гс, строки в формате имен файлов состояний
+    :param m: моменты частиц (N, 3)
+    :param masks: reduction_masks
+    """
+    for region, mask in masks:
+        total = (m.sum(axis=0) if mask is None else m[mask].sum(axis=0)) * settings.m
+        values = (step, branch, region) + tuple(field) + tuple(total.tolist())
+        f.write('{} {} {} {} {} {} {!r} {!r} {!r}\n'.format(*values))
+    f.flush()
+
+
+def read_reductions(filename):
+    """
+    :return: (таблица с полями HYSTERESIS_DTYPE в порядке записи, окно borders в виде cache.borders_params)
+    """
+    with open(filename, mode='r') as f:
+        _, _, enabled, left_x, right_x, left_y, right_y = f.readline().split()
+        f.readline()
+        rows = [line.split() for line in f]
+    borders = {'borders': enabled == 'true', 'leftX': int(left_x), 'rightX': int(right_x),
+               'leftY': int(left_y), 'rightY': int(right_y)}
+    types = [HYSTERESIS_DTYPE[name].type for name in HYSTERESIS_DTYPE.names]
+    # последняя строка может быть не дописана, пока моделирование идет
+    table = [tuple(t(v) for t, v in zip(types, row)) for row in rows if len(row) == len(types)]
+    return np.array(table, dtype=HYSTERESIS_DTYPE).view(np.recarray), borders
+
+
+def reductions_table(settings, regions=REGIONS[:2]):
+    """
+    :param regions: области, строки которых попадают в таблицу
+    :return: таблица гистерезиса из out/reductions.txt, отсортированная как hysteresis_table, или None,
+        если файла нет или окно borders, с которым он записан, не совпадает с окном из настроек
+    """
+    filename = '{}/{}/out/{}'.format(settings.dataFolder, settings.name, REDUCTIONS_FILE)
+    if not os.path.exists(filename):
+        return None
+    table, borders = read_reductions(filename)
+    if borders != borders_params(settings) and (settings.borders or borders['borders']):
+        return None
+    table = table[np.isin(table.region, regions)]
+    return np.sort(table, order=('step', 'region')).view(np.recarray)
@@ -0,0 +1,138 @@
+"""
+Журнал серии моделирований
+
+В <dataFolder>/journal.jsonl дописывается по одной json строке на каждое изменение состояния задачи:
+запуск (state = 'running') и окончание ('done' или 'failed') с кодом возврата, временем начала и конца,
+памятью JVM и контрольной суммой результатов. Состояние задачи -- последняя запись с ее именем,
+поэтому оборванная серия (нехватка памяти, перезагрузка) оставляет задачи в состоянии 'running'
+и их можно перезапустить (режим resume в create_and_draw.py)
+"""
+
+import hashlib
+import json
+import os
+import threading
+import time
+
+from .settings import Settings
+from .store import is_complete
+
+JOURNAL_FILE = 'journal.jsonl'
+
+RUNNING = 'running'
+DONE = 'done'
+FAILED = 'failed'
+
+# размер блока чтения при подсчете контрольной суммы [байт]
+_CHUNK_SIZE = 2 ** 20
+
+
+def output_checksum(data_folder, name):
+    """
+    :return: sha1 содержимого папки out и log.log запуска или None, если запуск не завершен
+    """
+    run_folder = '{}/{}'.format(data_folder, name)
+    out_folder = '{}/out'.format(run_folder)
+    log_fname = '{}/log.log'.format(run_folder)
+    if not os.path.isdir(out_folder) or not os.path.exists(log_fname):
+        return None
+    files = ['{}/{}'.format(out_folder, f) for f in sorted(os.listdir(out_folder))
+             if os.path.isfile('{}/{}'.format(out_folder, f))]
+    sha = hashlib.sha1()
+    for fname in files + [log_fname]:
+        sha.update(os.path.basename(fname).encode('utf-8'))
+        with open(fname, mode='rb') as f:
+            for chunk in iter(lambda: f.read(_CHUNK_SIZE), b''):
+                sha.update(chunk)
+    return sha.hexdigest()
+
+
+class Journal:
+    def __init__(self, data_folder):
+        """
+        :param data_folder: папка с данными серии (поле dataFolder в настройках)
+        """
+        self.data_folder = data_folder
+        self.path = '{}/{}'.format(data_folder, JOURNAL_FILE)
+        self._lock = threading.Lock()
+
+    def _append(self, record):
+        line = json.dumps(record, sort_keys=True) + '\n'
+        with self._lock:
+            if not os.path.exists(self.data_folder):
+                os.makedirs(self.data_folder, exist_ok=True)
+            with open(self.path, mode='a') as f:
+                f.write(line)
+                f.flush()
+                os.fsync(f.fileno())
+
+    def start(self, settings_fname, settings=None):
+        """
+        Отмечает начало моделирования
+        :return: запись о запуске (передается в finish)
+        """
+        if settings is None:
+            settings = Settings(settings_fname)
+        record = {
+            'name': settings.name,
+            'settings': os.path.abspath(settings_fname),
+            'state': RUNNING,
+            'memory': settings.memory,
+            'start': time.time()
+        }
+        self._append(record)
+        return record
+
+    def finish(self, record, code):
+        """
+        Отмечает окончание моделирования
+        :param record: запись, которую вернул start
+        :param code: код возврата моделирующей программы
+        """
+        record = dict(record)
+        record['end'] = time.time()
+        record['code'] = code
+        record['checksum'] = output_checksum(self.data_folder, record['name']) if code == 0 else None
+        record['state'] = DONE if code == 0 and record['checksum'] is not None else FAILED
+        self._append(record)
+        return record
+
+    def jobs(self):
+        """
+        :return: словарь {имя запуска: последняя запись о нем}
+        """
+        jobs = {}
+        try:
+            with open(self.path) as f:
+                for line in f:
+                    try:
+                        record = json.loads(line)
+                    except ValueError:
+                        # строка, недописанная при аварийном завершении
+                        continue
+                    jobs[record['name']] = record
+        except FileNotFoundError:
+            pass
+        return jobs
+
+    def pending(self, settings_fnames, verify=False):
+        """
+        :param settings_fnames: файлы настроек серии
+        :param verify: пересчитывать контрольную сумму результатов завершенных задач
+        :return: список пар (путь к настройкам, последняя запись или None) для задач,
+            которые не запускались, были прерваны или завершились с ошибкой
+        """
+        jobs = self.jobs()
+        pending = []
+        for settings_fname in settings_fnames:
+            name = Settings(settings_fname).name
+            record = jobs.get(name)
+            if record is not None and record['state'] == DONE:
+                if verify:
+                    finished = output_checksum(self.data_folder, name) == record['checksum']
+                else:
+                    finished = is_complete(self.data_folder, name)
+                if finished:
+                    continue
+            pending.append((settings_fname, record))
+        return pending
@@ -0,0 +1,69 @@
+"""
+Чтение файлов состояний моментов (momenta_*.txt)
+"""
+
+import warnings
+
+import numpy as np
+
+# число столбцов в файле состояния:
+# (x1, y1, z1, x2, y2, z2) -- концы вектора момента, (x, y, z) -- координаты частицы,
+# (cell_x, cell_y, cell_z) -- номер ячейки
+MOMENTA_COLUMNS = 12
+
+
+def parse_momenta(buffer):
+    """
+    Разбирает содержимое файла состояния целиком (без построчной обработки)
+    :param buffer: содержимое файла (bytes)
+    :return: numpy массив float64 формы (N, 12)
+    """
+    # десятичная запятая заменяется сразу во всем буфере
+    if b',' in buffer:
+        buffer = buffer.replace(b',', b'.')
+    with warnings.catch_warnings():
+        # на неверном числе np.fromstring останавливается и выдает только предупреждение
+        warnings.simplefilter('error', DeprecationWarning)
+        try:
+            data = np.fromstring(buffer.decode('ascii'), dtype=np.float64, sep=' ')
+        except DeprecationWarning:
+            raise ValueError('momenta file contains a value that is not a number')
+    # в каждой непустой строке должно быть ровно MOMENTA_COLUMNS чисел, и все они должны быть разобраны
+    counts = _tokens_per_line(buffer)
+    if np.any(counts != MOMENTA_COLUMNS) or data.size != counts.sum():
+        raise ValueError('momenta file must contain {} numbers per line'.format(MOMENTA_COLUMNS))
+    return data.reshape(-1, MOMENTA_COLUMNS)
+
+
+def _tokens_per_line(buffer):
+    """
+    :return: число слов в каждой непустой строке буфера
+    """
+    chars = np.frombuffer(buffer, dtype=np.uint8)
+    space = (chars == ord(' ')) | (chars == ord('\t')) | (chars == ord('\n')) | (chars == ord('\r'))
+    starts = ~space
+    starts[1:] &= space[:-1]
+    lines = np.searchsorted(np.flatnonzero(chars == ord('\n')), np.flatnonzero(starts))
+    counts = np.bincount(lines)
+    return counts[counts > 0]
+
+
+def read_momenta(filename):
+    """
+    Читает файл состояния в один numpy массив
+    :param filename: путь к файлу
+    :return: numpy массив float64 формы (N, 12)
+    """
+    with open(filename, mode='rb') as f:
+        buffer = f.read()
+    return parse_momenta(buffer)
+
+
+def split_momenta(data):
+    """
+    Разбивает массив состояния на части (без копирования)
+    :param data: массив формы (N, 12)
+    :return: три view --- массив векторов в формате (x1, y1, z1, x2, y2, z2),
+        массив координат (x, y, z) и массив с номером ячейки (x, y, z)
+    """
+    return data[:, :6], data[:, 6:9], data[:, 9:]
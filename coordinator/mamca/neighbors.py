@@ -0,0 +1,164 @@
+"""
+Поиск соседей частиц по сетке ячеек
+
+В моделирующей программе соседи (частицы ближе dipolDistance и exchangeDistance) ищутся перебором всех пар
+частиц, что при большом числе частиц занимает больше времени, чем сама релаксация. Здесь пространство
+делится на ячейки со стороной не меньше радиуса поиска, и для каждой частицы проверяются только частицы
+из ее ячейки и соседних. Результат -- списки соседей в формате CSR (indptr, indices), как в scipy.sparse.
+
+При циклических границах (cyclicBoundaries) расстояния считаются до ближайшего периодического образа частицы
+по осям x и y (как в Settings.kt); по z образец не периодический
+"""
+
+import numpy as np
+
+# максимальное число пар-кандидатов, обрабатываемых за один раз
+CANDIDATES_CHUNK = 1 << 24
+
+# максимальное число ячеек на частицу (при очень маленьком радиусе ячейки укрупняются)
+MAX_CELLS_PER_PARTICLE = 8
+
+
+class NeighborList:
+    def __init__(self, indptr, indices, vectors=None):
+        """
+        :param indptr, indices: соседи частицы i -- indices[indptr[i]:indptr[i + 1]] (по возрастанию)
+        :param vectors: векторы от частицы до соседа (с учетом периодических образов), (число пар, 3)
+        """
+        self.indptr = indptr
+        self.indices = indices
+        self.vectors = vectors
+
+    def __len__(self):
+        return len(self.indptr) - 1
+
+    def rows(self):
+        """
+        :return: номер частицы для каждой пары (indices[k] -- сосед частицы rows()[k])
+        """
+        return np.repeat(np.arange(len(self), dtype=self.indices.dtype), np.diff(self.indptr))
+
+    def counts(self):
+        """
+        :return: число соседей каждой частицы
+        """
+        return np.diff(self.indptr)
+
+
+def lattice_box(settings):
+    """
+    Периоды образца для циклических границ: размер решетки колец вдоль x и y, если по оси больше одной ячейки;
+    ось z не периодическая, поэтому при z > 1 радиус поиска ограничен только половиной периодов по x и y
+    :return: массив (3,), 0 -- ось не периодическая; None, если cyclicBoundaries выключено
+    """
+    if not settings.cyclicBoundaries:
+        return None
+    periods = (settings.d + settings.offset_x, settings.d + settings.offset_y)
+    sizes = (settings.x, settings.y)
+    return np.array([size * period if size > 1 else 0 for size, period in zip(sizes, periods)] + [0],
+                    dtype=np.float64)
+
+
+def _grid(positions, distance, box):
+    """
+    :return: размер ячейки и число ячеек по каждой оси
+    """
+    extent = positions.max(axis=0) if len(positions) else np.zeros(3)
+    dims = np.where(box > 0, np.floor(box / distance), np.floor(extent / distance) + 1).astype(np.int64)
+    dims = np.maximum(dims, 1)
+    # ячеек не должно быть намного больше, чем частиц
+    while dims.prod() > MAX_CELLS_PER_PARTICLE * max(len(positions), 1):
+        dims = np.maximum(dims // 2, 1)
+    size = np.where(box > 0, box / dims, np.maximum(extent / dims, distance))
+    size = np.where(size > 0, size, 1)
+    return size, dims
+
+
+def _offsets(dims, periodic):
+    """
+    :return: смещения соседних ячеек (без повторов, если ячеек вдоль периодической оси меньше трех)
+    """
+    axes = []
+    for d, p in zip(dims, periodic):
+        if p:
+            axes.append(sorted({o % d for o in (-1, 0, 1)}))
+        else:
+            axes.append([-1, 0, 1] if d > 1 else [0])
+    grid = np.meshgrid(*axes, indexing='ij')
+    return np.stack([g.ravel() for g in grid], axis=1)
+
+
+def neighbor_list(loc, distance, box=None, vectors=True, chunk=CANDIDATES_CHUNK):
+    """
+    Ищет для каждой частицы другие частицы ближе distance
+    :param loc: координаты частиц (N, 3)
+    :param distance: радиус поиска
+    :param box: периоды по осям (3,) для циклических границ, 0 -- ось не периодическая (см. lattice_box);
+        distance не больше половины каждого ненулевого периода, иначе ValueError
+    :param vectors: вычислять ли векторы от частицы до соседей
+    :param chunk: максимальное число пар-кандидатов, проверяемых за один раз (ограничивает память)
+    :return: NeighborList
+    """
+    loc = np.asarray(loc, dtype=np.float64).reshape(-1, 3)
+    n = len(loc)
+    box = np.zeros(3) if box is None else np.asarray(box, dtype=np.float64)
+    periodic = box > 0
+    if (distance > box[periodic] / 2).any():
+        raise ValueError('neighbor distance {} must not exceed half of the period {}'.format(distance, box))
+    index_dtype = np.int32 if n < 2 ** 31 else np.int64
+
+    positions = loc - np.where(periodic, 0, loc.min(axis=0) if n else 0)
+    positions[:, periodic] %= box[periodic]
+    size, dims = _grid(positions, distance, box)
+    cells = np.minimum((positions // size).astype(np.int64), dims - 1)
+
+    def cell_id(c):
+        return (c[..., 0] * dims[1] + c[..., 1]) * dims[2] + c[..., 2]
+
+    # частицы, упорядоченные по ячейкам
+    ids = cell_id(cells)
+    order = np.argsort(ids, kind='stable')
+    number = np.bincount(ids, minlength=dims.prod())
+    start = np.concatenate(([0], np.cumsum(number)[:-1]))
+
+    offsets = _offsets(dims, periodic)
+    # блок строк, для которого число пар-кандидатов заведомо не больше chunk
+    block = max(1, chunk // (len(offsets) * max(int(number.max()) if n else 1, 1)))
+
+    rows, columns, pair_vectors = [], [], []
+    for first in range(0, n, block):
+        last = min(n, first + block)
+        # для каждой частицы блока и каждой соседней ячейки: начало и число частиц в ней
+        neighbor_cells = cells[first:last, np.newaxis, :] + offsets[np.newaxis, :, :]
+        valid = np.ones(neighbor_cells.shape[:2], dtype=bool)
+        for axis in range(3):
+            if periodic[axis]:
+                neighbor_cells[..., axis] %= dims[axis]
+            else:
+                valid &= (neighbor_cells[..., axis] >= 0) & (neighbor_cells[..., axis] < dims[axis])
+        neighbor_ids = cell_id(np.where(valid[..., np.newaxis], neighbor_cells, 0))
+        c = np.where(valid, number[neighbor_ids], 0).ravel()
+        i = np.repeat(np.arange(first, last), len(offsets))
+        i = np.repeat(i, c)
+        position = np.arange(c.sum()) - np.repeat(np.cumsum(c) - c, c)
+        j = order[np.repeat(start[neighbor_ids].ravel(), c) + position]
+
+        r = loc[j] - loc[i]
+        if periodic.any():
+            r[:, periodic] -= box[periodic] * np.round(r[:, periodic] / box[periodic])
+        close = (np.sqrt((r * r).sum(axis=1)) < distance) & (i != j)
+        rows.append(i[close])
+        columns.append(j[close])
+        if vectors:
+            pair_vectors.append(r[close])
+
+    rows = np.concatenate(rows) if rows else np.zeros(0, dtype=np.int64)
+    columns = np.concatenate(columns) if columns else np.zeros(0, dtype=np.int64)
+    # пары по строкам, соседи внутри строки -- по возрастанию номера
+    sort = np.argsort(rows.astype(np.int64) * n + columns, kind='stable')
+    indptr = np.zeros(n + 1, dtype=np.int64)
+    np.cumsum(np.bincount(rows, minlength=n), out=indptr[1:])
+    result_vectors = None
+    if vectors:
+        result_vectors = np.concatenate(pair_vectors)[sort] if pair_vectors else np.zeros((0, 3))
+    return NeighborList(indptr, columns[sort].astype(index_dtype), result_vectors)
@@ -0,0 +1,109 @@
+"""
+Потоковый режим: графики состояний рисуются, пока моделирование еще идет
+
+Моделирующая программа пишет файлы out/momenta_* один за другим. Наблюдатель
+периодически просматривает папку out и, как только файл состояния дописан
+(появился следующий файл или программа завершилась), кладет его имя в ограниченную очередь,
+из которой его забирают процессы, рисующие графики
+"""
+
+import multiprocessing
+import os
+import time
+
+from .executors import start_run
+from .settings import Settings
+
+# период опроса папки out [с]
+POLL_INTERVAL = 0.5
+
+
+def _momenta_files(out_folder, since):
+    """
+    :return: имена файлов состояний, измененных не раньше since, в порядке их записи
+    """
+    try:
+        entries = list(os.scandir(out_folder))
+    except FileNotFoundError:
+        return []
+    files = []
+    for entry in entries:
+        if entry.name.startswith('momenta') and entry.name.endswith('.txt'):
+            try:
+                mtime = entry.stat().st_mtime
+            except FileNotFoundError:
+                continue
+            if mtime >= since:
+                files.append((mtime, entry.name))
+    return [name for _, name in sorted(files)]
+
+
+def watch_snapshots(out_folder, is_running, since, poll_interval=POLL_INTERVAL):
+    """
+    Генератор имен дописанных файлов состояний
+    :param out_folder: папка, в которую пишет моделирующая программа
+    :param is_running: функция без аргументов, возвращающая True, пока моделирование идет
+    :param since: время запуска моделирования (более старые файлы -- от предыдущего запуска)
+    """
+    seen = set()
+    while True:
+        running = is_running()
+        files = _momenta_files(out_folder, since)
+        # последний файл может быть еще недописан
+        complete = files[:-1] if running else files
+        for name in complete:
+            if name not in seen:
+                seen.add(name)
+                yield name
+        if not running:
+            return
+        time.sleep(poll_interval)
+
+
+def _plot_worker(queue, plot_snapshot, settings_fname):
+    settings = Settings(settings_fname)
+    while True:
+        name = queue.get()
+        if name is None:
+            return
+        try:
+            plot_snapshot(settings, name)
+        except Exception as e:
+            print('{}: {}'.format(name, e))
+
+
+def streaming_run(settings_fname, plot_snapshot, *, workers=None, queue_size=None,
+                  run=start_run, poll_interval=POLL_INTERVAL):
+    """
+    Запускает моделирование и рисует каждое состояние сразу после его записи
+    :param settings_fname: путь к файлу с настройками
+    :param plot_snapshot: функция (settings, имя файла состояния), рисующая одно состояние,
+        должна быть определена на уровне модуля
+    :param workers: число рисующих процессов (по умолчанию -- число ядер)
+    :param queue_size: размер очереди состояний (по умолчанию -- удвоенное число процессов)
+    :param run: функция, запускающая моделирование и возвращающая subprocess.Popen
+    :return: код возврата моделирующей программы
+    """
+    settings = Settings(settings_fname)
+    out_folder = '{}/{}/out'.format(settings.dataFolder, settings.name)
+    workers = workers or os.cpu_count() or 1
+    queue = multiprocessing.Queue(maxsize=queue_size or 2 * workers)
+    plotters = [multiprocessing.Process(target=_plot_worker, args=(queue, plot_snapshot, settings_fname))
+                for _ in range(workers)]
+    for plotter in plotters:
+        plotter.start()
+
+    # запас в секунду на грубое разрешение времени изменения файлов
+    since = time.time() - 1
+    process = run(settings_fname)
+    try:
+        for name in watch_snapshots(out_folder, lambda: process.poll() is None, since, poll_interval):
+            # если рисование не успевает, наблюдатель ждет (моделирование при этом продолжается)
+            queue.put(name)
+        code = process.wait()
+    finally:
+        for _ in plotters:
+            queue.put(None)
+        for plotter in plotters:
+            plotter.join()
+    return code
@@ -1,13 +1,23 @@
 import numpy as np
 import os
 import sys
-import subprocess
+import time
+from concurrent.futures import ProcessPoolExecutor
+from itertools import repeat
 
+from matplotlib import animation
 from matplotlib import pyplot as plt
+from matplotlib.backends.backend_agg import FigureCanvasAgg
+from matplotlib.figure import Figure
 from matplotlib.ticker import AutoMinorLocator
 from mpl_toolkits.mplot3d import Axes3D
 
+from .archive import read_vectors
+from .cache import get_cache
+from .hysteresis import hysteresis_table
+from .selection import CellSelection
 from .settings import Settings
+from .snapshot_index import parse_snapshot_name, run_index
 from .util import which, play_failure_notification
 
 # шаблон для имени графика гистерезиса
@@ -44,19 +54,6 @@ def check_borders(settings: Settings):
             sys.exit(1)
 
 
-def _get_lines(filename, skip=0):
-    """
-    :param filename: путь к файлу
-    :param skip: сколько первых строк файла надо пропустить
-    :return: строки файла, числа в которых готовы к преобразованию во float
-    """
-    with open(filename, mode='r') as f:
-        for i in range(skip):
-            f.readline()
-        res = [s.replace(',', '.') for s in f]
-    return res
-
-
 def _read_vectors(filename):
     """
     Читает содержимое файла
@@ -65,64 +62,79 @@ def _read_vectors(filename):
         три numpy массива --- массив векторов в
         формате (x1, y1, z1, x2, y2, z2), массив координат (x, y, z) и массив с номером ячейки (x, y, z)
     """
-    temp = np.array(
-        [tuple(map(lambda s: float(s), line)) for line in
-         list(map(lambda s: s.split(), _get_lines(filename)))])
-    return temp[:, :6], temp[:, 6:9], temp[:, 9:]
+    return read_vectors(filename)
 
 
-def _read_data(settings, filename):
+def run_mask(settings, selection=None):
+    """
+    Маска отбора для всех состояний запуска (геометрия у них одна), чтобы не считать ее на каждое состояние
+    :param selection: отбор частиц (selection.CellSelection), по умолчанию -- окно borders из настроек
+    :return: булева маска частиц или None, если отбираются все частицы или у запуска нет состояний
+    """
+    if selection is None:
+        selection = CellSelection.from_settings(settings)
+    paths = run_index(settings).paths()
+    if selection.is_empty() or not paths:
+        return None
+    return selection.mask(read_vectors(paths[0])[2])
+
+
+def _read_data(settings, filename, selection=None, mask=None):
     """
     Читает содержимое файла и фильтрует его в соответствии с границами в настройках
     :param settings:
     :param filename:
+    :param selection: отбор частиц (selection.CellSelection), по умолчанию -- окно borders из настроек
+    :param mask: маска selection, посчитанная заранее для всего запуска (run_mask), иначе считается по файлу
     :return: два numpy массива --- массив векторов в
         формате (x1, y1, z1, x2, y2, z2) и массив координат (x, y, z)
     """
+    if selection is None:
+        selection = CellSelection.from_settings(settings)
+    cache = get_cache(settings)
+    key = cache.key(filename, 'data', **selection.params()) if cache is not None else None
+    cached = cache.get(key) if cache is not None else None
+    if cached is not None:
+        return cached['vectors'], cached['points']
+
     raw_vectors, raw_points, cells = _read_vectors(filename)
-    if settings.borders:
-        vectors, points = [], []
-        for (vector, point, cell) in zip(raw_vectors, raw_points, cells):
-            (xCell, yCell, zCell) = map(lambda x: int(x), cell)
-            if settings.leftX <= xCell < settings.rightX and (settings.leftY <= yCell < settings.rightY):
-                vectors.append(np.asarray(vector))
-                points.append(np.asarray(point))
-        vectors = np.array(vectors)
-        points = np.array(points)
-    else:
+    if selection.is_empty():
         vectors = raw_vectors
         points = raw_points
+    else:
+        if mask is None or len(mask) != len(cells):
+            mask = selection.mask(cells)
+        vectors = raw_vectors[mask]
+        points = raw_points[mask]
+    if cache is not None:
+        cache.put(key, vectors=vectors, points=points)
     return vectors, points
 
 
 def draw_plot_from_hyst_series(*, settings: Settings, borders: list = None,
                                negative_borders: bool = True,
                                scale: float = 1, draw_points: bool = True,
-                               numbers: list, show: bool = False):
+                               numbers: list, show: bool = False, selection: CellSelection = None):
     if not settings.hysteresis:
         print('switch hysteresis in settings to "true"')
         return
-    data_folder = '{}/{}/out'.format(settings.dataFolder, settings.name)
-    for file in os.listdir(data_folder):
-        if file.startswith('momenta'):
-            _, n, _, bx, by, bz = file[:-4].split('_')
-            n = int(n)
-            text = 'B({}, {}, {})'.format(bx, by, bz)
-            if n in numbers:
-                kwargs = {'settings': settings,
-                          'borders': borders,
-                          'negative_borders': negative_borders,
-                          'text': text,
-                          'scale': scale,
-                          'momenta_filename': file,
-                          'draw_points': draw_points,
-                          'show': show,
-                          'label': 'number {}'.format(n)
-                          }
-                if settings.is2dPlot:
-                    draw_2d_vectors_plot(**kwargs)
-                else:
-                    draw_3d_vectors_plot(**kwargs)
+    # нужные шаги берутся из индекса, остальные состояния не просматриваются
+    for record in run_index(settings).steps(numbers):
+        kwargs = {'settings': settings,
+                  'borders': borders,
+                  'negative_borders': negative_borders,
+                  'text': _snapshot_text(settings, record.name),
+                  'scale': scale,
+                  'momenta_filename': record.name,
+                  'draw_points': draw_points,
+                  'show': show,
+                  'label': 'number {}'.format(record.step),
+                  'selection': selection
+                  }
+        if settings.is2dPlot:
+            draw_2d_vectors_plot(**kwargs)
+        else:
+            draw_3d_vectors_plot(**kwargs)
 
 
 def draw_all_hyst_plots(*, settings, b_axis, m_axis, label=None, borders=None,
@@ -130,6 +142,8 @@ def draw_all_hyst_plots(*, settings, b_axis, m_axis, label=None, borders=None,
     """
     Рисует три графика гистерезиса -- по одному на каждую ветвь и общий
     """
+    # все графики строятся по одной таблице, каждое состояние читается один раз
+    table = hysteresis_table(settings, area)
     data = (
         (None, '0_hyst_' + settings.name),
         ('fst', '1_hyst_fst_' + settings.name),
@@ -143,12 +157,13 @@ def draw_all_hyst_plots(*, settings, b_axis, m_axis, label=None, borders=None,
             label=label, borders=borders,
             area=area,
             direction=direction,
-            name=name
+            name=name,
+            table=table
         )
 
 
 def draw_hyst_plot(*, settings, b_axis, m_axis, label=None, borders=None,
-                   direction=None, area=None, name=None):
+                   direction=None, area=None, name=None, table=None):
     """
     Рисует петлю гистерезиса
     :param settings: путь к файлу с настройками, для отображения
@@ -164,41 +179,19 @@ def draw_hyst_plot(*, settings, b_axis, m_axis, label=None, borders=None,
         формат: [dn_x, dn_y, n_x, n_y] -- dn_x и dn_y -- сколько частиц
         отрезать с обеих сторон, n_x и n_y -- сколько частиц всего
     :param name: имя для скриншота
+    :param table: заранее собранная таблица гистерезиса (hysteresis.hysteresis_table),
+        если не передана, то собирается заново
     """
     data_folder = '{}/{}'.format(settings.dataFolder, settings.name)
-    out_folder = '{}/out'.format(data_folder)
     pic_dir = data_folder
 
     if direction is None:
         direction = {'fst', 'pos', 'neg'}
-    axises = {'x': 0, 'y': 1, 'z': 2}
-
-    def get_full_moment(file):
-        """
-        читает моменты частиц образца из файла и суммирует их
-        """
-        vs, points = _read_data(settings, file)
-        # суммировать все моменты
-        if area is None:
-            return sum(vs[:, 3] - vs[:, 0]), \
-                   sum(vs[:, 4] - vs[:, 1]), \
-                   sum(vs[:, 5] - vs[:, 2])
-        else:
-            # суммировать только моменты из центра образца,
-            # в соответсвии с параметров filter
-            dx, dy, nx, ny = area[0], area[1], area[2], area[3]
-            left = [dx, dy, -int(2e10)]
-            right = [nx - dx, ny - dy, int(2e10)]
-            res = [0, 0, 0]
-            for i in range(points.shape[0]):
-                in_area = True
-                for j in range(3):
-                    if not (left[j] <= points[i, j] < right[j]):
-                        in_area = False
-                if in_area:
-                    for j in range(3):
-                        res[j] += vs[i, j + 3] - vs[i, j]
-            return res[0], res[1], res[2]
+
+    if table is None:
+        table = hysteresis_table(settings, area)
+    # суммарный момент образца (или его части) в магнетонах бора
+    table = table[table.region == ('borders' if area is None else 'area')]
 
     global _counter
     fig = plt.figure(0, figsize=figsize)
@@ -219,25 +212,20 @@ def draw_hyst_plot(*, settings, b_axis, m_axis, label=None, borders=None,
 
     min_b, max_b = np.inf, -np.inf
     min_m, max_m = np.inf, -np.inf
-    for f in os.listdir(out_folder):
-        try:
-            s, n, sign, *b = f[:-4].split('_')
-        except ValueError:
+    color = {'pos': 'r', 'neg': 'b', 'fst': 'g'}
+    for sign in sorted(direction):
+        branch = table[table.branch == sign]
+        if branch.size == 0:
             continue
-        if sign not in direction:
-            continue
-        b = float(b[axises[b_axis]])
-
-        # суммарный момент образца в магнетонах бора
-        m = get_full_moment('{}/{}'.format(out_folder, f))[axises[m_axis]] * settings.m
+        b = branch['b' + b_axis]
+        m = branch['m' + m_axis]
 
         # вычисление границ поля
-        min_b, max_b = min(min_b, b), max(max_b, b)
+        min_b, max_b = min(min_b, b.min()), max(max_b, b.max())
 
         # вычисление границ момента
-        min_m, max_m = min(min_m, m), max(max_m, m)
+        min_m, max_m = min(min_m, m.min()), max(max_m, m.max())
 
-        color = {'pos': 'r', 'neg': 'b', 'fst': 'g'}
         plt.scatter(b, m, color=color[sign], linewidths=4)
 
     # выравнивание границ поля и момента, чтобы график был симметричным по обоим осям
@@ -266,69 +254,173 @@ def draw_hyst_plot(*, settings, b_axis, m_axis, label=None, borders=None,
     plt.clf()
 
 
-def create_momenta_gif(*, settings: Settings):
+def create_momenta_gif(*, settings: Settings, filename: str = None, step: int = 1,
+                       max_size: int = 800, fps: float = 5 / 3,
+                       borders: list = None, negative_borders: bool = True,
+                       scale: float = 1, draw_points: bool = False, selection: CellSelection = None):
     """
-    Создает гифку из состояний образца между скачками моментов
-    :param settings: путь к файлу с настройками
-    :return:
+    Создает анимацию (gif или mp4) из состояний образца
+    Кадры строятся сразу из массивов состояний на одной фигуре: стрелки и подпись
+    создаются один раз и на каждом кадре только обновляются, промежуточные png не пишутся
+    :param settings: настройки запуска
+    :param filename: путь к выходному файлу (.gif или .mp4), по умолчанию <dataFolder>/<name>/momenta.gif
+    :param step: брать каждое step-е состояние
+    :param max_size: максимальный размер кадра по большей стороне [пиксели]
+    :param fps: число кадров в секунду
+    :param selection: отбор частиц (selection.CellSelection), по умолчанию -- окно borders из настроек
+    :return: путь к созданному файлу или None, если нет подходящего writer'а
     """
     data_folder = '{}/{}'.format(settings.dataFolder, settings.name)
-    momenta_template = '{}/moments/momenta*.png'.format(data_folder)
-    # поиск утилиты convert
-    # под windows есть системная утилита convert,
-    # поэтому запуск осуществляется посредством 'magick convert'
-    if 'win' in sys.platform:
-        exe = which('magick')
-        if exe is not None:
-            exe += ' convert'
+    if filename is None:
+        filename = '{}/momenta.gif'.format(data_folder)
+    names = list(run_index(settings).names[::step])
+    if not names:
+        return None
+
+    if filename.endswith('.gif'):
+        candidates = ['pillow', 'imagemagick']
     else:
-        exe = which('convert')
-    if exe is None:
-        print('You need install ImageMagick (http://www.imagemagick.org) for creating gifs')
-        print('magick must be in your classpath')
-        return
-    # TODO: Issue #5. без exe.split() не работает на убунте, с ним не работает convert
-    exe += ' -delay 60 -loop 0 "{}" "{}/momenta.gif"'.format(momenta_template, data_folder)
-    subprocess.run(exe, stdout=sys.stdout, stderr=sys.stderr, )
+        candidates = ['ffmpeg', 'avconv']
+    available = [name for name in candidates if animation.writers.is_available(name)]
+    if not available:
+        print('None of the animation writers {} is available'.format(candidates))
+        return None
+    writer = animation.writers[available[0]](fps=fps)
+
+    fig = Figure(figsize=figsize)
+    FigureCanvasAgg(fig)
+    dpi = min(fig.dpi, max_size / max(figsize))
+    kwargs = {'borders': borders,
+              'negative_borders': negative_borders,
+              'scale': scale,
+              'draw_points': draw_points
+              }
+
+    quiver, label = None, None
+    mask = run_mask(settings, selection)
+    with writer.saving(fig, filename, dpi):
+        for name in names:
+            vectors, points = _read_data(settings, '{}/out/{}'.format(data_folder, name), selection, mask)
+            text = _snapshot_text(settings, name)
+            if not settings.is2dPlot:
+                # трехмерные стрелки не обновляются, кадр рисуется заново
+                fig.clf()
+                _fill_3d_vectors_plot(fig, settings=settings, vectors=vectors, points=points, text=text, **kwargs)
+            elif quiver is None:
+                quiver, label = _fill_2d_vectors_plot(fig, settings=settings, vectors=vectors, points=points,
+                                                      text=text, **kwargs)
+            else:
+                x, y, u, v = _arrows_2d(settings, vectors, scale)
+                quiver.set_offsets(np.column_stack((x, y)))
+                quiver.set_UVC(u, v)
+                label.set_text(text)
+            writer.grab_frame()
+    return filename
 
 
 def draw_all_vectors_plots(*, settings: Settings = None, borders: list = None,
                            negative_borders: bool = True, label: str = None,
-                           scale: float = 1, draw_points: bool = True):
+                           scale: float = 1, draw_points: bool = True,
+                           workers: int = None, selection: CellSelection = None):
     """
     Рисует графики состояний до и после оптимизации
+    Графики рисуются без pyplot (у каждого своя фигура) в пуле процессов
+    :param label: название графиков (заголовок над каждым рисунком)
+    :param workers: число процессов (по умолчанию -- число ядер), 1 -- рисовать в текущем процессе
+    :param selection: отбор частиц (selection.CellSelection), по умолчанию -- окно borders из настроек
+    :return: словарь {имя файла состояния: время рисования [с]}
     """
-    data_folder = '{}/{}/out'.format(settings.dataFolder, settings.name)
+    names = list(run_index(settings).names)
+    kwargs = {'borders': borders,
+              'negative_borders': negative_borders,
+              'scale': scale,
+              'draw_points': draw_points
+              }
+
+    start = time.perf_counter()
+    mask = run_mask(settings, selection)
+    if workers == 1 or len(names) < 2:
+        times = [_render_vectors_plot(settings, name, kwargs, selection, label, mask) for name in names]
+    else:
+        workers = workers or os.cpu_count() or 1
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            times = list(pool.map(_render_vectors_plot, repeat(settings), names, repeat(kwargs), repeat(selection),
+                                  repeat(label), repeat(mask), chunksize=max(1, len(names) // (4 * workers))))
+    elapsed = time.perf_counter() - start
 
-    for file in os.listdir(data_folder):
-        if file.startswith('momenta'):
-            if settings.hysteresis:
-                _, _, _, bx, by, bz = file[:-4].split('_')
-                text = 'B({}, {}, {})'.format(bx, by, bz)
-            else:
-                _, _, _, t = file[:-4].split('_')
-                text = 't = {} s'.format(t)
-
-            kwargs = {'settings': settings,
-                      'borders': borders,
-                      'negative_borders': negative_borders,
-                      'label': label,
-                      'text': text,
-                      'scale': scale,
-                      'momenta_filename': file,
-                      'draw_points': draw_points
-                      }
-            if settings.is2dPlot:
-                draw_2d_vectors_plot(**kwargs)
-            else:
-                draw_3d_vectors_plot(**kwargs)
+    for name, t in zip(names, times):
+        print('{}: {:.2f} s'.format(name, t))
+    if times:
+        print('{} frames in {:.2f} s (mean {:.2f} s, max {:.2f} s per frame)'.format(
+            len(times), elapsed, sum(times) / len(times), max(times)))
+    return dict(zip(names, times))
+
+
+def _render_vectors_plot(settings, momenta_filename, kwargs, selection=None, label=None, mask=None):
+    """
+    Рисует и сохраняет график одного состояния на отдельной фигуре (без pyplot и глобального состояния)
+    :param label: название графика; окна у фигуры нет, поэтому оно рисуется заголовком
+    :param mask: маска selection для всего запуска (run_mask)
+    :return: время рисования [с]
+    """
+    start = time.perf_counter()
+    data_folder = '{}/{}'.format(settings.dataFolder, settings.name)
+    vectors, points = _read_data(settings, '{}/out/{}'.format(data_folder, momenta_filename), selection, mask)
+
+    fig = Figure(figsize=figsize)
+    FigureCanvasAgg(fig)
+    fill = _fill_2d_vectors_plot if settings.is2dPlot else _fill_3d_vectors_plot
+    fill(fig, settings=settings, vectors=vectors, points=points,
+         text=_snapshot_text(settings, momenta_filename), **kwargs)
+    if label is not None:
+        fig.suptitle(str(label))
+    fig.savefig('{}/moments/{}.png'.format(data_folder, momenta_filename[:-4]), format='png')
+    return time.perf_counter() - start
+
+
+def _snapshot_text(settings, momenta_filename):
+    """
+    :return: подпись графика состояния (поле или время), взятая из имени файла
+    """
+    parsed = parse_snapshot_name(momenta_filename)
+    if parsed is None:
+        return None
+    _, branch, b, t, _ = parsed
+    if branch:
+        return 'B({:.3f}, {:.3f}, {:.3f})'.format(*b)
+    return 't = {:.9f} s'.format(t)
+
+
+def draw_vectors_plot(*, settings: Settings = None, borders: list = None,
+                      negative_borders: bool = True, label: str = None,
+                      scale: float = 1, momenta_filename: str, draw_points: bool = True,
+                      selection: CellSelection = None):
+    """
+    Рисует график одного состояния (двумерный или трехмерный в зависимости от настроек)
+    с подписью поля или времени, взятой из имени файла
+    :param selection: отбор частиц (selection.CellSelection), по умолчанию -- окно borders из настроек
+    """
+    kwargs = {'settings': settings,
+              'borders': borders,
+              'negative_borders': negative_borders,
+              'label': label,
+              'text': _snapshot_text(settings, momenta_filename),
+              'scale': scale,
+              'momenta_filename': momenta_filename,
+              'draw_points': draw_points,
+              'selection': selection
+              }
+    if settings.is2dPlot:
+        draw_2d_vectors_plot(**kwargs)
+    else:
+        draw_3d_vectors_plot(**kwargs)
 
 
 def draw_3d_vectors_plot(*, settings: Settings = None, borders: list = None,
                          negative_borders: bool = True, label: str = None,
                          text: str = None, scale: float = 1,
                          momenta_filename: str, draw_points: bool = True,
-                         show: bool = False):
+                         show: bool = False, selection: CellSelection = None):
     """
     Рисует трехмерный график веторов
     :param draw_points: рисовать ли сами частицы (точками)
@@ -344,6 +436,7 @@ def draw_3d_vectors_plot(*, settings: Settings = None, borders: list = None,
     :param(str) text: текст для отображения на графике
     :param(float) scale: масштаб стрелочек
     :param(str) momenta_filename: путь к файлу с данными
+    :param selection: отбор частиц (selection.CellSelection), по умолчанию -- окно borders из настроек
     """
     data_folder = '{}/{}'.format(settings.dataFolder, settings.name)
     filename = '{}/out/{}'.format(data_folder, momenta_filename)
@@ -358,7 +451,23 @@ def draw_3d_vectors_plot(*, settings: Settings = None, borders: list = None,
     _counter += 1
     if label is not None:
         fig.canvas.set_window_title(str(label))
-    vectors, points = _read_data(settings, filename)
+    vectors, points = _read_data(settings, filename, selection)
+    _fill_3d_vectors_plot(fig, settings=settings, vectors=vectors, points=points,
+                          borders=borders, negative_borders=negative_borders,
+                          text=text, scale=scale, draw_points=draw_points)
+
+    if name is None:
+        name = 'fig_{}'.format(_counter)
+    if not show:
+        plt.savefig('{}/{}.png'.format(pic_dir, name), format='png')
+        plt.clf()
+
+
+def _fill_3d_vectors_plot(fig, *, settings, vectors, points, borders=None, negative_borders=True,
+                          text=None, scale=1, draw_points=True):
+    """
+    Рисует трехмерный график векторов на переданной фигуре
+    """
     ax = fig.add_subplot(111, projection='3d')
     if borders is None:
         # минимумы и максимумы координат
@@ -409,12 +518,12 @@ def draw_3d_vectors_plot(*, settings: Settings = None, borders: list = None,
     # вроде как криво работает в версиях matplotlib'а выше 1.5.8 (и, возможно, ниже)
     k = (scale - 1) / 2
     dx, dy, dz = u * k, v * k, w * k
-    x1 -= dx
-    y1 -= dy
-    z1 -= dz
-    x2 += dx
-    y2 += dy
-    z2 += dz
+    x1 = x1 - dx
+    y1 = y1 - dy
+    z1 = z1 - dz
+    x2 = x2 + dx
+    y2 = y2 + dy
+    z2 = z2 + dz
     u, v, w = x2 - x1, y2 - y1, z2 - z1
 
     # рисование моментов
@@ -428,18 +537,12 @@ def draw_3d_vectors_plot(*, settings: Settings = None, borders: list = None,
     if text is not None:
         ax.text2D(0.005, -0.07, text, transform=ax.transAxes)
 
-    if name is None:
-        name = 'fig_{}'.format(_counter)
-    if not show:
-        plt.savefig('{}/{}.png'.format(pic_dir, name), format='png')
-        plt.clf()
-
 
 def draw_2d_vectors_plot(*, settings: Settings = None, borders: list = None,
                          negative_borders: bool = True, label: str = None,
                          text: str = None, scale: float = 1,
                          momenta_filename: str, draw_points: bool = True,
-                         show: bool = False):
+                         show: bool = False, selection: CellSelection = None):
     data_folder = '{}/{}'.format(settings.dataFolder, settings.name)
     filename = '{}/out/{}'.format(data_folder, momenta_filename)
     name = momenta_filename[:-4]
@@ -453,13 +556,32 @@ def draw_2d_vectors_plot(*, settings: Settings = None, borders: list = None,
     if label is not None:
         fig.canvas.set_window_title(label)
 
+    vectors, points = _read_data(settings, filename, selection)
+    _fill_2d_vectors_plot(fig, settings=settings, vectors=vectors, points=points,
+                          borders=borders, negative_borders=negative_borders,
+                          text=text, scale=scale, draw_points=draw_points)
+
+    if name is None:
+        name = 'fig_{}'.format(_counter)
+    if not show:
+        plt.savefig('{}/{}.png'.format(pic_dir, name), format='png')
+        plt.clf()
+
+
+def _fill_2d_vectors_plot(fig, *, settings, vectors, points, borders=None, negative_borders=True,
+                          text=None, scale=1, draw_points=True):
+    """
+    Рисует двумерный график векторов (оси из настроек) на переданной фигуре
+    :return: artist стрелок (quiver) и подписи
+    """
+    ax = fig.add_subplot(111)
+
     axes = {'x': 0, 'y': 1, 'z': 2}
     x = settings.xAxis
     y = settings.yAxis
 
     # индексы с нужными осями
     x1, y1, x2, y2 = axes[x], axes[y], axes[x] + 3, axes[y] + 3
-    vectors, points = _read_data(settings, filename)
 
     if borders is None:
         # минимумы и максимумы координат
@@ -487,30 +609,14 @@ def draw_2d_vectors_plot(*, settings: Settings = None, borders: list = None,
             axis = borders
 
     # масштаб осей
-    plt.axis(list(map(lambda f: f * 1.1, axis)))
+    ax.axis(list(map(lambda f: f * 1.1, axis)))
     # подписи оскй
-    plt.xlabel('{}, nm'.format(x))
-    plt.ylabel('{}, nm'.format(y))
-
-    # координаты стрелок моментов
-    x1_v, y1_v = vectors[:, x1], vectors[:, y1]
-    x2_v, y2_v = vectors[:, x2], vectors[:, y2]
-    u, v = x2_v - x1_v, y2_v - y1_v
-
-    # scaling моментов
-    # уебался, пока разбирался, как масштабировать эти чертовы стрелочки
-    # вроде как криво работает в версиях matplotlib'а выше 1.5.8 (и, возможно, ниже)
-    k = (scale - 1) / 2
-    dx, dy = u * k, v * k
-    x1_v -= dx
-    y1_v -= dy
-    x2_v += dx
-    y2_v += dy
-    u, v = x2_v - x1_v, y2_v - y1_v
+    ax.set_xlabel('{}, nm'.format(x))
+    ax.set_ylabel('{}, nm'.format(y))
 
     # рисование моментов
-    ax = plt.axes()
-    ax.quiver(x1_v, y1_v, u, v, pivot='tail')  # , arrow_length_ratio=0.2, length=scale * 2)
+    x1_v, y1_v, u, v = _arrows_2d(settings, vectors, scale)
+    quiver = ax.quiver(x1_v, y1_v, u, v, pivot='tail')  # , arrow_length_ratio=0.2, length=scale * 2)
     # for v in vectors:
     #     ax.arrow(v[x1], v[y1], v[x2] - v[x1], v[y2] - v[y1])
 
@@ -519,14 +625,36 @@ def draw_2d_vectors_plot(*, settings: Settings = None, borders: list = None,
         x_p, y_p = points[:, axes[x]], points[:, axes[y]]
         ax.scatter(x_p, y_p, c='r')
 
+    label = None
     if text is not None:
-        ax.text(0.005, -0.07, text, transform=ax.transAxes)
+        label = ax.text(0.005, -0.07, text, transform=ax.transAxes)
+    return quiver, label
 
-    if name is None:
-        name = 'fig_{}'.format(_counter)
-    if not show:
-        plt.savefig('{}/{}.png'.format(pic_dir, name), format='png')
-        plt.clf()
+
+def _arrows_2d(settings, vectors, scale=1):
+    """
+    :return: начала стрелок моментов (x, y) и их проекции (u, v) на оси двумерного графика
+    """
+    axes = {'x': 0, 'y': 1, 'z': 2}
+    x1, y1 = axes[settings.xAxis], axes[settings.yAxis]
+    x2, y2 = x1 + 3, y1 + 3
+
+    # координаты стрелок моментов
+    x1_v, y1_v = vectors[:, x1], vectors[:, y1]
+    x2_v, y2_v = vectors[:, x2], vectors[:, y2]
+    u, v = x2_v - x1_v, y2_v - y1_v
+
+    # scaling моментов
+    # уебался, пока разбирался, как масштабировать эти чертовы стрелочки
+    # вроде как криво работает в версиях matplotlib'а выше 1.5.8 (и, возможно, ниже)
+    k = (scale - 1) / 2
+    dx, dy = u * k, v * k
+    x1_v = x1_v - dx
+    y1_v = y1_v - dy
+    x2_v = x2_v + dx
+    y2_v = y2_v + dy
+    u, v = x2_v - x1_v, y2_v - y1_v
+    return x1_v, y1_v, u, v
 
 
 # Используется для рисования всех созданных графиков
@@ -0,0 +1,205 @@
+"""
+Решение уравнения минимумов энергии частицы для многих частиц сразу
+
+Положения экстремумов энергии момента -- корни уравнения b*x^4 + (c-a)x^3 + (c+a)x - b = 0 (x = tg(phi / 2)),
+в моделирующей программе оно решается через NSolve в ядре Mathematica (Mathematica.solveEquation),
+по одному вызову на частицу. Здесь корни всех уравнений ищутся массивами numpy:
+    closed -- формула Феррари (резольвента решается по формуле Кардано) в комплексных числах;
+    companion -- собственные числа сопровождающих матриц 4x4 (np.linalg.eigvals для стопки матриц).
+Найденные корни уточняются несколькими итерациями Ньютона, после чего остаются только действительные
+"""
+
+import os
+import subprocess
+import tempfile
+
+import numpy as np
+
+# допустимая мнимая часть корня (относительно модуля), при которой корень считается действительным
+IMAG_TOLERANCE = 1e-7
+
+# число итераций Ньютона для уточнения корней
+NEWTON_ITERATIONS = 2
+
+# относительная невязка, при которой корни формулы Феррари считаются верными
+VERIFY_TOLERANCE = 1e-12
+
+# число символов после запятой для отправки в математику (MATH_DIGITS в Constants.kt)
+MATH_DIGITS = 10
+
+METHODS = ('closed', 'companion')
+
+_OMEGA = np.exp(2j * np.pi / 3)
+
+
+def _cubic_roots(p2, p1, p0):
+    """
+    Комплексные корни z^3 + p2*z^2 + p1*z + p0 = 0 (формула Кардано)
+    :return: массив (N, 3)
+    """
+    shift = p2 / 3
+    p = p1 - p2 * shift
+    q = 2 * shift ** 3 - shift * p1 + p0
+    delta = np.sqrt(q * q / 4 + p ** 3 / 27)
+    # из двух кубических корней берется больший по модулю, чтобы не делить на ноль
+    w = -q / 2 + delta
+    w_minus = -q / 2 - delta
+    w = np.where(np.abs(w) >= np.abs(w_minus), w, w_minus)
+    u = w ** (1 / 3)
+    nonzero = u != 0
+    v = np.where(nonzero, -p / (3 * np.where(nonzero, u, 1)), 0)
+    roots = [u * _OMEGA ** k + v * _OMEGA ** (-k) - shift for k in range(3)]
+    return np.stack(roots, axis=-1)
+
+
+def _ferrari(a3, a2, a1, a0):
+    """
+    Комплексные корни x^4 + a3*x^3 + a2*x^2 + a1*x + a0 = 0 (формула Феррари)
+    :return: массив (N, 4)
+    """
+    a3, a2, a1, a0 = (np.asarray(v, dtype=complex) for v in (a3, a2, a1, a0))
+    # x = y - a3 / 4: y^4 + p*y^2 + q*y + r = 0
+    shift = a3 / 4
+    p = a2 - 6 * shift ** 2
+    q = a1 - 2 * a2 * shift + 8 * shift ** 3
+    r = a0 - a1 * shift + a2 * shift ** 2 - 3 * shift ** 4
+
+    # резольвента z^3 + 2p*z^2 + (p^2 - 4r)z - q^2 = 0, берется корень с наибольшим модулем
+    z = _cubic_roots(2 * p, p * p - 4 * r, -q * q)
+    z = z[np.arange(len(z)), np.argmax(np.abs(z), axis=1)]
+    s = np.sqrt(z)
+    nonzero = s != 0
+    safe_s = np.where(nonzero, s, 1)
+    # (y^2 - s*y + e1)(y^2 + s*y + e2) = 0
+    e1 = (p + z) / 2 + q / (2 * safe_s)
+    e2 = (p + z) / 2 - q / (2 * safe_s)
+    d1 = np.sqrt(z - 4 * e1)
+    d2 = np.sqrt(z - 4 * e2)
+    y = np.stack(((s + d1) / 2, (s - d1) / 2, (-s + d2) / 2, (-s - d2) / 2), axis=-1)
+
+    # q = 0 и резольвента вырождена: биквадратное уравнение
+    if not nonzero.all():
+        d = np.sqrt(p * p - 4 * r)
+        y2 = np.stack(((-p + d) / 2, (-p - d) / 2), axis=-1)
+        y_bi = np.sqrt(y2)
+        y[~nonzero] = np.concatenate((y_bi, -y_bi), axis=-1)[~nonzero]
+    return y - shift[:, np.newaxis]
+
+
+def _companion(a3, a2, a1, a0):
+    """
+    Комплексные корни x^4 + a3*x^3 + a2*x^2 + a1*x + a0 = 0 (собственные числа сопровождающей матрицы)
+    :return: массив (N, 4)
+    """
+    companion = np.zeros((len(a3), 4, 4))
+    companion[:, 0, 0] = -a3
+    companion[:, 0, 1] = -a2
+    companion[:, 0, 2] = -a1
+    companion[:, 0, 3] = -a0
+    companion[:, 1, 0] = companion[:, 2, 1] = companion[:, 3, 2] = 1
+    return np.linalg.eigvals(companion)
+
+
+def _polish(x, b, c, a, iterations):
+    # итерации Ньютона для b*x^4 + (c-a)x^3 + (c+a)x - b
+    b, k3, k1 = (v[:, np.newaxis] for v in (b, c - a, c + a))
+    for _ in range(iterations):
+        f = ((b * x + k3) * x * x + k1) * x - b
+        df = (4 * b * x + 3 * k3) * x * x + k1
+        step = np.where(df != 0, f / np.where(df != 0, df, 1), 0)
+        x = np.where(np.isfinite(step), x - step, x)
+    return x
+
+
+def _verified(x, a3, b, c, a, tolerance=VERIFY_TOLERANCE):
+    """
+    :return: маска уравнений, корни которых найдены верно: каждый корень -- корень с относительной невязкой
+        не больше tolerance, сумма корней равна -a3 (теорема Виета), число действительных корней четно
+    """
+    b, k3, k1 = (v[:, np.newaxis] for v in (b, c - a, c + a))
+    f = ((b * x + k3) * x * x + k1) * x - b
+    scale = np.abs(b * x ** 4) + np.abs(k3 * x ** 3) + np.abs(k1 * x) + np.abs(b)
+    residual_ok = (np.abs(f) <= tolerance * scale).all(axis=1)
+    sum_ok = np.abs(x.sum(axis=1) + a3) <= tolerance * np.abs(x).sum(axis=1)
+    real = np.abs(x.imag) <= IMAG_TOLERANCE * np.maximum(1, np.abs(x.real))
+    return residual_ok & sum_ok & (real.sum(axis=1) % 2 == 0)
+
+
+def real_roots(a, b, c, method='closed', iterations=NEWTON_ITERATIONS):
+    """
+    Действительные корни уравнений b*x^4 + (c-a)x^3 + (c+a)x - b = 0 (Mathematica.solveEquation)
+    :param a, b, c: массивы коэффициентов (N,)
+    :param method: 'closed' или 'companion'
+    :param iterations: число итераций Ньютона для уточнения корней
+    :return: массив (N, 4), корни по возрастанию, недостающие -- nan
+    """
+    if method not in METHODS:
+        raise ValueError('method must be one of {}, got {!r}'.format(METHODS, method))
+    a, b, c = (np.asarray(v, dtype=np.float64).ravel() for v in (a, b, c))
+    roots = np.full((len(b), 4), np.nan)
+    quartic = b != 0
+    if quartic.any():
+        qa, qb, qc = a[quartic], b[quartic], c[quartic]
+        # при малом b (поле почти вдоль оси анизотропии) один из корней уходит на бесконечность (phi = pi),
+        # и приведенное уравнение плохо обусловлено. Тогда уравнение решается для x' = tg((phi - pi/2) / 2):
+        # оно того же вида с коэффициентами (-a, -c/2, 2b), а x = (1 + x') / (1 - x')
+        rotated = np.abs(qc) > 2 * np.abs(qb)
+        qa, qb, qc = np.where(rotated, -qa, qa), np.where(rotated, -qc / 2, qb), np.where(rotated, 2 * qb, qc)
+        coefficients = ((qc - qa) / qb, np.zeros(len(qb)), (qc + qa) / qb, -np.ones(len(qb)))
+        with np.errstate(divide='ignore', invalid='ignore', over='ignore'):
+            values = _ferrari(*coefficients) if method == 'closed' else _companion(*coefficients)
+            values = _polish(values, qb, qc, qa, iterations)
+            if method == 'closed':
+                # формула Феррари теряет точность при близких корнях, такие уравнения решаются заново
+                failed = ~_verified(values, coefficients[0], qb, qc, qa)
+                if failed.any():
+                    values[failed] = _polish(_companion(*(v[failed] for v in coefficients)),
+                                             qb[failed], qc[failed], qa[failed], iterations)
+            real = np.abs(values.imag) <= IMAG_TOLERANCE * np.maximum(1, np.abs(values.real))
+            values = np.where(real, values.real, np.nan)
+            values = np.where(rotated[:, np.newaxis], (1 + values) / (1 - values), values)
+        roots[quartic] = values
+    cubic = ~quartic
+    if cubic.any():
+        # b = 0: x * ((c-a)x^2 + (c+a)) = 0
+        roots[cubic, 0] = 0
+        with np.errstate(divide='ignore', invalid='ignore'):
+            x = np.sqrt(-(c + a)[cubic] / (c - a)[cubic])
+        roots[cubic, 1] = x
+        roots[cubic, 2] = -x
+    return np.sort(roots, axis=1)
+
+
+def _math_format(value):
+    # Double.eFormat(MATH_DIGITS) с заменой экспоненты, как в Mathematica.findRoots
+    return '{:.{}e}'.format(value, MATH_DIGITS).replace('e', '*^')
+
+
+def mathematica_roots(a, b, c, kernel):
+    """
+    Решает те же уравнения через NSolve в ядре Mathematica, в точности как Mathematica.solveEquation
+    (для проверки real_roots)
+    :param kernel: путь к ядру Mathematica (toolchain.Toolchain.mathematica)
+    :return: массив (N, 4), корни по возрастанию, недостающие -- nan
+    """
+    lines = []
+    for ai, bi, ci in zip(a, b, c):
+        expr = '{} x^4 + {} x^3 + {} x - {} == 0'.format(
+            _math_format(bi), _math_format(ci - ai), _math_format(ci + ai), _math_format(bi))
+        lines.append('Print[CForm[x /. NSolve[{}, x, Reals]]];'.format(expr))
+    with tempfile.NamedTemporaryFile(mode='w', suffix='.m', delete=False) as f:
+        f.write('\n'.join(lines) + '\nExit[];\n')
+        script = f.name
+    try:
+        output = subprocess.run([kernel, '-noprompt', '-script', script], stdout=subprocess.PIPE,
+                                universal_newlines=True, check=True).stdout
+    finally:
+        os.remove(script)
+    roots = np.full((len(lines), 4), np.nan)
+    results = [line.strip() for line in output.splitlines() if line.strip().startswith('List(')]
+    if len(results) != len(lines):
+        raise RuntimeError('Mathematica returned {} results for {} equations'.format(len(results), len(lines)))
+    for i, line in enumerate(results):
+        values = [float(v) for v in line[len('List('):-1].split(',') if v.strip()]
+        roots[i, :len(values)] = sorted(values)
+    return roots
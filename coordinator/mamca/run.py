@@ -0,0 +1,178 @@
+"""
+Весь запуск как один массив моментов (шаги, частицы, 3)
+
+При первом обращении моменты всех состояний запуска (в порядке snapshot_index.RunIndex) последовательно
+записываются в один файл out/bin/run_<тип>.npy (например, run_float32.npy), по одному состоянию за раз. Дальше файл открывается через
+np.load(..., mmap_mode='r'), и из него читаются только запрошенные части, например момент одной частицы
+на всех шагах гистерезиса. Отображение файла открывается заново после каждых max_memory прочитанных байт,
+поэтому память процесса не растет с размером запуска
+"""
+
+import json
+import os
+
+import numpy as np
+
+from .archive import read_vectors
+from .snapshot_index import run_index
+from .snapshots import BINARY_FOLDER, check_own_folder
+
+# файл массива и список состояний, из которых он собран (для каждого типа свои)
+RUN_FILE = 'run_{}.npy'
+RUN_META_FILE = 'run_{}.json'
+
+# максимальный объем памяти под прочитанные данные по умолчанию [байт]
+RUN_MAX_MEMORY = 2 ** 30
+
+
+class Run:
+    def __init__(self, settings, dtype=np.float32, max_memory=RUN_MAX_MEMORY):
+        """
+        :param settings: настройки запуска
+        :param dtype: тип, в котором хранятся моменты (np.float32 или np.float64)
+        :param max_memory: максимальный размер результата одного обращения
+            и объем данных, читаемых через одно отображение файла [байт]
+        """
+        self.settings = settings
+        self.dtype = np.dtype(dtype)
+        self.max_memory = max_memory
+        self.index = run_index(settings)
+        self.folder = os.path.join(self.index.out_folder, BINARY_FOLDER)
+        self.filename = os.path.join(self.folder, RUN_FILE.format(self.dtype.name))
+        self.meta_filename = os.path.join(self.folder, RUN_META_FILE.format(self.dtype.name))
+        self._points = None
+        self._cells = None
+        if not self._is_actual():
+            self._build()
+        self.shape = tuple(np.load(self.filename, mmap_mode='r').shape)
+
+    def _meta(self):
+        return {'names': [str(name) for name in self.index.names], 'dtype': self.dtype.str}
+
+    def _is_actual(self):
+        try:
+            with open(self.meta_filename) as f:
+                return json.load(f) == self._meta() and os.path.exists(self.filename)
+        except (OSError, ValueError):
+            return False
+
+    def _build(self):
+        """
+        Записывает моменты всех состояний в файл массива, держа в памяти одно состояние
+        """
+        if not len(self.index):
+            raise ValueError('run {} has no snapshots'.format(self.settings.name))
+        check_own_folder(self.index.out_folder)
+        os.makedirs(self.folder, exist_ok=True)
+        paths = self.index.paths()
+        temp = '{}.{}.tmp'.format(self.filename, os.getpid())
+        with open(temp, mode='wb') as f:
+            shape = None
+            for path in paths:
+                vectors, points, cells = read_vectors(path)
+                if shape is None:
+                    shape = (len(paths), len(vectors), 3)
+                    header = {'descr': np.lib.format.dtype_to_descr(self.dtype), 'fortran_order': False,
+                              'shape': shape}
+                    np.lib.format.write_array_header_1_0(f, header)
+                    self._points, self._cells = np.array(points), np.array(cells, dtype=np.int64)
+                elif len(vectors) != shape[1]:
+                    raise ValueError('{}: {} particles instead of {}'.format(path, len(vectors), shape[1]))
+                m = vectors[:, 3:] - vectors[:, :3]
+                f.write(np.ascontiguousarray(m, dtype=self.dtype).tobytes())
+        os.replace(temp, self.filename)
+        with open(self.meta_filename, mode='w') as f:
+            json.dump(self._meta(), f)
+
+    def _geometry(self):
+        if self._points is None:
+            _, points, cells = read_vectors(self.index.paths()[0])
+            self._points, self._cells = np.array(points), np.array(cells, dtype=np.int64)
+
+    @property
+    def points(self):
+        """
+        :return: координаты частиц (N, 3)
+        """
+        self._geometry()
+        return self._points
+
+    @property
+    def cells(self):
+        """
+        :return: номера ячеек частиц (N, 3)
+        """
+        self._geometry()
+        return self._cells
+
+    @property
+    def records(self):
+        """
+        :return: записи индекса (шаг, ветвь, поле, время) для каждого шага массива
+        """
+        return self.index.records
+
+    def __len__(self):
+        return self.shape[0]
+
+    @property
+    def nbytes(self):
+        return int(np.prod(self.shape)) * self.dtype.itemsize
+
+    def _map(self):
+        return np.load(self.filename, mmap_mode='r')
+
+    def __getitem__(self, key):
+        """
+        Читает часть массива (шаги, частицы, 3); индексы -- как у numpy массивов
+        :return: numpy массив (копия), не больше max_memory байт
+        """
+        if not isinstance(key, tuple):
+            key = (key,)
+        step_key, rest = key[0], key[1:]
+        steps = np.arange(len(self))[step_key]
+        scalar = np.ndim(steps) == 0
+        steps = np.atleast_1d(steps)
+
+        data = self._map()
+        sample = np.asarray(data[steps[0] if len(steps) else 0][rest])
+        size = len(steps) * sample.nbytes
+        if size > self.max_memory:
+            raise MemoryError('{} bytes requested from run {}, but max_memory is {}; use blocks()'.format(
+                size, self.settings.name, self.max_memory))
+        result = np.empty((len(steps),) + sample.shape, dtype=self.dtype)
+        step_bytes = self.shape[1] * 3 * self.dtype.itemsize
+        touched = 0
+        for k, step in enumerate(steps):
+            # страницы файла, прочитанные через отображение, освобождаются вместе с ним
+            if touched + step_bytes > self.max_memory:
+                data = self._map()
+                touched = 0
+            result[k] = data[step][rest]
+            touched += step_bytes
+        del data
+        return result[0] if scalar else result
+
+    def step(self, k):
+        """
+        :return: моменты всех частиц на шаге k (N, 3)
+        """
+        return self[k]
+
+    def particle(self, i):
+        """
+        :return: момент частицы i на всех шагах (шаги, 3)
+        """
+        return self[:, i]
+
+    def blocks(self, max_memory=None):
+        """
+        Проходит по всему массиву блоками шагов
+        :param max_memory: максимальный размер блока [байт] (по умолчанию max_memory запуска)
+        :return: генератор пар (номер первого шага блока, массив (шаги блока, N, 3))
+        """
+        max_memory = max_memory or self.max_memory
+        step_bytes = max(self.shape[1] * 3 * self.dtype.itemsize, 1)
+        block = max(1, max_memory // step_bytes)
+        for first in range(0, len(self), block):
+            yield first, self[first:first + block]
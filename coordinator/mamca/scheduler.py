@@ -0,0 +1,161 @@
+"""
+Параллельный запуск серии моделирований
+
+Моделирования (java процессы) запускаются одновременно в пуле потоков,
+число одновременно работающих JVM ограничено памятью: сумма их -Xmx (поле memory в настройках)
+не превышает физической памяти машины. Рисование графиков выполняется в отдельном пуле процессов,
+так что следующее моделирование стартует, пока рисуются графики предыдущего
+"""
+
+import os
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, ProcessPoolExecutor
+
+from .executors import single_run
+from .settings import Settings
+
+# память, которую JVM и ядро Mathematica используют сверх -Xmx [Мбайт]
+JVM_OVERHEAD = 512
+
+# доля физической памяти, которую можно отдать моделированиям
+MEMORY_FRACTION = 0.9
+
+
+def physical_memory():
+    """
+    :return: объем физической памяти машины [Мбайт] или None, если определить не удалось
+    """
+    if sys.platform == 'win32':
+        import ctypes
+
+        class MemoryStatus(ctypes.Structure):
+            _fields_ = [('dwLength', ctypes.c_ulong),
+                        ('dwMemoryLoad', ctypes.c_ulong),
+                        ('ullTotalPhys', ctypes.c_ulonglong),
+                        ('ullAvailPhys', ctypes.c_ulonglong),
+                        ('ullTotalPageFile', ctypes.c_ulonglong),
+                        ('ullAvailPageFile', ctypes.c_ulonglong),
+                        ('ullTotalVirtual', ctypes.c_ulonglong),
+                        ('ullAvailVirtual', ctypes.c_ulonglong),
+                        ('ullAvailExtendedVirtual', ctypes.c_ulonglong)]
+
+        status = MemoryStatus()
+        status.dwLength = ctypes.sizeof(MemoryStatus)
+        if not ctypes.windll.kernel32.GlobalMemoryStatusEx(ctypes.byref(status)):
+            return None
+        return status.ullTotalPhys // 2 ** 20
+    try:
+        return os.sysconf('SC_PAGE_SIZE') * os.sysconf('SC_PHYS_PAGES') // 2 ** 20
+    except (ValueError, OSError, AttributeError):
+        return None
+
+
+class MemoryBudget:
+    """
+    Счетчик свободной памяти: поток блокируется, пока для его задачи не хватает памяти
+    """
+
+    def __init__(self, total):
+        self.total = total
+        self.free = total
+        self._condition = threading.Condition()
+
+    def acquire(self, amount):
+        # задача, которой не хватит памяти даже на пустой машине, запускается одна
+        amount = min(amount, self.total)
+        with self._condition:
+            while self.free < amount:
+                self._condition.wait()
+            self.free -= amount
+        return amount
+
+    def release(self, amount):
+        with self._condition:
+            self.free += amount
+            self._condition.notify_all()
+
+
+class SweepScheduler:
+    def __init__(self, *, workers=None, plot_workers=None, memory=None,
+                 run=single_run, plot=None, log_folder=None, journal=None):
+        """
+        :param workers: максимальное число одновременных моделирований (по умолчанию -- число ядер)
+        :param plot_workers: число процессов для рисования (по умолчанию -- число ядер)
+        :param memory: память, доступная моделированиям [Мбайт]
+            (по умолчанию -- MEMORY_FRACTION от физической памяти)
+        :param run: функция запуска моделирования, принимает путь к настройкам и
+            именованные аргументы stdout и exit_on_fail, возвращает код возврата
+        :param plot: функция рисования (вызывается в отдельном процессе с путем к настройкам),
+            должна быть определена на уровне модуля; сама она не должна открывать свой пул процессов
+            (например, draw_all_vectors_plots(workers=1)), иначе процессов будет plot_workers * число ядер
+        :param log_folder: папка для вывода моделирований, если None, то вывод идет в консоль
+        :param journal: журнал серии (journal.Journal), в который записываются запуски и их результаты
+        """
+        cpus = os.cpu_count() or 1
+        self.workers = workers or cpus
+        self.plot_workers = plot_workers or cpus
+        if memory is None:
+            total = physical_memory()
+            memory = int(total * MEMORY_FRACTION) if total is not None else sys.maxsize
+        self.budget = MemoryBudget(memory)
+        self.run_function = run
+        self.plot_function = plot
+        self.log_folder = log_folder
+        self.journal = journal
+
+    def _simulate(self, settings_fname):
+        settings = Settings(settings_fname)
+        reserved = self.budget.acquire(settings.memory + JVM_OVERHEAD)
+        start = time.time()
+        record = self.journal.start(settings_fname, settings) if self.journal is not None else None
+        code = None
+        try:
+            if self.log_folder is None:
+                code = self.run_function(settings_fname, exit_on_fail=False)
+            else:
+                log_fname = '{}/{}.log'.format(self.log_folder, settings.name)
+                with open(log_fname, mode='w') as log:
+                    code = self.run_function(settings_fname, stdout=log, exit_on_fail=False)
+        finally:
+            self.budget.release(reserved)
+            if record is not None:
+                # исключение при запуске тоже считается неудачей
+                self.journal.finish(record, code if code is not None else -1)
+        print('{}: simulation finished with code {} in {:.1f} s'.format(settings.name, code, time.time() - start))
+        return code
+
+    def run(self, settings_fnames):
+        """
+        Запускает моделирования и рисование для всех файлов настроек
+        :return: словарь {путь к настройкам: код возврата моделирования
+            или исключение, если запуск или рисование не удались}
+        """
+        if self.log_folder is not None and not os.path.exists(self.log_folder):
+            os.makedirs(self.log_folder)
+        results = {}
+        plots = {}
+        with ProcessPoolExecutor(max_workers=self.plot_workers) as plot_pool:
+            with ThreadPoolExecutor(max_workers=self.workers) as simulation_pool:
+                futures = {simulation_pool.submit(self._simulate, f): f for f in settings_fnames}
+
+                def on_simulated(future):
+                    fname = futures[future]
+                    try:
+                        results[fname] = future.result()
+                    except Exception as e:
+                        results[fname] = e
+                        return
+                    if results[fname] == 0 and self.plot_function is not None:
+                        plots[fname] = plot_pool.submit(self.plot_function, fname)
+
+                for future in futures:
+                    future.add_done_callback(on_simulated)
+            # все моделирования закончены, ждем рисования
+            for fname, future in plots.items():
+                try:
+                    future.result()
+                except Exception as e:
+                    results[fname] = e
+        return results
@@ -0,0 +1,73 @@
+"""
+Отбор частиц по номерам их ячеек
+
+Окно borders из настроек (leftX <= x < rightX, leftY <= y < rightY), окно по z и произвольная маска ячеек
+объединяются в одну булеву маску частиц. Маска -- несколько сравнений по массиву ячеек; геометрия одинакова
+для всех состояний запуска, поэтому функции, проходящие по состояниям, считают ее один раз на запуск
+(см. plots.run_mask) и передают дальше
+"""
+
+import hashlib
+
+import numpy as np
+
+
+def _digest(array):
+    array = np.ascontiguousarray(array)
+    return hashlib.sha1(str((array.shape, array.dtype.str)).encode('utf-8') + array.tobytes()).hexdigest()
+
+
+class CellSelection:
+    def __init__(self, borders=None, z=None, cells=None):
+        """
+        :param borders: (leftX, rightX, leftY, rightY) или None -- без ограничений по x и y
+        :param z: (leftZ, rightZ), отбираются ячейки leftZ <= z < rightZ, или None
+        :param cells: булев массив (x, y, z) по ячейкам образца -- какие ячейки отбирать, или None
+        """
+        self.borders = None if borders is None else tuple(int(v) for v in borders)
+        self.z = None if z is None else tuple(int(v) for v in z)
+        self.cells = None if cells is None else np.asarray(cells, dtype=bool)
+        self._cells_digest = None if cells is None else _digest(self.cells)
+
+    @classmethod
+    def from_settings(cls, settings, z=None, cells=None):
+        """
+        :return: отбор по окну borders из настроек (если оно включено) и дополнительным условиям
+        """
+        borders = (settings.leftX, settings.rightX, settings.leftY, settings.rightY) if settings.borders else None
+        return cls(borders, z, cells)
+
+    def params(self):
+        """
+        :return: параметры отбора, от которых зависят отфильтрованные данные (для ключей кэша)
+        """
+        return {'borders': self.borders,
+                'z': self.z,
+                'cells': self._cells_digest}
+
+    def is_empty(self):
+        """
+        :return: True, если отбираются все частицы
+        """
+        return self.borders is None and self.z is None and self.cells is None
+
+    def mask(self, cells):
+        """
+        :param cells: номера ячеек частиц (N, 3)
+        :return: булева маска отобранных частиц (N,)
+        """
+        cells = np.asarray(cells)
+        mask = np.ones(len(cells), dtype=bool)
+        if self.borders is not None:
+            left_x, right_x, left_y, right_y = self.borders
+            mask &= (left_x <= cells[:, 0]) & (cells[:, 0] < right_x) & \
+                    (left_y <= cells[:, 1]) & (cells[:, 1] < right_y)
+        if self.z is not None:
+            mask &= (self.z[0] <= cells[:, 2]) & (cells[:, 2] < self.z[1])
+        if self.cells is not None:
+            cells = cells.astype(np.int64, copy=False)
+            shape = np.array(self.cells.shape)
+            inside = ((cells >= 0) & (cells < shape)).all(axis=1)
+            index = np.where(inside[:, np.newaxis], cells, 0)
+            mask &= inside & self.cells[index[:, 0], index[:, 1], index[:, 2]]
+        return mask
@@ -3,469 +3,154 @@ That file generated automatically, don't change it
 """
 
 import json
+import numbers
+import os
+import warnings
 from collections import OrderedDict
 
+# поля настроек: имя, тип и значение по умолчанию (как в Settings.kt)
+FIELDS = (
+    ('x', int, 70),
+    ('y', int, 70),
+    ('z', int, 1),
+    ('n', int, 1),
+    ('r', float, 1.25),
+    ('d', float, 0.0),
+    ('offset_x', float, 3.0),
+    ('offset_y', float, 3.0),
+    ('offset_z', float, 3.0),
+    ('m', float, 456.0),
+    ('kan', float, 13000.0),
+    ('jex', float, 5.0),
+    ('dipolDistance', float, 30.0),
+    ('exchangeDistance', float, 3.1),
+    ('viscosity', float, 0.5),
+    ('t', float, 0.0),
+    ('loc', int, 0),
+    ('loc_theta', float, 90.0),
+    ('loc_phi', float, 0.0),
+    ('ot', int, 0),
+    ('ot_theta', float, 90.0),
+    ('ot_phi', float, 0.0),
+    ('b_x', float, 500.0),
+    ('b_y', float, 0.0),
+    ('b_z', float, 0.0),
+    ('time', float, 1.0),
+    ('timeStep', int, 100),
+    ('cyclicBoundaries', bool, False),
+    ('name', str, 'default'),
+    ('precision', int, 10000),
+    ('relative_precision', float, 0.01),
+    ('load', bool, False),
+    ('jsonPath', str, './resources/data/default/out/sample.json'),
+    ('hysteresis', bool, True),
+    ('hysteresisSteps', int, 4),
+    ('hysteresisDenseSteps', int, 3),
+    ('hysteresisDenseMultiplier', int, 2),
+    ('hysteresisBranch', str, 'two'),
+    ('is2dPlot', bool, True),
+    ('xAxis', str, 'x'),
+    ('yAxis', str, 'y'),
+    ('borders', bool, True),
+    ('leftX', int, 20),
+    ('rightX', int, 50),
+    ('leftY', int, 20),
+    ('rightY', int, 50),
+    ('dataFolder', str, '../data'),
+    ('snapshotStride', int, 1),
+    ('reductionsOnly', bool, False),
+    ('roi', bool, False),
+    ('roiLeftX', int, 0),
+    ('roiRightX', int, 70),
+    ('roiLeftY', int, 0),
+    ('roiRightY', int, 70),
+    ('roiLeftZ', int, 0),
+    ('roiRightZ', int, 1),
+    ('isParallel', bool, False),
+    ('memory', int, 6144),
+)
+
+_TYPES = OrderedDict((name, t) for name, t, _ in FIELDS)
+_DEFAULTS = OrderedDict((name, value) for name, _, value in FIELDS)
+
+# разобранные файлы настроек: абсолютный путь -> (время изменения, размер, значения полей)
+_cache = {}
+
+
+def _convert(key, value):
+    # проверяет тип значения поля; числа любого типа (в том числе numpy) приводятся к int или float поля,
+    # целые числа в дробных полях (и дробные с целым значением в целых) -- тоже
+    t = _TYPES[key]
+    if t is float and isinstance(value, numbers.Real) and not isinstance(value, bool):
+        return float(value)
+    if t is int and isinstance(value, numbers.Integral) and not isinstance(value, bool):
+        return int(value)
+    if t is int and isinstance(value, numbers.Real) and not isinstance(value, bool) and float(value).is_integer():
+        return int(value)
+    if t in (int, float) or not isinstance(value, t):
+        raise ValueError('settings field {} must be {}, got {!r}'.format(key, t.__name__, value))
+    return value
+
+
+def _read(filename):
+    # разбирает файл настроек, результат запоминается до изменения файла
+    path = os.path.abspath(filename)
+    stat = os.stat(path)
+    cached = _cache.get(path)
+    if cached is not None and cached[:2] == (stat.st_mtime_ns, stat.st_size):
+        return cached[2]
+    with open(path) as f:
+        d = json.load(f)
+    values = {}
+    for key, value in d.items():
+        if key not in _TYPES:
+            # поля старых или более новых версий не мешают прочитать остальные
+            warnings.warn('{}: unknown settings field {} is ignored'.format(filename, key))
+            continue
+        values[key] = _convert(key, value)
+    _cache[path] = (stat.st_mtime_ns, stat.st_size, values)
+    return values
+
 
 class Settings:
+    __slots__ = tuple(_TYPES)
+
     def __init__(self, filename=None):
-        self._d = OrderedDict()
-        self._d['x'] = 70
-        self._d['y'] = 70
-        self._d['z'] = 1
-        self._d['n'] = 1
-        self._d['r'] = 1.25
-        self._d['d'] = 0.0
-        self._d['offset_x'] = 3.0
-        self._d['offset_y'] = 3.0
-        self._d['offset_z'] = 3.0
-        self._d['m'] = 456.0
-        self._d['kan'] = 13000.0
-        self._d['jex'] = 5.0
-        self._d['dipolDistance'] = 30.0
-        self._d['exchangeDistance'] = 3.1
-        self._d['viscosity'] = 0.5
-        self._d['t'] = 0.0
-        self._d['loc'] = 0
-        self._d['loc_theta'] = 90.0
-        self._d['loc_phi'] = 0.0
-        self._d['ot'] = 0
-        self._d['ot_theta'] = 90.0
-        self._d['ot_phi'] = 0.0
-        self._d['b_x'] = 500.0
-        self._d['b_y'] = 0.0
-        self._d['b_z'] = 0.0
-        self._d['time'] = 1.0
-        self._d['timeStep'] = 100
-        self._d['cyclicBoundaries'] = False
-        self._d['name'] = 'default'
-        self._d['precision'] = 10000
-        self._d['relative_precision'] = 0.01
-        self._d['load'] = False
-        self._d['jsonPath'] = './resources/data/default/out/sample.json'
-        self._d['hysteresis'] = True
-        self._d['hysteresisSteps'] = 6
-        self._d['hysteresisDenseSteps'] = 3
-        self._d['hysteresisDenseMultiplier'] = 2
-        self._d['hysteresisBranch'] = 'two'
-        self._d['is2dPlot'] = True
-        self._d['xAxis'] = 'x'
-        self._d['yAxis'] = 'y'
-        self._d['borders'] = True
-        self._d['leftX'] = 20
-        self._d['rightX'] = 50
-        self._d['leftY'] = 20
-        self._d['rightY'] = 50
-        self._d['dataFolder'] = '../data'
-        self._d['isParallel'] = False
-        self._d['memory'] = 6144
+        # повторное создание настроек из того же файла не разбирает его заново
+        for key, value in _DEFAULTS.items():
+            object.__setattr__(self, key, value)
         if filename is not None:
-            with open(filename) as f:
-                d = json.load(f)
-                for key, value in d.items():
-                    self._d[key] = value
-
-    @property
-    def x(self):
-        return self._d['x']
-
-    @x.setter
-    def x(self, value):
-        self._d['x'] = value
-
-    @property
-    def y(self):
-        return self._d['y']
-
-    @y.setter
-    def y(self, value):
-        self._d['y'] = value
-
-    @property
-    def z(self):
-        return self._d['z']
-
-    @z.setter
-    def z(self, value):
-        self._d['z'] = value
-
-    @property
-    def n(self):
-        return self._d['n']
-
-    @n.setter
-    def n(self, value):
-        self._d['n'] = value
-
-    @property
-    def r(self):
-        return self._d['r']
-
-    @r.setter
-    def r(self, value):
-        self._d['r'] = value
-
-    @property
-    def d(self):
-        return self._d['d']
-
-    @d.setter
-    def d(self, value):
-        self._d['d'] = value
-
-    @property
-    def offset_x(self):
-        return self._d['offset_x']
-
-    @offset_x.setter
-    def offset_x(self, value):
-        self._d['offset_x'] = value
-
-    @property
-    def offset_y(self):
-        return self._d['offset_y']
-
-    @offset_y.setter
-    def offset_y(self, value):
-        self._d['offset_y'] = value
-
-    @property
-    def offset_z(self):
-        return self._d['offset_z']
-
-    @offset_z.setter
-    def offset_z(self, value):
-        self._d['offset_z'] = value
-
-    @property
-    def m(self):
-        return self._d['m']
-
-    @m.setter
-    def m(self, value):
-        self._d['m'] = value
-
-    @property
-    def kan(self):
-        return self._d['kan']
-
-    @kan.setter
-    def kan(self, value):
-        self._d['kan'] = value
-
-    @property
-    def jex(self):
-        return self._d['jex']
-
-    @jex.setter
-    def jex(self, value):
-        self._d['jex'] = value
-
-    @property
-    def dipolDistance(self):
-        return self._d['dipolDistance']
-
-    @dipolDistance.setter
-    def dipolDistance(self, value):
-        self._d['dipolDistance'] = value
-
-    @property
-    def exchangeDistance(self):
-        return self._d['exchangeDistance']
-
-    @exchangeDistance.setter
-    def exchangeDistance(self, value):
-        self._d['exchangeDistance'] = value
-
-    @property
-    def viscosity(self):
-        return self._d['viscosity']
-
-    @viscosity.setter
-    def viscosity(self, value):
-        self._d['viscosity'] = value
-
-    @property
-    def t(self):
-        return self._d['t']
-
-    @t.setter
-    def t(self, value):
-        self._d['t'] = value
-
-    @property
-    def loc(self):
-        return self._d['loc']
-
-    @loc.setter
-    def loc(self, value):
-        self._d['loc'] = value
-
-    @property
-    def loc_theta(self):
-        return self._d['loc_theta']
-
-    @loc_theta.setter
-    def loc_theta(self, value):
-        self._d['loc_theta'] = value
-
-    @property
-    def loc_phi(self):
-        return self._d['loc_phi']
-
-    @loc_phi.setter
-    def loc_phi(self, value):
-        self._d['loc_phi'] = value
-
-    @property
-    def ot(self):
-        return self._d['ot']
-
-    @ot.setter
-    def ot(self, value):
-        self._d['ot'] = value
-
-    @property
-    def ot_theta(self):
-        return self._d['ot_theta']
-
-    @ot_theta.setter
-    def ot_theta(self, value):
-        self._d['ot_theta'] = value
-
-    @property
-    def ot_phi(self):
-        return self._d['ot_phi']
-
-    @ot_phi.setter
-    def ot_phi(self, value):
-        self._d['ot_phi'] = value
-
-    @property
-    def b_x(self):
-        return self._d['b_x']
-
-    @b_x.setter
-    def b_x(self, value):
-        self._d['b_x'] = value
-
-    @property
-    def b_y(self):
-        return self._d['b_y']
-
-    @b_y.setter
-    def b_y(self, value):
-        self._d['b_y'] = value
-
-    @property
-    def b_z(self):
-        return self._d['b_z']
+            for key, value in _read(filename).items():
+                object.__setattr__(self, key, value)
 
-    @b_z.setter
-    def b_z(self, value):
-        self._d['b_z'] = value
-
-    @property
-    def time(self):
-        return self._d['time']
-
-    @time.setter
-    def time(self, value):
-        self._d['time'] = value
-
-    @property
-    def timeStep(self):
-        return self._d['timeStep']
-
-    @timeStep.setter
-    def timeStep(self, value):
-        self._d['timeStep'] = value
-
-    @property
-    def cyclicBoundaries(self):
-        return self._d['cyclicBoundaries']
-
-    @cyclicBoundaries.setter
-    def cyclicBoundaries(self, value):
-        self._d['cyclicBoundaries'] = value
-
-    @property
-    def name(self):
-        return self._d['name']
-
-    @name.setter
-    def name(self, value):
-        self._d['name'] = value
-
-    @property
-    def precision(self):
-        return self._d['precision']
-
-    @precision.setter
-    def precision(self, value):
-        self._d['precision'] = value
-
-    @property
-    def relative_precision(self):
-        return self._d['relative_precision']
-
-    @relative_precision.setter
-    def relative_precision(self, value):
-        self._d['relative_precision'] = value
-
-    @property
-    def load(self):
-        return self._d['load']
-
-    @load.setter
-    def load(self, value):
-        self._d['load'] = value
-
-    @property
-    def jsonPath(self):
-        return self._d['jsonPath']
-
-    @jsonPath.setter
-    def jsonPath(self, value):
-        self._d['jsonPath'] = value
-
-    @property
-    def hysteresis(self):
-        return self._d['hysteresis']
-
-    @hysteresis.setter
-    def hysteresis(self, value):
-        self._d['hysteresis'] = value
-
-    @property
-    def hysteresisSteps(self):
-        return self._d['hysteresisSteps']
-
-    @hysteresisSteps.setter
-    def hysteresisSteps(self, value):
-        self._d['hysteresisSteps'] = value
-
-    @property
-    def hysteresisDenseSteps(self):
-        return self._d['hysteresisDenseSteps']
-
-    @hysteresisDenseSteps.setter
-    def hysteresisDenseSteps(self, value):
-        self._d['hysteresisDenseSteps'] = value
-
-    @property
-    def hysteresisDenseMultiplier(self):
-        return self._d['hysteresisDenseMultiplier']
-
-    @hysteresisDenseMultiplier.setter
-    def hysteresisDenseMultiplier(self, value):
-        self._d['hysteresisDenseMultiplier'] = value
-
-    @property
-    def hysteresisBranch(self):
-        return self._d['hysteresisBranch']
-
-    @hysteresisBranch.setter
-    def hysteresisBranch(self, value):
-        self._d['hysteresisBranch'] = value
-
-    @property
-    def is2dPlot(self):
-        return self._d['is2dPlot']
-
-    @is2dPlot.setter
-    def is2dPlot(self, value):
-        self._d['is2dPlot'] = value
-
-    @property
-    def xAxis(self):
-        return self._d['xAxis']
-
-    @xAxis.setter
-    def xAxis(self, value):
-        self._d['xAxis'] = value
-
-    @property
-    def yAxis(self):
-        return self._d['yAxis']
-
-    @yAxis.setter
-    def yAxis(self, value):
-        self._d['yAxis'] = value
-
-    @property
-    def borders(self):
-        return self._d['borders']
-
-    @borders.setter
-    def borders(self, value):
-        self._d['borders'] = value
-
-    @property
-    def leftX(self):
-        return self._d['leftX']
-
-    @leftX.setter
-    def leftX(self, value):
-        self._d['leftX'] = value
-
-    @property
-    def rightX(self):
-        return self._d['rightX']
-
-    @rightX.setter
-    def rightX(self, value):
-        self._d['rightX'] = value
-
-    @property
-    def leftY(self):
-        return self._d['leftY']
-
-    @leftY.setter
-    def leftY(self, value):
-        self._d['leftY'] = value
-
-    @property
-    def rightY(self):
-        return self._d['rightY']
-
-    @rightY.setter
-    def rightY(self, value):
-        self._d['rightY'] = value
-
-    @property
-    def dataFolder(self):
-        return self._d['dataFolder']
-
-    @dataFolder.setter
-    def dataFolder(self, value):
-        self._d['dataFolder'] = value
-
-    @property
-    def isParallel(self):
-        return self._d['isParallel']
-
-    @isParallel.setter
-    def isParallel(self, value):
-        self._d['isParallel'] = value
-
-    @property
-    def memory(self):
-        return self._d['memory']
-
-    @memory.setter
-    def memory(self, value):
-        self._d['memory'] = value
+    def __setattr__(self, key, value):
+        if key not in _TYPES:
+            raise AttributeError('unknown settings field {}'.format(key))
+        object.__setattr__(self, key, _convert(key, value))
 
     def __getitem__(self, key):
-        return self._d[key]
+        if key not in _TYPES:
+            raise KeyError(key)
+        return getattr(self, key)
 
     def __setitem__(self, key, value):
-        self._d[key] = value
+        if key not in _TYPES:
+            raise KeyError(key)
+        setattr(self, key, value)
+
+    def copy(self):
+        settings = Settings.__new__(Settings)
+        for key in _TYPES:
+            object.__setattr__(settings, key, getattr(self, key))
+        return settings
 
     def save_settings(self, filename):
         with open(filename, mode='w') as f:
-            json.dump(self._d, f)
+            json.dump(self.to_dict(), f)
+
+    def to_dict(self):
+        return OrderedDict((key, getattr(self, key)) for key in _TYPES)
 
+    # TODO: add pretty __str__
     def __str__(self):
         return ''
-
@@ -0,0 +1,201 @@
+"""
+Индекс состояний запуска
+
+Имена файлов состояний содержат все, что о них нужно знать графикам:
+    гистерезис: momenta_<шаг>_<ветвь>_<bx>_<by>_<bz>.txt (поле в Гс, Main.kt);
+    без гистерезиса: momenta_<число прыжков>_<id>_<время [с]>.txt (id = 1 -- сразу после прыжка,
+        2 -- после релаксации, Sample.kt).
+RunIndex разбирает имена один раз и хранит их в отсортированном по шагу numpy record array.
+Индекс запоминается в памяти процесса и в дисковом кэше (cache.SnapshotCache) и строится заново,
+только если в папке out (или out/bin) появились или исчезли файлы
+"""
+
+import os
+import threading
+
+import numpy as np
+
+from .archive import archive_path, snapshot_names
+from .cache import get_cache
+from .snapshots import binary_folder
+
+INDEX_DTYPE = [
+    ('step', np.int64),
+    ('branch', 'U3'),
+    ('bx', np.float64),
+    ('by', np.float64),
+    ('bz', np.float64),
+    # время [с] и id состояния запуска без гистерезиса
+    ('time', np.float64),
+    ('jump', np.int64),
+]
+
+# ветви гистерезиса в именах файлов (см. Settings.kt)
+BRANCHES = ('fst', 'neg', 'pos')
+
+# индексы по папкам out: абсолютный путь -> (отметка папки, индекс)
+_indexes = {}
+_lock = threading.Lock()
+
+
+def parse_snapshot_name(filename):
+    """
+    Разбирает имя файла состояния
+    :return: (шаг, ветвь, (bx, by, bz), время, id) или None, если имя другого формата;
+        для гистерезиса время -- nan, id -- 0, для запуска без гистерезиса ветвь -- '', поле -- nan
+    """
+    name = os.path.basename(filename)
+    if not name.startswith('momenta_') or not name.endswith('.txt'):
+        return None
+    # при русской локали дробная часть в имени отделяется запятой
+    parts = name[:-4].replace(',', '.').split('_')
+    try:
+        if len(parts) == 6 and parts[2] in BRANCHES:
+            return int(parts[1]), parts[2], tuple(float(b) for b in parts[3:]), np.nan, 0
+        if len(parts) == 4:
+            return int(parts[1]), '', (np.nan, np.nan, np.nan), float(parts[3]), int(parts[2])
+    except ValueError:
+        pass
+    return None
+
+
+def _stamp(out_folder):
+    # отметка состава папок: время изменения папки меняется при добавлении и удалении файлов,
+    # состав архива запуска -- вместе с временем изменения архива
+    stamps = []
+    for path in (out_folder, binary_folder(out_folder), archive_path(os.path.dirname(os.path.abspath(out_folder)))):
+        try:
+            stamps.append(os.stat(path).st_mtime_ns)
+        except OSError:
+            stamps.append(0)
+    return tuple(stamps)
+
+
+class RunIndex:
+    def __init__(self, out_folder, records, names):
+        """
+        :param out_folder: папка out запуска
+        :param records: массив INDEX_DTYPE, отсортированный по (step, jump)
+        :param names: имена файлов в том же порядке
+        """
+        self.out_folder = out_folder
+        self.records = records.view(np.recarray)
+        self.names = np.asarray(names, dtype=str)
+        # порядки сортировки по полям для поиска по диапазону, считаются при первом запросе
+        self._orders = {}
+
+    @classmethod
+    def build(cls, out_folder):
+        """
+        Строит индекс по содержимому папки out (текстовые и бинарные состояния)
+        """
+        rows, names = [], []
+        for name in snapshot_names(out_folder):
+            parsed = parse_snapshot_name(name)
+            if parsed is None:
+                continue
+            step, branch, b, t, jump = parsed
+            rows.append((step, branch) + b + (t, jump))
+            names.append(name)
+        records = np.array(rows, dtype=INDEX_DTYPE)
+        order = np.lexsort((names, records['jump'], records['step'])) if rows else np.arange(0)
+        return cls(out_folder, records[order], [names[i] for i in order])
+
+    def __len__(self):
+        return len(self.records)
+
+    def paths(self, records=None):
+        """
+        :return: пути к текстовым файлам состояний (всем или из результата поиска)
+        """
+        names = self.names if records is None else records.name
+        return ['{}/{}'.format(self.out_folder, name) for name in names]
+
+    def _select(self, positions):
+        positions = np.asarray(positions, dtype=np.int64)
+        selected = np.empty(len(positions), dtype=INDEX_DTYPE + [('name', self.names.dtype)]).view(np.recarray)
+        for field, _ in INDEX_DTYPE:
+            selected[field] = self.records[field][positions]
+        selected['name'] = self.names[positions]
+        return selected
+
+    def steps(self, numbers):
+        """
+        :param numbers: номера шагов
+        :return: записи (с полем name) состояний с этими номерами шагов, по возрастанию шага
+        """
+        steps = self.records.step
+        numbers = np.unique(np.asarray(list(numbers), dtype=np.int64))
+        left = np.searchsorted(steps, numbers, side='left')
+        right = np.searchsorted(steps, numbers, side='right')
+        positions = np.concatenate([np.arange(a, b) for a, b in zip(left, right)]) if len(numbers) else []
+        return self._select(positions)
+
+    def step(self, number):
+        """
+        :return: имя файла состояния шага number (последнего из них, если состояний несколько) или None
+        """
+        right = np.searchsorted(self.records.step, number, side='right')
+        if right == 0 or self.records.step[right - 1] != number:
+            return None
+        return str(self.names[right - 1])
+
+    def _order(self, field):
+        if field not in self._orders:
+            self._orders[field] = np.argsort(self.records[field], kind='stable')
+        return self._orders[field]
+
+    def _range(self, field, low, high):
+        order = self._order(field)
+        values = self.records[field][order]
+        left = 0 if low is None else np.searchsorted(values, low, side='left')
+        right = len(values) if high is None else np.searchsorted(values, high, side='right')
+        return self._select(np.sort(order[left:right]))
+
+    def branch(self, branch):
+        """
+        :return: записи состояний ветви гистерезиса branch ('fst', 'neg', 'pos'), по возрастанию шага
+        """
+        return self._range('branch', branch, branch)
+
+    def field_range(self, low=None, high=None, axis='x'):
+        """
+        :return: записи состояний с low <= b_axis <= high [Гс] (None -- без ограничения), по возрастанию шага
+        """
+        return self._range('b' + axis, low, high)
+
+    def time_range(self, low=None, high=None):
+        """
+        :return: записи состояний запуска без гистерезиса с low <= t <= high [с], по возрастанию шага
+        """
+        return self._range('time', low, high)
+
+
+def run_index(settings=None, out_folder=None):
+    """
+    Индекс состояний запуска; строится заново, только если состав папки out изменился
+    :param settings: настройки запуска (папка out -- <dataFolder>/<name>/out, дисковый кэш -- в dataFolder)
+    :param out_folder: папка out (если настройки не заданы; тогда индекс не сохраняется на диск)
+    :return: RunIndex
+    """
+    if out_folder is None:
+        out_folder = '{}/{}/out'.format(settings.dataFolder, settings.name)
+    path = os.path.abspath(out_folder)
+    stamp = _stamp(out_folder)
+    with _lock:
+        known = _indexes.get(path)
+    if known is not None and known[0] == stamp:
+        return known[1]
+
+    cache = get_cache(settings) if settings is not None else None
+    key = cache.key(out_folder, 'index', stamp=list(stamp)) if cache is not None else None
+    cached = cache.get(key) if cache is not None else None
+    if cached is not None:
+        index = RunIndex(out_folder, cached['records'], cached['names'])
+    else:
+        index = RunIndex.build(out_folder)
+        if cache is not None:
+            cache.put(key, records=np.asarray(index.records).view(np.ndarray), names=index.names)
+    with _lock:
+        _indexes[path] = (stamp, index)
+    return index
@@ -0,0 +1,221 @@
+"""
+Бинарный формат состояний образца
+
+Рядом с текстовыми файлами out/momenta_*.txt создается папка out/bin:
+    points.npy -- координаты частиц (N, 3), float64
+    cells.npy -- номера ячеек (N, 3), int32
+    axes.npy -- оси анизотропии (N, 3), float64 (если есть sample.json)
+    momenta_*.npy -- момент частиц (N, 3) для каждого шага (float32 или float64)
+    run_<тип>.npy -- моменты всех шагов одним массивом (шаги, N, 3), создается mamca.run.Run
+Геометрия записывается один раз на запуск, для каждого шага хранится только момент.
+Все файлы -- обычные .npy и открываются через np.load(..., mmap_mode='r')
+
+Архив завершенного запуска и чтение состояний из него -- в mamca.archive
+"""
+
+import json
+import os
+
+import numpy as np
+
+from .momenta import read_momenta, split_momenta
+
+BINARY_FOLDER = 'bin'
+POINTS_FILE = 'points.npy'
+CELLS_FILE = 'cells.npy'
+AXES_FILE = 'axes.npy'
+SAMPLE_FILE = 'sample.json'
+# петля гистерезиса, записанная во время моделирования (см. hysteresis.reductions_table)
+REDUCTIONS_FILE = 'reductions.txt'
+
+
+def binary_folder(out_folder):
+    return os.path.join(out_folder, BINARY_FOLDER)
+
+
+def check_own_folder(out_folder):
+    """
+    Проверяет, что папка out принадлежит своему запуску, прежде чем в ней что-то записывать или удалять:
+    у запусков, переиспользованных старыми версиями store.reuse_run, out -- символическая ссылка на папку
+    другого запуска, и изменения попали бы в тот запуск
+    :param out_folder: папка <dataFolder>/<name>/out
+    :raise ValueError: если out -- ссылка или лежит вне папки запуска
+    """
+    run_folder = os.path.realpath(os.path.dirname(os.path.abspath(out_folder)))
+    if os.path.islink(out_folder) or os.path.dirname(os.path.realpath(out_folder)) != run_folder:
+        raise ValueError('{} is shared with another run ({}); copy it into the run folder first'.format(
+            out_folder, os.path.realpath(out_folder)))
+
+
+def binary_path(filename):
+    """
+    :param filename: путь к текстовому файлу состояния (out/momenta_*.txt)
+    :return: путь к соответствующему бинарному файлу (out/bin/momenta_*.npy)
+    """
+    folder, name = os.path.split(filename)
+    return os.path.join(binary_folder(folder), os.path.splitext(name)[0] + '.npy')
+
+
+def has_binary_snapshot(filename):
+    """
+    Проверяет, есть ли актуальная бинарная копия текстового файла состояния
+    """
+    path = binary_path(filename)
+    if not os.path.exists(path):
+        return False
+    if not os.path.exists(os.path.join(os.path.dirname(path), POINTS_FILE)):
+        return False
+    if os.path.exists(filename):
+        return os.path.getmtime(path) >= os.path.getmtime(filename)
+    return True
+
+
+def snapshot_names(out_folder):
+    """
+    :return: отсортированный список имен файлов состояний (momenta_*.txt),
+        которые есть в текстовом или в бинарном виде
+    """
+    names = {f for f in os.listdir(out_folder) if f.startswith('momenta') and f.endswith('.txt')}
+    folder = binary_folder(out_folder)
+    if os.path.isdir(folder):
+        names.update(f[:-4] + '.txt' for f in os.listdir(folder) if f.startswith('momenta') and f.endswith('.npy'))
+    return sorted(names)
+
+
+def read_sample(filename):
+    """
+    Читает сохраненный образец (sample.json, формат JsonStuff.kt)
+    :return: словарь numpy массивов: loc, m, lma (N, 3), float64 и cells (N, 3), int
+    """
+    with open(filename) as f:
+        particles = [json.loads(p) for p in json.loads(json.load(f)['particles'])]
+
+    def vectors(key):
+        return np.array([[v['x'], v['y'], v['z']] for v in (json.loads(p[key]) for p in particles)],
+                        dtype=np.float64).reshape(-1, 3)
+
+    return {
+        'loc': vectors('loc'),
+        'm': vectors('m'),
+        'lma': vectors('lma'),
+        'cells': np.array([[p['x'], p['y'], p['z']] for p in particles], dtype=int).reshape(-1, 3)
+    }
+
+
+def _vector_json(v):
+    # формат Vector.toJsonString: декартовы и полярные координаты
+    x, y, z = (float(c) for c in v)
+    return json.dumps({
+        'x': x, 'y': y, 'z': z,
+        'r': float(np.sqrt(x * x + y * y + z * z)),
+        'theta': float(np.arctan2(np.sqrt(x * x + y * y), z)),
+        'phi': float(np.arctan2(y, x))
+    })
+
+
+def write_sample(filename, loc, m, lma, cells):
+    """
+    Записывает образец в формате sample.json, который моделирующая программа загружает
+    при load = true (jsonPath), например чтобы продолжить моделирование с сохраненного состояния
+    :param loc: координаты частиц (N, 3)
+    :param m: моменты частиц (N, 3)
+    :param lma: оси анизотропии (N, 3)
+    :param cells: номера ячеек (N, 3)
+    """
+    particles = [json.dumps({
+        'loc': _vector_json(loc[i]),
+        'm': _vector_json(m[i]),
+        'lma': _vector_json(lma[i]),
+        'x': int(cells[i][0]),
+        'y': int(cells[i][1]),
+        'z': int(cells[i][2])
+    }) for i in range(len(loc))]
+    with open(filename, mode='w') as f:
+        json.dump({'particles': json.dumps(particles)}, f, indent=2)
+
+
+def write_geometry(out_folder, points, cells, axes=None):
+    """
+    Записывает неизменную для всего запуска часть состояния
+    """
+    folder = binary_folder(out_folder)
+    if not os.path.exists(folder):
+        os.mkdir(folder)
+    np.save(os.path.join(folder, POINTS_FILE), np.asarray(points, dtype=np.float64))
+    np.save(os.path.join(folder, CELLS_FILE), np.asarray(cells, dtype=np.int32))
+    if axes is not None:
+        np.save(os.path.join(folder, AXES_FILE), np.asarray(axes, dtype=np.float64))
+
+
+def write_snapshot(filename, m, dtype=np.float64):
+    """
+    Записывает моменты частиц одного шага
+    :param filename: путь к текстовому файлу состояния, рядом с которым будет лежать бинарный
+    :param m: массив моментов (N, 3)
+    """
+    np.save(binary_path(filename), np.asarray(m, dtype=dtype))
+
+
+def read_geometry(out_folder, mmap_mode='r'):
+    """
+    :return: координаты частиц (N, 3) и номера ячеек (N, 3)
+    """
+    folder = binary_folder(out_folder)
+    points = np.load(os.path.join(folder, POINTS_FILE), mmap_mode=mmap_mode)
+    cells = np.load(os.path.join(folder, CELLS_FILE), mmap_mode=mmap_mode)
+    return points, cells
+
+
+def read_snapshot(filename, mmap_mode='r'):
+    """
+    Читает бинарное состояние
+    :param filename: путь к текстовому файлу состояния (сам файл может отсутствовать)
+    :return: то же, что и plots._read_vectors -- массив векторов в формате (x1, y1, z1, x2, y2, z2),
+        массив координат (x, y, z) и массив с номером ячейки (x, y, z)
+    """
+    points, cells = read_geometry(os.path.dirname(filename), mmap_mode)
+    half = np.load(binary_path(filename), mmap_mode=mmap_mode).astype(np.float64) / 2
+    vectors = np.hstack((points - half, points + half))
+    return vectors, np.asarray(points), np.asarray(cells, dtype=np.float64)
+
+
+def read_vectors(filename):
+    """
+    Читает состояние из бинарной копии, если она есть, иначе из текстового файла
+    :param filename: путь к текстовому файлу состояния
+    :return: массив векторов в формате (x1, y1, z1, x2, y2, z2),
+        массив координат (x, y, z) и массив с номером ячейки (x, y, z)
+    """
+    if has_binary_snapshot(filename):
+        return read_snapshot(filename)
+    return split_momenta(read_momenta(filename))
+
+
+def convert_run(settings, dtype=np.float64, remove_text=False):
+    """
+    Создает бинарные копии всех текстовых состояний запуска
+    :param settings: настройки запуска
+    :param dtype: тип, в котором хранятся моменты: np.float64 -- без потерь; во float32 копия вдвое меньше,
+        но read_vectors читает ее вместо текстового файла, и суммы, кэш и графики считаются с точностью float32
+    :param remove_text: удалять ли текстовые файлы после конвертации
+    :return: количество сконвертированных файлов
+    """
+    out_folder = '{}/{}/out'.format(settings.dataFolder, settings.name)
+    check_own_folder(out_folder)
+    files = ['{}/{}'.format(out_folder, f) for f in sorted(os.listdir(out_folder))
+             if f.startswith('momenta') and f.endswith('.txt')]
+    geometry_written = os.path.exists(os.path.join(binary_folder(out_folder), POINTS_FILE))
+    converted = 0
+    for filename in files:
+        if not has_binary_snapshot(filename):
+            vectors, points, cells = split_momenta(read_momenta(filename))
+            if not geometry_written:
+                sample_path = os.path.join(out_folder, SAMPLE_FILE)
+                axes = read_sample(sample_path)['lma'] if os.path.exists(sample_path) else None
+                write_geometry(out_folder, points, cells, axes)
+                geometry_written = True
+            write_snapshot(filename, vectors[:, 3:] - vectors[:, :3], dtype)
+            converted += 1
+        if remove_text:
+            os.remove(filename)
+    return converted
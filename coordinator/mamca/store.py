@@ -0,0 +1,173 @@
+"""
+Хранилище результатов моделирования, адресуемое по содержимому настроек
+
+Для каждого завершенного запуска в <dataFolder>/runs.json запоминается хэш его нормализованных
+настроек (без полей, не влияющих на моделирование: имени, путей, параметров рисования и т.п.).
+Если запускаются настройки с тем же хэшем и переиспользование включено (reuse=True в single_run), моделирование
+не выполняется, а файлы уже существующего запуска связываются жесткими ссылками (или копируются) под новым именем.
+Запуски, результат которых зависит от случайных чисел (случайные начальные состояния, тепловые прыжки),
+не переиспользуются: каждый повтор таких настроек -- новая реализация
+"""
+
+import hashlib
+import json
+import os
+import shutil
+import threading
+
+from .settings import Settings
+
+INDEX_FILE = 'runs.json'
+
+# поля настроек, которые не влияют на результат моделирования
+IGNORED_FIELDS = {'name', 'dataFolder', 'is2dPlot', 'xAxis', 'yAxis', 'borders',
+                  'leftX', 'rightX', 'leftY', 'rightY', 'isParallel', 'memory'}
+
+# поля настроек, определяющие, что записывается в out (Settings.kt); при значениях по умолчанию
+# они не попадают в хэш, поэтому хэши запусков, сделанных до появления этих полей, не меняются
+OUTPUT_FIELDS = {'snapshotStride', 'reductionsOnly', 'roi', 'roiLeftX', 'roiRightX', 'roiLeftY', 'roiRightY',
+                 'roiLeftZ', 'roiRightZ'}
+
+# значения loc и ot со случайными направлениями (Settings.kt): 0 -- рандом в 3D, 1 -- рандом в 2D
+RANDOM_DIRECTIONS = (0, 1)
+
+_index_lock = threading.Lock()
+
+
+def settings_hash(settings):
+    """
+    :return: sha256 нормализованных настроек (числа приводятся к float, ключи сортируются,
+        при загрузке состояния учитывается содержимое файла jsonPath)
+    """
+    d = {}
+    defaults = Settings()
+    for key, value in settings.to_dict().items():
+        if key in IGNORED_FIELDS or (key in OUTPUT_FIELDS and value == defaults[key]):
+            continue
+        if isinstance(value, int) and not isinstance(value, bool):
+            value = float(value)
+        d[key] = value
+    if settings.load:
+        with open(settings.jsonPath, mode='rb') as f:
+            d['jsonPath'] = hashlib.sha256(f.read()).hexdigest()
+    description = json.dumps(d, sort_keys=True)
+    return hashlib.sha256(description.encode('utf-8')).hexdigest()
+
+
+def is_stochastic(settings):
+    """
+    :return: True, если результат моделирования зависит от случайных чисел: случайные начальные моменты
+        или оси анизотропии (loc, ot в RANDOM_DIRECTIONS, если образец не загружается) или тепловые прыжки (t > 0)
+    """
+    random_start = not settings.load and (settings.loc in RANDOM_DIRECTIONS or settings.ot in RANDOM_DIRECTIONS)
+    return random_start or settings.t > 0
+
+
+def _index_path(settings):
+    return '{}/{}'.format(settings.dataFolder, INDEX_FILE)
+
+
+def _load_index(settings):
+    try:
+        with open(_index_path(settings)) as f:
+            return json.load(f)
+    except (IOError, ValueError):
+        return {}
+
+
+def _save_index(settings, index):
+    path = _index_path(settings)
+    temp_path = '{}.{}.tmp'.format(path, os.getpid())
+    with open(temp_path, mode='w') as f:
+        json.dump(index, f, indent=2, sort_keys=True)
+    os.replace(temp_path, path)
+
+
+def is_complete(data_folder, name, digest=None):
+    """
+    Проверяет, что запуск с именем name завершен (моделирующая программа пишет log.log в самом конце)
+    и, если передан digest, что его настройки имеют этот хэш
+    """
+    run_folder = '{}/{}'.format(data_folder, name)
+    if not os.path.exists('{}/log.log'.format(run_folder)) or not os.path.isdir('{}/out'.format(run_folder)):
+        return False
+    if digest is None:
+        return True
+    try:
+        return settings_hash(Settings('{}/settings_{}.json'.format(run_folder, name))) == digest
+    except (IOError, ValueError):
+        return False
+
+
+def find_run(settings):
+    """
+    :return: имя завершенного запуска с такими же настройками или None (всегда None для is_stochastic)
+    """
+    if is_stochastic(settings):
+        return None
+    digest = settings_hash(settings)
+    name = _load_index(settings).get(digest)
+    if name is not None and is_complete(settings.dataFolder, name, digest):
+        return name
+    return None
+
+
+def register_run(settings):
+    """
+    Запоминает завершенный запуск в индексе (запуски со случайными результатами не запоминаются)
+    """
+    if is_stochastic(settings):
+        return
+    digest = settings_hash(settings)
+    with _index_lock:
+        index = _load_index(settings)
+        index[digest] = settings.name
+        _save_index(settings, index)
+
+
+def reuse_run(settings, link=True):
+    """
+    Переиспользует результаты запуска с такими же настройками
+    :param settings: настройки нового запуска
+    :param link: связывать файлы папки out жесткими ссылками (иначе они копируются)
+    :return: True, если такой запуск найден и его результаты доступны под именем settings.name
+    """
+    source = find_run(settings)
+    if source is None:
+        return False
+    if source == settings.name:
+        return True
+
+    src_folder = '{}/{}'.format(settings.dataFolder, source)
+    dst_folder = '{}/{}'.format(settings.dataFolder, settings.name)
+    if os.path.islink(dst_folder) or os.path.isfile(dst_folder):
+        os.remove(dst_folder)
+    elif os.path.isdir(dst_folder):
+        shutil.rmtree(dst_folder)
+    os.makedirs('{}/moments'.format(dst_folder))
+
+    _link_tree('{}/out'.format(src_folder), '{}/out'.format(dst_folder), link)
+    shutil.copyfile('{}/log.log'.format(src_folder), '{}/log.log'.format(dst_folder))
+    settings.save_settings('{}/settings_{}.json'.format(dst_folder, settings.name))
+    print('{}: reusing results of identical run "{}"'.format(settings.name, source))
+    return True
+
+
+def _link_tree(src, dst, link=True):
+    """
+    Повторяет папку src в dst, связывая каждый файл жесткой ссылкой (или копируя его). В отличие от ссылки
+    на всю папку, удаление и замена файлов в одном запуске (convert_run, archive_run, новое моделирование)
+    не меняют другой
+    """
+    for root, _, files in os.walk(src):
+        folder = os.path.join(dst, os.path.relpath(root, src))
+        os.makedirs(folder, exist_ok=True)
+        for name in files:
+            source, target = os.path.join(root, name), os.path.join(folder, name)
+            try:
+                if not link:
+                    raise OSError
+                os.link(source, target)
+            except (OSError, NotImplementedError):
+                # жесткие ссылки не работают между разными файловыми системами
+                shutil.copy2(source, target)
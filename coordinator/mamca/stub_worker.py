@@ -0,0 +1,45 @@
+"""
+Заменитель рабочего процесса моделирующей программы для проверки пула (workers.py) без java и Mathematica
+
+Запуск: python -m mamca.stub_worker [задержка в секундах]
+Говорит по тому же протоколу, что и MaMCa.jar -w: для каждого пути к настройкам из stdin создает папку запуска
+с копией настроек, пустой папкой out и log.log, после чего пишет строку об окончании
+"""
+
+import os
+import sys
+import time
+
+from .settings import Settings
+from .workers import WORKER_DONE
+
+
+def run_stub(settings_fname, delay):
+    settings = Settings(settings_fname)
+    run_folder = '{}/{}'.format(settings.dataFolder, settings.name)
+    for folder in ('out', 'moments'):
+        os.makedirs('{}/{}'.format(run_folder, folder), exist_ok=True)
+    settings.save_settings('{}/settings_{}.json'.format(run_folder, settings.name))
+    print('__________{}__________'.format(settings.name))
+    time.sleep(delay)
+    with open('{}/log.log'.format(run_folder), mode='w') as f:
+        f.write('stub run of {}\n'.format(settings.name))
+
+
+def main():
+    delay = float(sys.argv[1]) if len(sys.argv) > 1 else 0
+    for line in sys.stdin:
+        settings_fname = line.strip()
+        if not settings_fname:
+            continue
+        try:
+            run_stub(settings_fname, delay)
+            code = 0
+        except Exception as e:
+            print(e)
+            code = 1
+        print('{} {} {}'.format(WORKER_DONE, code, settings_fname), flush=True)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,209 @@
+"""
+Генерация серий настроек (планы экспериментов)
+
+Диапазоны значений полей задаются функциями linear, geometric или явными списками и
+разворачиваются в план: полный перебор (grid), попарное объединение (zipped) или
+латинский гиперкуб (latin_hypercube). План записывается пачкой файлов настроек
+(для режимов multiple и parallel в create_and_draw.py) или одним файлом-манифестом
+"""
+
+import json
+import os
+from collections import OrderedDict
+
+import numpy as np
+
+from .settings import FIELDS, Settings
+from .store import settings_hash
+
+# число значащих цифр, до которого округляются сгенерированные значения (убирает ошибки вида 0.30000000000000004)
+SIGNIFICANT_DIGITS = 12
+
+# шаблон имени по умолчанию: имя исходных настроек и начало хэша
+DEFAULT_TEMPLATE = '{name}_{hash}'
+HASH_LENGTH = 12
+
+_TYPES = OrderedDict((name, t) for name, t, _ in FIELDS)
+
+
+def _clean(values):
+    return [float('{:.{}g}'.format(v, SIGNIFICANT_DIGITS)) for v in values]
+
+
+# допуск, с которым (stop - start) / step считается целым
+STEP_TOLERANCE = 1e-9
+
+
+def linear(start, stop, num=None, step=None):
+    """
+    Равномерный диапазон (значения считаются от start, ошибка не накапливается)
+    :param num: число значений, включая оба конца
+    :param step: шаг (если не задан num) -- значения start, start + step, ..., не дальше stop;
+        если шаг не делит диапазон, stop в диапазон не попадает
+    """
+    if num is not None:
+        return _clean(np.linspace(start, stop, num))
+    if step is None:
+        raise ValueError('either num or step must be specified')
+    if step == 0 or (stop - start) / step < -STEP_TOLERANCE:
+        raise ValueError('step {} does not lead from {} to {}'.format(step, start, stop))
+    num = int(np.floor((stop - start) / step + STEP_TOLERANCE)) + 1
+    return _clean(start + step * np.arange(num))
+
+
+def geometric(start, ratio, num):
+    """
+    Геометрическая прогрессия: start, start * ratio, ..., start * ratio^(num - 1)
+    """
+    return _clean(start * float(ratio) ** np.arange(num))
+
+
+def _check_fields(fields):
+    for field in fields:
+        if field not in _TYPES:
+            raise ValueError('unknown settings field {}'.format(field))
+    # порядок полей не зависит от порядка именованных аргументов
+    return [field for field in _TYPES if field in fields]
+
+
+def grid(base, template=None, **ranges):
+    """
+    Полный перебор: все сочетания значений полей
+    :param base: исходные настройки, поля которых не меняются
+    :param template: шаблон имени, например 'jex_{jex:.2f}' (доступны поля настроек, name и hash)
+    :param ranges: поле -> список значений
+    """
+    fields = _check_fields(ranges)
+    columns = [np.asarray(ranges[field], dtype=object) for field in fields]
+    indices = np.meshgrid(*[np.arange(len(c)) for c in columns], indexing='ij')
+    design = OrderedDict((field, column[index.ravel()]) for field, column, index in zip(fields, columns, indices))
+    return Sweep(base, design, template)
+
+
+def zipped(base, template=None, **ranges):
+    """
+    Попарное объединение: i-й запуск получает i-е значение каждого поля (списки должны быть одной длины)
+    """
+    fields = _check_fields(ranges)
+    lengths = {len(ranges[field]) for field in fields}
+    if len(lengths) > 1:
+        raise ValueError('all ranges must have the same length, got {}'.format(sorted(lengths)))
+    design = OrderedDict((field, np.asarray(ranges[field], dtype=object)) for field in fields)
+    return Sweep(base, design, template)
+
+
+def latin_hypercube(base, num, seed=0, template=None, **ranges):
+    """
+    Латинский гиперкуб: диапазон каждого поля делится на num равных частей,
+    и каждая часть используется ровно в одном запуске
+    :param num: число запусков
+    :param seed: зерно генератора (одинаковое зерно -- одинаковый план)
+    :param ranges: поле -> кортеж (min, max) для непрерывного диапазона или список допустимых значений;
+        для целых полей значения из непрерывного диапазона округляются
+    """
+    fields = _check_fields(ranges)
+    random = np.random.RandomState(seed)
+    design = OrderedDict()
+    for field in fields:
+        u = (random.permutation(num) + random.random_sample(num)) / num
+        bounds = ranges[field]
+        if isinstance(bounds, tuple):
+            low, high = bounds
+            values = low + u * (high - low)
+            if _TYPES[field] is int:
+                values = np.rint(values).astype(np.int64).tolist()
+            else:
+                values = _clean(values)
+        else:
+            choices = list(bounds)
+            values = [choices[i] for i in (u * len(choices)).astype(np.int64)]
+        design[field] = np.asarray(values, dtype=object)
+    return Sweep(base, design, template)
+
+
+class Sweep:
+    def __init__(self, base, design, template=None):
+        """
+        :param base: исходные настройки
+        :param design: упорядоченный словарь поле -> массив значений (по одному на запуск)
+        :param template: шаблон имени запуска (по умолчанию DEFAULT_TEMPLATE)
+        """
+        self.base = base
+        self.design = design
+        self.template = template or DEFAULT_TEMPLATE
+
+    def __len__(self):
+        return len(next(iter(self.design.values()))) if self.design else 1
+
+    def values(self, i):
+        """
+        :return: значения полей i-го запуска
+        """
+        return OrderedDict((field, column[i].item() if hasattr(column[i], 'item') else column[i])
+                           for field, column in self.design.items())
+
+    def settings(self):
+        """
+        Генератор настроек всех запусков; имена уникальны и не зависят от порядка вызовов
+        :return: пары (настройки, хэш нормализованных настроек, см. store.settings_hash)
+        """
+        names = set()
+        for i in range(len(self)):
+            settings = self.base.copy()
+            values = self.values(i)
+            for field, value in values.items():
+                settings[field] = value
+            digest = settings_hash(settings)
+            fields = settings.to_dict()
+            fields['name'] = self.base.name
+            settings.name = self.template.format(hash=digest[:HASH_LENGTH], **fields)
+            if settings.name in names:
+                raise ValueError('template "{}" gives duplicate name {}'.format(self.template, settings.name))
+            names.add(settings.name)
+            yield settings, digest
+
+    def write(self, folder):
+        """
+        Записывает по файлу настроек <name>.json на каждый запуск
+        :return: список путей к файлам
+        """
+        # имена проверяются на уникальность до записи первого файла
+        runs = list(self.settings())
+        if not os.path.exists(folder):
+            os.makedirs(folder)
+        fnames = []
+        for settings, _ in runs:
+            fname = '{}/{}.json'.format(folder, settings.name)
+            settings.save_settings(fname)
+            fnames.append(fname)
+        return fnames
+
+    def write_manifest(self, filename):
+        """
+        Записывает весь план в один файл: исходные настройки и для каждого запуска имя, хэш и значения полей
+        """
+        runs = []
+        for i, (settings, digest) in enumerate(self.settings()):
+            runs.append(OrderedDict([('name', settings.name), ('hash', digest), ('values', self.values(i))]))
+        manifest = OrderedDict([
+            ('base', self.base.to_dict()),
+            ('template', self.template),
+            ('fields', list(self.design)),
+            ('runs', runs)
+        ])
+        with open(filename, mode='w') as f:
+            json.dump(manifest, f, indent=1)
+
+
+def read_manifest(filename):
+    """
+    :return: Sweep из манифеста, записанного Sweep.write_manifest
+    """
+    with open(filename) as f:
+        manifest = json.load(f, object_pairs_hook=OrderedDict)
+    base = Settings()
+    for key, value in manifest['base'].items():
+        base[key] = value
+    design = OrderedDict((field, np.asarray([run['values'][field] for run in manifest['runs']], dtype=object))
+                         for field in manifest['fields'])
+    return Sweep(base, design, manifest['template'])
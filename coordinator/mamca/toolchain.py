@@ -0,0 +1,114 @@
+"""
+Пути к программам, нужным для моделирования (java, ядро Mathematica, JLinkNativeLibrary)
+
+Поиск по PATH (util.which) обходит все папки PATH для каждого расширения, поэтому он выполняется
+один раз на процесс координатора, а результат сохраняется в небольшой файл. Сохраненный результат
+используется, только если PATH не изменился и все найденные файлы по-прежнему существуют
+"""
+
+import json
+import os
+import sys
+import threading
+
+from .util import which
+
+# файл, в котором сохраняются найденные пути
+TOOLCHAIN_CACHE = os.path.join(os.path.expanduser('~'), '.mamca_toolchain.json')
+
+_toolchain = None
+_lock = threading.Lock()
+
+
+def _native_library_extension():
+    return '.dll' if 'win' in sys.platform else '.so'
+
+
+class Toolchain:
+    def __init__(self, java, mathematica, jlink):
+        """
+        :param java: путь к java
+        :param mathematica: путь к ядру Mathematica (MathKernel)
+        :param jlink: путь к JLinkNativeLibrary
+        все пути могут быть None, если программа не найдена
+        """
+        self.java = java
+        self.mathematica = mathematica
+        self.jlink = jlink
+
+    @classmethod
+    def discover(cls):
+        """
+        Ищет программы в PATH
+        """
+        return cls(which('java'), which('MathKernel'), which('JLinkNativeLibrary', _native_library_extension()))
+
+    def errors(self):
+        """
+        :return: список сообщений о ненайденных программах
+        """
+        errors = []
+        if self.java is None:
+            errors.append('Can\'t find java. Check that java is installed and put in PATH')
+        if self.mathematica is None:
+            errors.append('Can\'t find Mathematica Kernel. Check that Mathematica is installed and put in PATH')
+        if self.jlink is None:
+            errors.append('Can\'t find JLinkNativeLibrary{}. Check that Mathematica is installed and put in PATH'.format(
+                _native_library_extension()))
+        return errors
+
+    def valid(self):
+        """
+        :return: True, если все программы найдены и файлы существуют
+        """
+        paths = (self.java, self.mathematica, self.jlink)
+        return all(path is not None and os.path.isfile(path) for path in paths)
+
+    def to_dict(self):
+        return {'java': self.java, 'mathematica': self.mathematica, 'jlink': self.jlink}
+
+
+def _load(cache_file):
+    try:
+        with open(cache_file) as f:
+            d = json.load(f)
+        if d['path'] != os.environ.get('PATH') or d['platform'] != sys.platform:
+            return None
+        toolchain = Toolchain(d['java'], d['mathematica'], d['jlink'])
+    except (IOError, ValueError, KeyError, TypeError):
+        return None
+    return toolchain if toolchain.valid() else None
+
+
+def _save(cache_file, toolchain):
+    d = toolchain.to_dict()
+    d['path'] = os.environ.get('PATH')
+    d['platform'] = sys.platform
+    temp_file = '{}.{}.tmp'.format(cache_file, os.getpid())
+    try:
+        with open(temp_file, mode='w') as f:
+            json.dump(d, f, indent=2)
+        os.replace(temp_file, cache_file)
+    except OSError:
+        # без сохранения поиск просто повторится в следующем процессе
+        pass
+
+
+def get_toolchain(cache_file=TOOLCHAIN_CACHE, refresh=False):
+    """
+    :param cache_file: файл для сохранения найденных путей (None -- не сохранять)
+    :param refresh: искать программы заново, не используя запомненный результат
+    :return: Toolchain, найденный один раз на процесс
+    """
+    global _toolchain
+    with _lock:
+        if _toolchain is not None and not refresh:
+            return _toolchain
+        toolchain = _load(cache_file) if cache_file is not None and not refresh else None
+        if toolchain is None:
+            toolchain = Toolchain.discover()
+            # неполный результат не сохраняется, чтобы установленная позже программа была найдена
+            if cache_file is not None and toolchain.valid():
+                _save(cache_file, toolchain)
+        _toolchain = toolchain
+        return toolchain
@@ -0,0 +1,162 @@
+"""
+Пул долгоживущих рабочих процессов моделирующей программы
+
+Каждый запуск single_run стартует новую JVM, а она -- новое ядро Mathematica, что для коротких
+моделирований занимает больше времени, чем само моделирование. Рабочий процесс (MaMCa.jar -w)
+запускается один раз, читает из stdin пути к файлам настроек и после каждого моделирования пишет в stdout
+строку "WORKER_DONE <код возврата> <путь к настройкам>". Остальной вывод пересылается в stdout задачи
+"""
+
+import os
+import queue
+import subprocess
+import sys
+import threading
+
+from .executors import exit_program, single_run, worker_command
+from .scheduler import JVM_OVERHEAD, MEMORY_FRACTION, physical_memory
+from .settings import Settings
+from .store import register_run, reuse_run
+from . import MAMCA_PATH
+
+# префикс строки об окончании моделирования (WORKER_DONE в Constants.kt)
+WORKER_DONE = 'MAMCA_DONE'
+
+
+class Worker:
+    def __init__(self, command):
+        """
+        :param command: команда запуска рабочего процесса
+        """
+        self.command = command
+        self.process = subprocess.Popen(command, stdin=subprocess.PIPE, stdout=subprocess.PIPE,
+                                        stderr=subprocess.STDOUT, universal_newlines=True, bufsize=1)
+
+    def alive(self):
+        return self.process.poll() is None
+
+    def run(self, settings_fname, stdout=None):
+        """
+        Отправляет задачу рабочему процессу и ждет ее окончания
+        :param stdout: файл для вывода моделирования (по умолчанию sys.stdout)
+        :return: код возврата моделирования или -1, если рабочий процесс завершился
+        """
+        stdout = stdout or sys.stdout
+        try:
+            self.process.stdin.write(settings_fname + '\n')
+            self.process.stdin.flush()
+        except (BrokenPipeError, OSError):
+            return -1
+        for line in self.process.stdout:
+            if line.startswith(WORKER_DONE + ' '):
+                return int(line.split(' ', 2)[1])
+            stdout.write(line)
+        self.process.wait()
+        return -1
+
+    def close(self):
+        try:
+            self.process.stdin.close()
+        except OSError:
+            pass
+        self.process.wait()
+
+
+def default_pool_size(memory):
+    """
+    :param memory: память одного рабочего процесса [Мбайт]
+    :return: число рабочих процессов, которые помещаются в память и не превышают числа ядер
+    """
+    cpus = os.cpu_count() or 1
+    total = physical_memory()
+    if total is None:
+        return cpus
+    return max(1, min(cpus, int(total * MEMORY_FRACTION) // (memory + JVM_OVERHEAD)))
+
+
+class WorkerPool:
+    def __init__(self, size=None, memory=None, mamca_path=MAMCA_PATH, command=None, toolchain=None):
+        """
+        :param size: число рабочих процессов (по умолчанию -- сколько помещается в память, но не больше числа ядер)
+        :param memory: память JVM каждого рабочего процесса [Мбайт]; задачи, которым нужно больше,
+            запускаются отдельной JVM через single_run
+        :param mamca_path: путь к исполняемому файлу моделирующей программы
+        :param command: команда запуска рабочего процесса (по умолчанию -- MaMCa.jar в режиме -w),
+            например [sys.executable, '-m', 'mamca.stub_worker'] для проверки без java и Mathematica
+        :param toolchain: пути к java и Mathematica (toolchain.Toolchain), по умолчанию ищутся один раз на процесс
+        """
+        if command is None and memory is None:
+            raise ValueError('memory of workers must be specified')
+        self.size = size or default_pool_size(memory or 0)
+        self.memory = memory
+        self.mamca_path = mamca_path
+        self.command = command
+        self.toolchain = toolchain
+        self._idle = queue.Queue()
+        self._workers = []
+        self._lock = threading.Lock()
+
+    def _start_worker(self):
+        command = self.command
+        if command is None:
+            command = worker_command(self.memory, self.mamca_path, toolchain=self.toolchain)
+        return Worker(command)
+
+    def _checkout(self):
+        """
+        :return: свободный рабочий процесс; новые процессы запускаются по мере надобности
+        """
+        try:
+            worker = self._idle.get_nowait()
+        except queue.Empty:
+            with self._lock:
+                if len(self._workers) < self.size:
+                    worker = self._start_worker()
+                    self._workers.append(worker)
+                    return worker
+            worker = self._idle.get()
+        if not worker.alive():
+            # упавший процесс заменяется новым
+            with self._lock:
+                self._workers.remove(worker)
+                worker = self._start_worker()
+                self._workers.append(worker)
+        return worker
+
+    def run(self, settings_fname, stdout=None, exit_on_fail=False, reuse=False):
+        """
+        Запускает моделирование в свободном рабочем процессе,
+        аргументы и результат -- как у executors.single_run (подходит как run для SweepScheduler)
+        """
+        settings = Settings(settings_fname)
+        if self.memory is not None and settings.memory > self.memory:
+            return single_run(settings_fname, self.mamca_path, stdout=stdout, exit_on_fail=exit_on_fail, reuse=reuse,
+                              toolchain=self.toolchain)
+        if reuse and reuse_run(settings):
+            return 0
+        worker = self._checkout()
+        try:
+            code = worker.run(os.path.abspath(settings_fname), stdout)
+        finally:
+            self._idle.put(worker)
+        if code == 0:
+            register_run(settings)
+        elif exit_on_fail:
+            exit_program()
+        return code
+
+    def close(self):
+        """
+        Завершает рабочие процессы (они выходят, прочитав конец stdin)
+        """
+        with self._lock:
+            for worker in self._workers:
+                worker.close()
+            self._workers = []
+        self._idle = queue.Queue()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.close()
@@ -1,31 +1,19 @@
 from mamca import *
+from mamca.sweep import geometric, grid, latin_hypercube, linear
 
 """
     Небольшой скрипт для генерации наборов настроечных файлов
 """
 
 
-def drange(start, stop, step):
-    r = start
-    while r <= stop:
-        yield float(r)
-        r += step
-
-
-def mrange(start, step, n):
-    r = start
-    for _ in range(n):
-        yield float(r)
-        r *= step
-
-
 if __name__ == '__main__':
     setings_fname = './resources/settings.json'
     settings = Settings(setings_fname)
-    template = 'jex_{:.2f}'
-    folder_template = './resources/settings/{}.json'
-    for jex in drange(0.0, 5.0, 0.5):
-        name = template.format(jex)
-        settings.jex = jex
-        settings.name = name
-        settings.save_settings(folder_template.format(name))
+    folder = './resources/settings'
+    sweep = grid(settings, template='jex_{jex:.2f}', jex=linear(0.0, 5.0, step=0.5))
+    # sweep = grid(settings, template='jex_{jex:.2f}_kan_{kan:.0f}', jex=linear(0.0, 5.0, step=0.5),
+    #              kan=geometric(1e3, 2, 5))
+    # sweep = latin_hypercube(settings, 100, jex=(0.0, 5.0), t=(0.0, 300.0), loc=[0, 1])
+    fnames = sweep.write(folder)
+    # sweep.write_manifest('{}/manifest.json'.format(folder))
+    print('{} settings files written to {}'.format(len(fnames), folder))
@@ -0,0 +1,90 @@
+"""
+Диполь-дипольное поле через FFT (dipolar.DipolarKernel) в сравнении с прямым суммированием по парам
+"""
+
+import itertools
+import unittest
+
+import numpy as np
+
+from mamca.dipolar import DipolarKernel, lattice_loc
+from mamca.neighbors import lattice_box
+from mamca.settings import Settings
+
+
+def direct_field(loc, m, box=None, cutoff=None):
+    """
+    Сумма (3 (n * m_j) n - m_j) / r^3 по всем парам; при циклических границах перебираются соседние образы,
+    ближайший берется с весом 1, два равноудаленных (смещение в половину периода) -- с весом 1/2
+    """
+    box = np.zeros(3) if box is None else box
+    shifts = [(-1, 0, 1) if period > 0 else (0,) for period in box]
+    r0 = loc[np.newaxis, :, :] - loc[:, np.newaxis, :]
+    field = np.zeros_like(m)
+    for shift in itertools.product(*shifts):
+        r = r0 + np.array(shift) * box
+        weight = np.ones(r.shape[:2])
+        for axis in np.nonzero(box > 0)[0]:
+            half = box[axis] / 2
+            distance = np.abs(r[..., axis])
+            weight *= np.where(np.isclose(distance, half, rtol=0, atol=1e-9), 0.5, distance < half)
+        dist = np.sqrt((r * r).sum(axis=-1))
+        weight[dist == 0] = 0
+        if cutoff is not None:
+            weight[dist >= cutoff] = 0
+        safe = np.where(weight > 0, dist, 1)
+        n = r / safe[..., np.newaxis]
+        mn = (n * m[np.newaxis]).sum(axis=-1)
+        terms = (3 * mn[..., np.newaxis] * n - m[np.newaxis]) / safe[..., np.newaxis] ** 3
+        field += (weight[..., np.newaxis] * terms).sum(axis=1)
+    return field
+
+
+def lattice_settings(x, y, z, n, d, cyclic):
+    s = Settings()
+    s.x, s.y, s.z, s.n, s.d = x, y, z, n, d
+    s.cyclicBoundaries = cyclic
+    return s
+
+
+# четные и нечетные размеры, кольца из нескольких частиц и несколько слоев
+GEOMETRIES = ((6, 4, 1, 1, 0.0), (5, 3, 1, 2, 1.0), (6, 4, 2, 3, 1.0), (4, 4, 3, 1, 0.0))
+
+
+class TestDipolar(unittest.TestCase):
+    def check(self, cyclic, cutoff=None):
+        for geometry in GEOMETRIES:
+            s = lattice_settings(*geometry, cyclic=cyclic)
+            loc = lattice_loc(s)
+            m = np.random.RandomState(0).normal(size=loc.shape)
+            expected = direct_field(loc, m, lattice_box(s), cutoff)
+            field = DipolarKernel(s, cutoff).field(m)
+            self.assertLess(np.abs(field - expected).max() / np.abs(expected).max(), 1e-12, geometry)
+
+    def test_open(self):
+        self.check(False)
+
+    def test_open_cutoff(self):
+        self.check(False, 5.0)
+
+    def test_cyclic_cutoff(self):
+        self.check(True, 5.0)
+
+    def test_cyclic_full(self):
+        self.check(True)
+
+    def test_cyclic_full_symmetric(self):
+        # поле, которое частица i создает на j, равно полю j на i при одинаковых моментах: тензор симметричен
+        s = lattice_settings(4, 4, 1, 1, 0.0, True)
+        kernel = DipolarKernel(s)
+        n = s.x * s.y
+        for axis in range(3):
+            m = np.zeros((n, n, 3))
+            m[np.arange(n), np.arange(n), axis] = 1
+            # fields[j, i] -- поле частицы j на частице i
+            fields = kernel.field(m)
+            np.testing.assert_allclose(fields, np.swapaxes(fields, 0, 1), atol=1e-12)
+
+
+if __name__ == '__main__':
+    unittest.main()
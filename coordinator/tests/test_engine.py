@@ -0,0 +1,71 @@
+"""
+Регрессионный тест модели на numpy: гистерезис образца 6x6 с фиксированным зерном сравнивается
+с сохраненной петлей resources/engine_6x6_reductions.txt (записана этой же моделью), поэтому любое изменение
+релаксации, полей или записи reductions.txt видно по разнице петель
+"""
+
+import json
+import os
+import shutil
+import tempfile
+import unittest
+
+import numpy as np
+
+from mamca.engine import engine_run, simulate
+from mamca.hysteresis import read_reductions
+from mamca.settings import Settings
+from mamca.snapshots import REDUCTIONS_FILE
+
+RESOURCES = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'resources')
+REFERENCE = os.path.join(RESOURCES, 'engine_6x6_reductions.txt')
+
+
+def small_settings(data_folder):
+    s = Settings()
+    s.dataFolder = data_folder
+    s.name = 'e6'
+    s.x, s.y = 6, 6
+    s.leftX, s.rightX, s.leftY, s.rightY = 1, 4, 1, 4
+    s.roi = True
+    s.roiLeftX, s.roiRightX, s.roiLeftY, s.roiRightY = 0, 3, 2, 6
+    s.snapshotStride = 0
+    return s
+
+
+class TestEngine(unittest.TestCase):
+    def setUp(self):
+        self.folder = tempfile.mkdtemp()
+
+    def tearDown(self):
+        shutil.rmtree(self.folder)
+
+    def test_hysteresis_matches_reference(self):
+        settings = small_settings(self.folder)
+        with open(os.devnull, mode='w') as devnull:
+            simulate(settings, np.random.RandomState(0), devnull)
+        table, borders = read_reductions('{}/e6/out/{}'.format(self.folder, REDUCTIONS_FILE))
+        reference, reference_borders = read_reductions(REFERENCE)
+
+        self.assertEqual(borders, reference_borders)
+        self.assertEqual(len(table), len(reference))
+        for field in ('step', 'branch', 'region', 'bx', 'by', 'bz'):
+            np.testing.assert_array_equal(table[field], reference[field], err_msg=field)
+        for field in ('mx', 'my', 'mz'):
+            np.testing.assert_allclose(table[field], reference[field], rtol=1e-9, atol=1e-6, err_msg=field)
+
+    def test_thermal_jumps_rejected(self):
+        settings = small_settings(self.folder)
+        settings.t = 1.0
+        with self.assertRaises(ValueError):
+            simulate(settings, np.random.RandomState(0))
+
+        filename = os.path.join(self.folder, 'settings_e6.json')
+        with open(filename, mode='w') as f:
+            json.dump(settings.to_dict(), f)
+        with open(os.devnull, mode='w') as devnull:
+            self.assertEqual(engine_run(filename, stdout=devnull, exit_on_fail=False), 1)
+
+
+if __name__ == '__main__':
+    unittest.main()
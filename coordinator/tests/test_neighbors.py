@@ -0,0 +1,80 @@
+"""
+Списки соседей по сетке ячеек (neighbors.neighbor_list) в сравнении с перебором всех пар
+"""
+
+import unittest
+
+import numpy as np
+
+from mamca.dipolar import lattice_loc
+from mamca.neighbors import lattice_box, neighbor_list
+from mamca.settings import Settings
+
+
+def all_pairs(loc, distance, box=None):
+    """
+    Перебор всех пар частиц: соседи и векторы до них по строкам
+    """
+    r = loc[np.newaxis, :, :] - loc[:, np.newaxis, :]
+    if box is not None:
+        periodic = box > 0
+        r[..., periodic] -= box[periodic] * np.round(r[..., periodic] / box[periodic])
+    dist = np.sqrt((r * r).sum(axis=-1))
+    np.fill_diagonal(dist, distance)
+    rows = [np.nonzero(dist[i] < distance)[0] for i in range(len(loc))]
+    return rows, [r[i, row] for i, row in enumerate(rows)]
+
+
+def lattice_settings(x, y, z, cyclic):
+    s = Settings()
+    s.x, s.y, s.z = x, y, z
+    s.cyclicBoundaries = cyclic
+    return s
+
+
+class TestNeighbors(unittest.TestCase):
+    def check(self, loc, distance, box=None, chunk=None):
+        kwargs = {} if chunk is None else {'chunk': chunk}
+        neighbors = neighbor_list(loc, distance, box, **kwargs)
+        rows, vectors = all_pairs(loc, distance, box)
+        self.assertEqual(len(neighbors), len(loc))
+        np.testing.assert_array_equal(neighbors.counts(), [len(row) for row in rows])
+        for i, (row, v) in enumerate(zip(rows, vectors)):
+            part = slice(neighbors.indptr[i], neighbors.indptr[i + 1])
+            np.testing.assert_array_equal(neighbors.indices[part], row)
+            np.testing.assert_allclose(neighbors.vectors[part], v, atol=1e-12)
+
+    def test_open_random(self):
+        random = np.random.RandomState(0)
+        loc = random.uniform(0, 30, (400, 3)) * [1, 1, 0.2]
+        for distance in (1.0, 3.1, 10.0):
+            self.check(loc, distance)
+        # маленькие блоки пар-кандидатов дают тот же результат
+        self.check(loc, 3.1, chunk=100)
+
+    def test_open_lattice(self):
+        loc = lattice_loc(lattice_settings(10, 8, 3, False))
+        for distance in (3.1, 4.5, 30.0):
+            self.check(loc, distance)
+
+    def test_cyclic_lattice(self):
+        for x, y, z in ((10, 8, 1), (10, 8, 3), (7, 1, 2)):
+            s = lattice_settings(x, y, z, True)
+            box = lattice_box(s)
+            # ось z не периодическая
+            self.assertEqual(box[2], 0)
+            loc = lattice_loc(s)
+            for distance in (3.1, 4.5, box[box > 0].min() / 2):
+                self.check(loc, distance, box)
+
+    def test_distance_over_half_period(self):
+        s = lattice_settings(4, 4, 8, True)
+        box = lattice_box(s)
+        with self.assertRaises(ValueError):
+            neighbor_list(lattice_loc(s), box[0] / 2 + 1, box)
+        # большой радиус вдоль непериодической оси z допустим
+        self.check(lattice_loc(s), 5.9, box)
+
+
+if __name__ == '__main__':
+    unittest.main()
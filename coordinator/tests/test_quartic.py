@@ -0,0 +1,83 @@
+"""
+Корни уравнения минимумов (quartic.real_roots) в сравнении с np.roots, по одному уравнению
+"""
+
+import unittest
+
+import numpy as np
+
+from mamca.quartic import METHODS, real_roots
+
+
+def roots_one_by_one(a, b, c):
+    roots = np.full((len(b), 4), np.nan)
+    for i in range(len(b)):
+        values = np.roots([b[i], c[i] - a[i], 0, c[i] + a[i], -b[i]])
+        values = np.sort(values[np.abs(values.imag) <= 1e-7 * np.maximum(1, np.abs(values.real))].real)
+        roots[i, :len(values)] = values
+    return roots
+
+
+def angles(x):
+    # phi = 2 * atan(x); phi = pi и phi = -pi -- один и тот же угол (корень на бесконечности любого знака)
+    return np.sort((2 * np.arctan(x) + np.pi) % (2 * np.pi) - np.pi, axis=1)
+
+
+def angle_error(roots, reference):
+    delta = np.abs(angles(roots) - angles(reference))
+    delta = np.minimum(delta, 2 * np.pi - delta)
+    return np.nanmax(delta)
+
+
+def relative_residual(x, a, b, c):
+    # невязка уравнения, деленная на (1 + x^2)^2: конечна и для корней около бесконечности (phi около pi)
+    a, b, c = (v[:, np.newaxis] for v in (a, b, c))
+    f = ((b * x + c - a) * x * x + c + a) * x - b
+    return np.nanmax(np.abs(f) / (1 + x * x) ** 2 / (np.abs(a) + np.abs(b) + np.abs(c)))
+
+
+def coefficients(random, number, theta):
+    # a = 4 * V * K, b = t * sin(theta), c = 2t * cos(theta): поле под углом theta к оси анизотропии
+    t = random.uniform(0, 1, number)
+    return random.uniform(0.5, 2, number), t * np.sin(theta), 2 * t * np.cos(theta)
+
+
+class TestQuartic(unittest.TestCase):
+    number = 2000
+
+    def check(self, a, b, c, angle_tolerance):
+        reference = roots_one_by_one(a, b, c)
+        for method in METHODS:
+            roots = real_roots(a, b, c, method)
+            np.testing.assert_array_equal(np.isnan(roots).sum(axis=1), np.isnan(reference).sum(axis=1),
+                                          err_msg='number of roots, {}'.format(method))
+            self.assertLess(angle_error(roots, reference), angle_tolerance, method)
+            self.assertLess(relative_residual(roots, a, b, c), 1e-12, method)
+
+    def test_random(self):
+        random = np.random.RandomState(0)
+        self.check(*coefficients(random, self.number, random.uniform(-np.pi, np.pi, self.number)), 1e-12)
+
+    def test_near_collinear(self):
+        # поле почти вдоль оси (малое b, при theta около pi один корень уходит на бесконечность):
+        # случай, для которого уравнение решается в повернутой переменной; np.roots здесь сам теряет точность,
+        # поэтому допуск по углу больше, а невязка проверяется отдельно
+        random = np.random.RandomState(1)
+        for center in (0, np.pi):
+            for width in (1e-3, 1e-6, 1e-9):
+                theta = center + random.uniform(-width, width, self.number)
+                self.check(*coefficients(random, self.number, theta), 1e-6)
+
+    def test_exactly_collinear(self):
+        a = np.array([1.0, 2.0, 1.0])
+        b = np.zeros(3)
+        c = np.array([0.5, -0.5, 3.0])
+        roots = real_roots(a, b, c)
+        with np.errstate(invalid='ignore'):
+            x = np.sqrt(-(c + a) / (c - a))
+        expected = np.sort(np.column_stack((np.zeros(3), x, -x, np.full(3, np.nan))), axis=1)
+        np.testing.assert_allclose(roots, expected)
+
+
+if __name__ == '__main__':
+    unittest.main()
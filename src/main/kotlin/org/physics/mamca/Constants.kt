@@ -60,3 +60,9 @@ const val DIGITS = 2
 
 // число символов после запятой для отправки в математику
 const val MATH_DIGITS = 10
+
+// префикс строки, которой рабочий процесс (режим --worker) сообщает об окончании моделирования
+const val WORKER_DONE = "MAMCA_DONE"
+
+// файл в папке out, в который при гистерезисе пишутся суммарные моменты образца на каждом шаге
+const val REDUCTIONS_FILE = "reductions.txt"
@@ -19,11 +19,17 @@ fun main(args: Array<String>) {
     options.addOption(Option.
             builder("s").
             hasArg().
-            required().
             longOpt("settings").
             desc("path to json settings file").
             build()
     )
+    // worker mode
+    options.addOption(Option.
+            builder("w").
+            longOpt("worker").
+            desc("read paths to json settings files from stdin and run them one by one").
+            build()
+    )
     //Mathematica path
     options.addOption(Option.
             builder("m").
@@ -50,11 +56,57 @@ fun main(args: Array<String>) {
 
     prop.setProperty("MATHEMATICA_PATH", cmd.getOptionValue("mathematica"))
 
-    val settingsFile = cmd.getOptionValue("settings")
+    if (cmd.hasOption("worker")) {
+        workerLoop()
+        return
+    }
+    if (!cmd.hasOption("settings")) {
+        formatter.printHelp("utility-name", options)
+        System.exit(1)
+        return
+    }
+
+    val code = runSimulation(cmd.getOptionValue("settings"))
+    if (code != 0) {
+        System.exit(code)
+    }
+    playSuccessNotification()
+}
+
+/**
+ * Режим рабочего процесса: читает из stdin пути к файлам настроек (по одному в строке)
+ * и запускает моделирования по очереди в одной JVM, так что запуск JVM и ядра Mathematica
+ * оплачивается один раз. После каждого моделирования в stdout пишется строка
+ * "$WORKER_DONE <код возврата> <путь к настройкам>"
+ */
+fun workerLoop() {
+    val input = System.`in`.bufferedReader()
+    while (true) {
+        val settingsFile = input.readLine()?.trim() ?: break
+        if (settingsFile.isEmpty()) {
+            continue
+        }
+        val code = try {
+            runSimulation(settingsFile)
+        } catch (e: Exception) {
+            println(e.message ?: e.toString())
+            1
+        }
+        println("$WORKER_DONE $code $settingsFile")
+        System.out.flush()
+    }
+}
+
+/**
+ * Запускает моделирование с настройками из файла
+ * возвращает код возврата (0, если моделирование прошло успешно)
+ */
+fun runSimulation(settingsFile: String): Int {
+    Logger.clear()
     val settings = loadSettingsFromJson(settingsFile)
 
     if (checkSettings(settings)) {
-        System.exit(1)
+        return 1
     }
 
     prepareFolders(settings)
@@ -88,8 +140,7 @@ fun main(args: Array<String>) {
     File("${settings.dataFolder}/${settings.name}/log.log").printWriter().use { out ->
         out.write(Logger.toString())
     }
-
-    playSuccessNotification()
+    return 0
 }
 
 /**
@@ -101,6 +152,10 @@ fun checkSettings(settings: Settings): Boolean {
         Logger.info("`hysteresisBranch` property can only be only `fst`, `neg`, `pos` or `all`")
         return true
     }
+    if (settings.snapshotStride < 0) {
+        Logger.info("`snapshotStride` property must be non-negative")
+        return true
+    }
     return false
 }
 
@@ -139,8 +194,8 @@ fun prepareFolders(settings: Settings) {
             if (e.message == null) {
                 throw e
             }
-            println(e.message)
-            System.exit(1)
+            // в режиме рабочего процесса JVM не должна завершаться, поэтому ошибка пробрасывается
+            throw IllegalStateException(e.message, e)
         }
     }
 
@@ -167,8 +222,7 @@ fun prepareFolders(settings: Settings) {
     }
 
     if (!done) {
-        println("Creation of out directories failed.")
-        System.exit(1)
+        throw IllegalStateException("Creation of out directories failed.")
     }
 }
 
@@ -242,80 +296,104 @@ fun hysteresisRun(settings: Settings): Long {
     sample.dumpToJsonFile(outFolder.canonicalPath, "sample.json")
 //    sample.saveState(outFolder = outFolder.canonicalPath, filename = "momenta_${0.format(digitsOfIndex)}_fst_0.0_0.0_0.0.txt")
 
-    val midTime = System.currentTimeMillis()
+    // петля гистерезиса: суммарный момент по всему образцу, окну borders и окну roi на каждом шаге
+    // поток закрывается и при исключении во время моделирования
+    val reductions = File(outFolder, REDUCTIONS_FILE).printWriter()
+    return reductions.use {
+        with (settings) {
+            reductions.println("# borders $borders $leftX $rightX $leftY $rightY")
+        }
+        reductions.println("step branch region bx by bz mx my mz")
 
-    fun processAndSave(direction: String) {
-        println("__________${settings.name}__________")
-        val field = listOf(sample.b.x, sample.b.y, sample.b.z).map { it * TESLA_TO_OE }.map { it.format(3) }
-        Logger.info("b: ${Vector(field)}")
-                .info("step: $stepIndex of $totalNumberOfSteps")
-        sample.processModel()
-        Logger.addDelimiter()
-        sample.saveState(
-                outFolder.canonicalPath,
-                "momenta_${stepIndex.format(digitsOfIndex)}_${direction}_${field[0]}_${field[1]}_${field[2]}.txt")
-    }
+        val midTime = System.currentTimeMillis()
 
-    fun step(inc: Boolean, direction: String): Boolean {
-        /**
-         * функция, занимающаяся изменением поля и релаксацией системы
-         * возвращает true, если пора менять направление движения
-         */
-        processAndSave(direction)
-        stepIndex += 1
-        val stepVal: Vector
-        if (abs(sample.b) < abs(borderB)) {
-            stepVal = bDenseStep
-            settings.time = denseTime
-        } else {
-            stepVal = bLinStep
-            settings.time = defaultTime
+        fun processAndSave(direction: String) {
+            println("__________${settings.name}__________")
+            val field = listOf(sample.b.x, sample.b.y, sample.b.z).map { it * TESLA_TO_OE }.map { it.format(3) }
+            Logger.info("b: ${Vector(field)}")
+                    .info("step: $stepIndex of $totalNumberOfSteps")
+            sample.processModel()
+            Logger.addDelimiter()
+
+            val totals = mutableListOf("full" to sample.totalMoment(), "borders" to sample.totalMoment(sample::inBorders))
+            if (settings.roi) {
+                totals.add("roi" to sample.totalMoment(sample::inRoi))
+            }
+            for ((region, m) in totals) {
+                reductions.println("$stepIndex $direction $region ${field[0]} ${field[1]} ${field[2]} ${m.x} ${m.y} ${m.z}")
+            }
+            reductions.flush()
+
+            // полное состояние -- на первом шаге и далее на каждом snapshotStride-м
+            val stride = settings.snapshotStride
+            if (!settings.reductionsOnly && stride > 0 && (stepIndex - 1) % stride == 0) {
+                sample.saveState(
+                        outFolder.canonicalPath,
+                        "momenta_${stepIndex.format(digitsOfIndex)}_${direction}_${field[0]}_${field[1]}_${field[2]}.txt")
+            }
         }
 
-        if (inc) {
-            sample.b += stepVal
-        } else {
-            sample.b -= stepVal
+        fun step(inc: Boolean, direction: String): Boolean {
+            /**
+             * функция, занимающаяся изменением поля и релаксацией системы
+             * возвращает true, если пора менять направление движения
+             */
+            processAndSave(direction)
+            stepIndex += 1
+            val stepVal: Vector
+            if (abs(sample.b) < abs(borderB)) {
+                stepVal = bDenseStep
+                settings.time = denseTime
+            } else {
+                stepVal = bLinStep
+                settings.time = defaultTime
+            }
+
+            if (inc) {
+                sample.b += stepVal
+            } else {
+                sample.b -= stepVal
+            }
+            return abs(sample.b) > abs(maxB)
         }
-        return abs(sample.b) > abs(maxB)
-    }
 
-    // __________fst__________
-    if (all or fst) {
-        sample.b = Vector()
-        while (true) {
-            val stop = step(true, FST)
-            if (stop) {
-                step(true, FST)
-                break
+        // __________fst__________
+        if (all or fst) {
+            sample.b = Vector()
+            while (true) {
+                val stop = step(true, FST)
+                if (stop) {
+                    step(true, FST)
+                    break
+                }
             }
         }
-    }
 
-    // __________neg__________
-    if (all or two or neg) {
-        sample.b = maxB
-        while (true) {
-            val stop = step(false, NEG)
-            if (stop) {
-                step(false, NEG)
-                break
+        // __________neg__________
+        if (all or two or neg) {
+            sample.b = maxB
+            while (true) {
+                val stop = step(false, NEG)
+                if (stop) {
+                    step(false, NEG)
+                    break
+                }
             }
         }
-    }
 
-    // __________pos__________
-    if (all or two or pos) {
-        sample.b = -maxB
-        while (true) {
-            val stop = step(true, POS)
-            if (stop) {
-                step(false, POS)
-                break
+        // __________pos__________
+        if (all or two or pos) {
+            sample.b = -maxB
+            while (true) {
+                val stop = step(true, POS)
+                if (stop) {
+                    step(false, POS)
+                    break
+                }
             }
         }
-    }
 
-    return midTime
+        midTime
+    }
 }
 
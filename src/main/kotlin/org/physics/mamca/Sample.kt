@@ -355,10 +355,13 @@ class Sample : Serializable {
      * @param filename имя сохраняемого файла
      */
     fun saveState(outFolder: String = ".", filename: String = "momenta.txt") {
-        // записывает в файл текущее состояние моментов
+        // записывает в файл текущее состояние моментов (при settings.roi -- только частиц из окна roi*)
         val path = outFolder + File.separator + filename
         File(path).printWriter().use { out ->
             for (p in particles) {
+                if (settings.roi && !inRoi(p)) {
+                    continue
+                }
                 // координтаты, [нм]
                 val x = p.loc.x
                 val y = p.loc.y
@@ -384,6 +387,38 @@ class Sample : Serializable {
         }
     }
 
+    /**
+     * лежит ли частица в окне ячеек roi* из настроек
+     */
+    fun inRoi(p: Particle): Boolean {
+        val (x, y, z) = p.cell
+        return settings.roiLeftX <= x && x < settings.roiRightX &&
+                settings.roiLeftY <= y && y < settings.roiRightY &&
+                settings.roiLeftZ <= z && z < settings.roiRightZ
+    }
+
+    /**
+     * лежит ли частица в окне borders из настроек (если окно выключено -- любая частица)
+     */
+    fun inBorders(p: Particle): Boolean {
+        val (x, y, _) = p.cell
+        return !settings.borders || (settings.leftX <= x && x < settings.rightX &&
+                settings.leftY <= y && y < settings.rightY)
+    }
+
+    /**
+     * суммарный момент частиц, удовлетворяющих условию [магнетон бора]
+     */
+    fun totalMoment(filter: (Particle) -> Boolean = { true }): Vector {
+        var total = Vector()
+        for (p in particles) {
+            if (filter(p)) {
+                total += p.m
+            }
+        }
+        return total * settings.m
+    }
+
     /**
      * сериализует образец в json строку
      */
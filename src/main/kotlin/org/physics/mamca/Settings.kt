@@ -78,6 +78,17 @@ data class Settings(val x: Int = 70, // количество клеток по x
 
                     val dataFolder: String = "../data", // путь к папке для выходных данных
 
+                    // что записывать при гистерезисе: петля (суммарные моменты) пишется в out/reductions.txt всегда
+                    val snapshotStride: Int = 1, // полное состояние записывается на каждом snapshotStride-м шаге
+                    val reductionsOnly: Boolean = false, // записывать только петлю, без состояний
+                    val roi: Boolean = false, // записывать в состояния только частицы из окна ячеек roi*
+                    val roiLeftX: Int = 0,  // roiLeftX <= x < roiRightX
+                    val roiRightX: Int = 70,
+                    val roiLeftY: Int = 0,  // с Y и Z координатами аналогично
+                    val roiRightY: Int = 70,
+                    val roiLeftZ: Int = 0,
+                    val roiRightZ: Int = 1,
+
                     val isParallel: Boolean = false, // использовать ли параллельные вычисления
                     val memory: Int = 6144 // количество памяти, выделяемой для java-машины, Мбайт
 )
@@ -92,11 +103,11 @@ val BRANCHES = setOf(ALL, TWO, FST, NEG, POS)
 // списки с полями типа string и boolean
 // костыль
 val stringFields = setOf("name", "jsonPath", "dataFolder", "outFolder", "picFolder", "logFolder", "xAxis", "yAxis", "hysteresisBranch")
-val booleanFields = setOf("load", "hysteresis", "is2dPlot", "isParallel", "borders", "cyclicBoundaries")
+val booleanFields = setOf("load", "hysteresis", "is2dPlot", "isParallel", "borders", "cyclicBoundaries", "reductionsOnly", "roi")
 
 // количество полей в блоке, отделенном от остальных новой строкой
 // нужен, чтобы поля были логически разделены пустыми строками
-val newLines = listOf(4, 5, 3, 2, 2, 3, 3, 3, 2, 1, 1, 4, 5, 3, 5, 1, 3)
+val newLines = listOf(4, 5, 3, 2, 2, 3, 3, 3, 2, 1, 1, 4, 5, 3, 5, 1, 9, 3)
 
 fun loadSettingsFromJson(filename: String): Settings {
     val mapper = jacksonObjectMapper()
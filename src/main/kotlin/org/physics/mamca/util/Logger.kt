@@ -26,5 +26,13 @@ object Logger {
         return this
     }
 
+    /**
+     * очищает лог перед следующим моделированием в той же JVM
+     */
+    fun clear(): Logger {
+        builder.setLength(0)
+        return this
+    }
+
     override fun toString(): String = builder.toString()
 }
\ No newline at end of file
@@ -12,9 +12,6 @@ import java.io.File
 fun main(args: Array<String>) {
     val code = StringBuilder()
     val tab = "    "
-    val dTab = tab + tab
-    val tTab = dTab + tab
-    val fTab = tTab + tab
 
     // мапа с именами полей и их значениями по-умолчанию
     val fields = Settings().toString().substringAfter("Settings(").
@@ -24,6 +21,20 @@ fun main(args: Array<String>) {
                 key to value
             }
 
+    // тип поля в питоне: строки и булевы поля перечислены явно, остальные различаются по записи значения
+    fun pythonType(field: String, value: String): String = when {
+        field in stringFields -> "str"
+        field in booleanFields -> "bool"
+        value.contains('.') || value.contains('E') -> "float"
+        else -> "int"
+    }
+
+    fun pythonValue(field: String, value: String): String = when (field) {
+        in stringFields -> "'$value'"
+        in booleanFields -> value.capitalize()
+        else -> value
+    }
+
     with (code) {
         append("\"\"\"\n")
         append("That file generated automatically, don't change it\n")
@@ -31,60 +42,110 @@ fun main(args: Array<String>) {
         append("\n")
 
         append("import json\n")
+        append("import numbers\n")
+        append("import os\n")
+        append("import warnings\n")
         append("from collections import OrderedDict\n")
-        append("\n\n")
-
-        append("class Settings:\n")
-        append("${tab}def __init__(self, filename=None):\n")
-        append("${dTab}self._d = OrderedDict()\n")
+        append("\n")
 
+        append("# поля настроек: имя, тип и значение по умолчанию (как в Settings.kt)\n")
+        append("FIELDS = (\n")
         for ((field, value) in fields) {
-            if (field in stringFields)
-                append("${dTab}self._d['$field'] = '$value'\n")
-            else if (field in booleanFields)
-                append("${dTab}self._d['$field'] = ${value.capitalize()}\n")
-            else
-                append("${dTab}self._d['$field'] = $value\n")
+            append("$tab('$field', ${pythonType(field, value)}, ${pythonValue(field, value)}),\n")
         }
+        append(")\n")
+        append(SETTINGS_CLASS)
+    }
 
-        append("${dTab}if filename is not None:\n")
-        append("${tTab}with open(filename) as f:\n")
-        append("${fTab}d = json.load(f)\n")
-        append("${fTab}for key, value in d.items():\n")
-        append("$fTab${tab}self._d[key] = value\n")
-        append("\n")
+    File("coordinator/mamca/settings.py").printWriter().use { out ->
+        out.write(code.toString())
+    }
+}
 
-        for (field in fields.keys) {
-            append("$tab@property\n")
-            append("${tab}def $field(self):\n")
-            append("${dTab}return self._d['$field']\n")
-            append("\n")
-            append("$tab@$field.setter\n")
-            append("${tab}def $field(self, value):\n")
-            append("${dTab}self._d['$field'] = value\n")
-            append("\n")
-        }
+// общая часть питоновского класса настроек, не зависящая от полей
+private val SETTINGS_CLASS = """
+_TYPES = OrderedDict((name, t) for name, t, _ in FIELDS)
+_DEFAULTS = OrderedDict((name, value) for name, _, value in FIELDS)
 
-        append("${tab}def __getitem__(self, key):\n")
-        append("${dTab}return self._d[key]\n")
-        append("\n")
+# разобранные файлы настроек: абсолютный путь -> (время изменения, размер, значения полей)
+_cache = {}
 
-        append("${tab}def __setitem__(self, key, value):\n")
-        append("${dTab}self._d[key] = value\n")
-        append("\n")
 
-        append("${tab}def save_settings(self, filename):\n")
-        append("${dTab}with open(filename, mode='w') as f:\n")
-        append("${tTab}json.dump(self._d, f)\n")
-        append("\n")
+def _convert(key, value):
+    # проверяет тип значения поля; числа любого типа (в том числе numpy) приводятся к int или float поля,
+    # целые числа в дробных полях (и дробные с целым значением в целых) -- тоже
+    t = _TYPES[key]
+    if t is float and isinstance(value, numbers.Real) and not isinstance(value, bool):
+        return float(value)
+    if t is int and isinstance(value, numbers.Integral) and not isinstance(value, bool):
+        return int(value)
+    if t is int and isinstance(value, numbers.Real) and not isinstance(value, bool) and float(value).is_integer():
+        return int(value)
+    if t in (int, float) or not isinstance(value, t):
+        raise ValueError('settings field {} must be {}, got {!r}'.format(key, t.__name__, value))
+    return value
 
-        // TODO: add pretty __str__
-        append("${tab}def __str__(self):\n")
-        append("${dTab}return ''\n")
-        append("\n")
-    }
 
-    File("coordinator/mamca/settings.py").printWriter().use { out ->
-        out.write(code.toString())
-    }
-}
+def _read(filename):
+    # разбирает файл настроек, результат запоминается до изменения файла
+    path = os.path.abspath(filename)
+    stat = os.stat(path)
+    cached = _cache.get(path)
+    if cached is not None and cached[:2] == (stat.st_mtime_ns, stat.st_size):
+        return cached[2]
+    with open(path) as f:
+        d = json.load(f)
+    values = {}
+    for key, value in d.items():
+        if key not in _TYPES:
+            # поля старых или более новых версий не мешают прочитать остальные
+            warnings.warn('{}: unknown settings field {} is ignored'.format(filename, key))
+            continue
+        values[key] = _convert(key, value)
+    _cache[path] = (stat.st_mtime_ns, stat.st_size, values)
+    return values
+
+
+class Settings:
+    __slots__ = tuple(_TYPES)
+
+    def __init__(self, filename=None):
+        # повторное создание настроек из того же файла не разбирает его заново
+        for key, value in _DEFAULTS.items():
+            object.__setattr__(self, key, value)
+        if filename is not None:
+            for key, value in _read(filename).items():
+                object.__setattr__(self, key, value)
+
+    def __setattr__(self, key, value):
+        if key not in _TYPES:
+            raise AttributeError('unknown settings field {}'.format(key))
+        object.__setattr__(self, key, _convert(key, value))
+
+    def __getitem__(self, key):
+        if key not in _TYPES:
+            raise KeyError(key)
+        return getattr(self, key)
+
+    def __setitem__(self, key, value):
+        if key not in _TYPES:
+            raise KeyError(key)
+        setattr(self, key, value)
+
+    def copy(self):
+        settings = Settings.__new__(Settings)
+        for key in _TYPES:
+            object.__setattr__(settings, key, getattr(self, key))
+        return settings
+
+    def save_settings(self, filename):
+        with open(filename, mode='w') as f:
+            json.dump(self.to_dict(), f)
+
+    def to_dict(self):
+        return OrderedDict((key, getattr(self, key)) for key in _TYPES)
+
+    # TODO: add pretty __str__
+    def __str__(self):
+        return ''
+"""
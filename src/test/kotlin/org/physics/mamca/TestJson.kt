@@ -60,6 +60,7 @@ class TestJson {
                 false, "y", "z",
                 true, 11, 12, 13, 14,
                 "data_path",
+                2, true, true, 1, 5, 2, 6, 0, 1,
                 true, 15
         )
         val filename = "src/test/resources/settings.json"
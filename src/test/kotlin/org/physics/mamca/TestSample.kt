@@ -0,0 +1,94 @@
+package org.physics.mamca
+
+import org.junit.Test
+import org.physics.mamca.math.Vector
+import java.io.File
+import kotlin.test.assertEquals
+import kotlin.test.assertFalse
+import kotlin.test.assertTrue
+
+class TestSample {
+    // образец 6x6x2, окно borders: 1 <= x < 4, 2 <= y < 5; окно roi: 2 <= x < 5, 0 <= y < 3, 1 <= z < 2
+    private val settings = Settings(
+            x = 6, y = 6, z = 2,
+            borders = true, leftX = 1, rightX = 4, leftY = 2, rightY = 5,
+            roi = true, roiLeftX = 2, roiRightX = 5, roiLeftY = 0, roiRightY = 3, roiLeftZ = 1, roiRightZ = 2
+    )
+
+    private fun Sample.particle(x: Int, y: Int, z: Int): Particle = particles.first { it.cell == Triple(x, y, z) }
+
+    @Test
+    fun testBordersEdges() {
+        val sample = Sample(settings)
+        // левая граница входит в окно, правая -- нет
+        assertTrue(sample.inBorders(sample.particle(1, 2, 0)))
+        assertTrue(sample.inBorders(sample.particle(3, 4, 1)))
+        assertFalse(sample.inBorders(sample.particle(0, 2, 0)))
+        assertFalse(sample.inBorders(sample.particle(4, 2, 0)))
+        assertFalse(sample.inBorders(sample.particle(1, 1, 0)))
+        assertFalse(sample.inBorders(sample.particle(1, 5, 0)))
+        for (p in sample.particles) {
+            val (x, y, _) = p.cell
+            assertEquals(x in 1 until 4 && y in 2 until 5, sample.inBorders(p))
+        }
+
+        // без окна borders подходит любая частица
+        val noBorders = Sample(settings.copy(borders = false))
+        assertTrue(noBorders.particles.all { noBorders.inBorders(it) })
+    }
+
+    @Test
+    fun testRoiEdges() {
+        val sample = Sample(settings)
+        assertTrue(sample.inRoi(sample.particle(2, 0, 1)))
+        assertTrue(sample.inRoi(sample.particle(4, 2, 1)))
+        assertFalse(sample.inRoi(sample.particle(1, 0, 1)))
+        assertFalse(sample.inRoi(sample.particle(5, 0, 1)))
+        assertFalse(sample.inRoi(sample.particle(2, 3, 1)))
+        assertFalse(sample.inRoi(sample.particle(2, 0, 0)))
+        for (p in sample.particles) {
+            val (x, y, z) = p.cell
+            assertEquals(x in 2 until 5 && y in 0 until 3 && z in 1 until 2, sample.inRoi(p))
+        }
+    }
+
+    @Test
+    fun testTotalMoment() {
+        // окно borders по умолчанию: 20 <= x < 50, 20 <= y < 50
+        val particles = listOf(
+                Particle(Vector(), Vector(1.0, 0.0, 0.0), Vector(), Triple(20, 20, 0), Sample()),
+                Particle(Vector(), Vector(0.0, 2.0, 0.5), Vector(), Triple(49, 49, 0), Sample()),
+                Particle(Vector(), Vector(0.0, 0.0, 3.0), Vector(), Triple(50, 20, 0), Sample()),
+                Particle(Vector(), Vector(-4.0, 0.0, 0.0), Vector(), Triple(19, 30, 0), Sample())
+        )
+        val sample = Sample(particles)
+        val m = sample.settings.m
+        assertEquals(Vector(-3.0 * m, 2.0 * m, 3.5 * m), sample.totalMoment())
+        assertEquals(Vector(1.0 * m, 2.0 * m, 0.5 * m), sample.totalMoment(sample::inBorders))
+        assertEquals(Vector(), sample.totalMoment { false })
+    }
+
+    @Test
+    fun testSaveStateRoi() {
+        val folder = createTempDir()
+        try {
+            val sample = Sample(settings)
+            sample.saveState(folder.canonicalPath, "momenta.txt")
+            val lines = File(folder, "momenta.txt").readLines().filter { it.isNotBlank() }
+            val cells = lines.map { line ->
+                val values = line.trim().split(" ")
+                Triple(values[9].toInt(), values[10].toInt(), values[11].toInt())
+            }
+            val expected = sample.particles.filter { sample.inRoi(it) }.map { it.cell }
+            assertEquals(3 * 3, expected.size)
+            assertEquals(expected, cells)
+
+            // без roi записываются все частицы
+            val full = Sample(settings.copy(roi = false))
+            full.saveState(folder.canonicalPath, "full.txt")
+            assertEquals(full.particles.size, File(folder, "full.txt").readLines().filter { it.isNotBlank() }.size)
+        } finally {
+            folder.deleteRecursively()
+        }
+    }
+}